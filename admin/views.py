@@ -14,8 +14,7 @@ from inventory.models import Item
 from personnel.models import Personnel
 from transactions.models import Transaction
 from users.models import UserProfile
-import qrcode
-from io import BytesIO
+from utils.qr_generator import render_png
 import base64
 
 from .forms import (
@@ -24,6 +23,27 @@ from .forms import (
 )
 
 
+# Registration confirmation QR codes - plain black on white at natural size
+REGISTRATION_QR_SETTINGS = {
+    'error_correction': 'M',
+    'box_size': 10,
+    'border': 5,
+    'fill_color': 'black',
+    'back_color': 'white',
+    'mode': '1',
+    'dpi': None,
+}
+
+
+def registration_qr_base64(data):
+    """
+    Base64 PNG of a registration QR code. It encodes account details, so it
+    is never written to the on-disk render cache.
+    """
+    _, png = render_png(data, size=None, **REGISTRATION_QR_SETTINGS)
+    return base64.b64encode(png).decode()
+
+
 def is_admin_user(user):
     """Check if user is admin or superuser - only they can register users"""
     return user.is_authenticated and (user.is_superuser or user.groups.filter(name='Admin').exists())
@@ -148,26 +168,12 @@ def universal_registration(request):
                     if user:
                         # Generate user QR code
                         user_data = f"USER:{user.id}:{user.username}:{user.email}"
-                        qr_user = qrcode.QRCode(version=1, box_size=10, border=5)
-                        qr_user.add_data(user_data)
-                        qr_user.make(fit=True)
-                        
-                        img_user = qr_user.make_image(fill_color="black", back_color="white")
-                        buffer_user = BytesIO()
-                        img_user.save(buffer_user, format='PNG')
-                        qr_codes['user'] = base64.b64encode(buffer_user.getvalue()).decode()
+                        qr_codes['user'] = registration_qr_base64(user_data)
                     
                     if personnel:
                         # Generate personnel QR code
                         personnel_data = f"PERSONNEL:{personnel.id}:{personnel.rank} {personnel.surname}, {personnel.firstname}:{personnel.serial}"
-                        qr_personnel = qrcode.QRCode(version=1, box_size=10, border=5)
-                        qr_personnel.add_data(personnel_data)
-                        qr_personnel.make(fit=True)
-                        
-                        img_personnel = qr_personnel.make_image(fill_color="black", back_color="white")
-                        buffer_personnel = BytesIO()
-                        img_personnel.save(buffer_personnel, format='PNG')
-                        qr_codes['personnel'] = base64.b64encode(buffer_personnel.getvalue()).decode()
+                        qr_codes['personnel'] = registration_qr_base64(personnel_data)
                     
                     # Success message based on what was created
                     registration_type = form.cleaned_data['registration_type']
@@ -418,14 +424,7 @@ def register_item(request):
                 
                 # Generate QR code
                 item_data = f"ITEM:{item.id}:{item.item_type}:{item.serial}"
-                qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                qr.add_data(item_data)
-                qr.make(fit=True)
-                
-                img = qr.make_image(fill_color="black", back_color="white")
-                buffer = BytesIO()
-                img.save(buffer, format='PNG')
-                qr_code = base64.b64encode(buffer.getvalue()).decode()
+                qr_code = registration_qr_base64(item_data)
                 
                 messages.success(request, f'Item "{item}" registered successfully with QR code!')
                 return render(request, 'admin/register_item.html', {
@@ -1,29 +1,124 @@
 """
 API Views for AJAX requests
 """
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import require_http_methods, condition
+from django.views.decorators.cache import cache_control
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import OuterRef, Subquery
 from django.contrib.auth.decorators import login_required
+from django.core import signing
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from personnel.models import Personnel
-from inventory.models import Item
-from transactions.models import Transaction
+from inventory.models import Item, StockTake
+from inventory import stocktake
+from transactions.models import Transaction, TransactionConflict, IdempotencyKey
+from transactions import batch, ammunition, live, autofill, custody
+from transactions.pagination import fetch_page, page_size_from, InvalidCursor
+from transactions.archive import history_querysets
 from qr_manager.models import QRCodeImage
+from . import id_codec, scan_cache
 from .utils import (
-    parse_qr_code, 
     get_transaction_autofill_data,
-    validate_transaction_action
+    personnel_payload,
+    item_payload,
+    validate_transaction_action,
+    serialize_transaction,
+    resolve_scan_pair,
+    read_scan_token,
+    bulk_lookup,
+    BULK_LOOKUP_MAX_IDS,
 )
+import hashlib
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def lookup_record(model, qr_type, ref):
+    """
+    Query for a scanned record annotated with its QR code's updated_at
+    (qr_updated) - one indexed query. Returns None for malformed IDs.
+    """
+    try:
+        value = id_codec.parse_id(ref).value
+    except id_codec.InvalidId:
+        return None
+    qr_updated = QRCodeImage.objects.filter(
+        qr_type=qr_type, reference_id=OuterRef('pk')
+    ).values('updated_at')[:1]
+    return model.objects.filter(pk=value).annotate(qr_updated=Subquery(qr_updated))
+
+
+def lookup_timestamps(record):
+    """(record updated_at, QR code updated_at) of a lookup_record() row"""
+    if record is None:
+        return (None, None)
+    return (record.updated_at, record.qr_updated)
+
+
+def lookup_last_modified(timestamps):
+    timestamps = [ts for ts in timestamps if ts]
+    return max(timestamps) if timestamps else None
+
+
+def lookup_etag(qr_type, ref, timestamps, *extra):
+    record_updated, qr_updated = timestamps
+    if record_updated is None:
+        return None
+    parts = [qr_type, ref, record_updated.isoformat(), qr_updated.isoformat() if qr_updated else '', *extra]
+    return hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def lookup_result(ref, kind, record):
+    """
+    parse_qr_code()-shaped result for a lookup view, built from the same
+    row as the validators so the body always matches the ETag.
+    """
+    try:
+        found = id_codec.parse_id(ref).kind
+    except id_codec.InvalidId as e:
+        return {'success': False, 'type': None, 'data': {}, 'error': str(e)}
+    if found != kind:
+        return {'success': True, 'type': found, 'data': {}, 'error': None}
+    if record is None:
+        return {'success': False, 'type': kind, 'data': {}, 'error': f'{kind.capitalize()} not found'}
+    payload = personnel_payload(record) if kind == id_codec.KIND_PERSONNEL else item_payload(record)
+    return {'success': True, 'type': kind, 'data': payload, 'error': None}
+
+
+def _scanned_record(request, model, qr_type, ref):
+    """lookup_record() row memoized on the request for the validators and the view"""
+    if not hasattr(request, '_scanned_record'):
+        query = lookup_record(model, qr_type, ref)
+        request._scanned_record = query.first() if query is not None else None
+    return request._scanned_record
+
+
+def _last_modified(request, model, qr_type, ref):
+    return lookup_last_modified(lookup_timestamps(_scanned_record(request, model, qr_type, ref)))
+
+
+def _etag(request, model, qr_type, ref, *extra):
+    return lookup_etag(qr_type, ref, lookup_timestamps(_scanned_record(request, model, qr_type, ref)), *extra)
+
+
 @require_http_methods(["GET"])
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda request, personnel_id: _etag(request, Personnel, QRCodeImage.TYPE_PERSONNEL, personnel_id),
+    last_modified_func=lambda request, personnel_id: _last_modified(request, Personnel, QRCodeImage.TYPE_PERSONNEL, personnel_id),
+)
 def get_personnel(request, personnel_id):
-    """Get personnel details by ID (supports both direct ID and QR reference)"""
-    result = parse_qr_code(personnel_id)
+    """
+    Get personnel details by ID (supports both direct ID and QR reference).
+    Answers conditional GETs with 304 from the record and QR timestamps.
+    """
+    record = _scanned_record(request, Personnel, QRCodeImage.TYPE_PERSONNEL, personnel_id)
+    result = lookup_result(personnel_id, id_codec.KIND_PERSONNEL, record)
     
     if result['success'] and result['type'] == 'personnel':
         return JsonResponse(result['data'])
@@ -35,9 +130,21 @@ def get_personnel(request, personnel_id):
 
 @require_http_methods(["GET"])
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(
+    # The autofill suggestion varies with duty_type and the rules, so both are part of the ETag
+    etag_func=lambda request, item_id: _etag(
+        request, Item, QRCodeImage.TYPE_ITEM, item_id, request.GET.get('duty_type', ''), autofill.rules().version
+    ),
+    last_modified_func=lambda request, item_id: _last_modified(request, Item, QRCodeImage.TYPE_ITEM, item_id),
+)
 def get_item(request, item_id):
-    """Get item details by ID (supports both direct ID and QR reference)"""
-    result = parse_qr_code(item_id)
+    """
+    Get item details by ID (supports both direct ID and QR reference).
+    Answers conditional GETs with 304 from the record and QR timestamps.
+    """
+    record = _scanned_record(request, Item, QRCodeImage.TYPE_ITEM, item_id)
+    result = lookup_result(item_id, id_codec.KIND_ITEM, record)
     
     if result['success'] and result['type'] == 'item':
         # Add autofill suggestion if duty_type is provided
@@ -53,10 +160,47 @@ def get_item(request, item_id):
         return JsonResponse({'error': result['error']}, status=404)
 
 
+def record_transaction(token_key=None, **fields):
+    """
+    Create a transaction, recording the scan token it was committed with
+    (if any) in the same database transaction so the token is single-use.
+    
+    Raises:
+        TransactionConflict: if the token was already used
+    """
+    with db_transaction.atomic():
+        transaction = Transaction.objects.create(**fields)
+        if token_key:
+            try:
+                with db_transaction.atomic():
+                    IdempotencyKey.objects.create(key=token_key, transaction_id=transaction.id)
+            except IntegrityError:
+                raise TransactionConflict('Scan token was already used - scan again')
+    return transaction
+
+
+STALE_TOKEN_ERROR = 'A record named by the scan token no longer exists - scan again'
+
+
+def transaction_created(transaction):
+    """Success response for create_transaction; save() left the new status on transaction.item"""
+    return JsonResponse({
+        'success': True,
+        'transaction_id': transaction.id,
+        'message': 'Transaction completed successfully',
+        'item_new_status': transaction.item.status
+    })
+
+
 @require_http_methods(["POST"])
 @login_required
 def create_transaction(request):
-    """Create a new transaction"""
+    """
+    Create a new transaction.
+    
+    Either personnel_id, item_id and action, or a scan_token from
+    /api/scan/pair/ in their place. A token commits at most one transaction.
+    """
     # Validate Content-Type
     if request.content_type != 'application/json':
         return JsonResponse({'error': 'Content-Type must be application/json'}, status=415)
@@ -71,31 +215,51 @@ def create_transaction(request):
         rounds = data.get('rounds', 0)
         duty_type = data.get('duty_type', '')
         
+        if data.get('scan_token'):
+            try:
+                pair = read_scan_token(data['scan_token'])
+            except signing.BadSignature:
+                return JsonResponse({'error': 'Scan token is invalid or expired - scan again'}, status=400)
+            if action and action != pair['action']:
+                return JsonResponse({'error': f'Scan token was issued for {pair["action"]}, not {action}'}, status=400)
+            # scan_pair already resolved and checked both records, so commit
+            # straight from the token's IDs; the conditional status update in
+            # Transaction.save() rejects an item that changed since (409)
+            transaction = record_transaction(
+                pair['key'],
+                personnel_id=pair['personnel_id'],
+                item_id=pair['item_id'],
+                action=pair['action'],
+                notes=notes,
+                mags=mags,
+                rounds=rounds,
+                duty_type=duty_type
+            )
+            return transaction_created(transaction)
+        
         # Validate required fields
         if not personnel_id or not item_id or not action:
             return JsonResponse({'error': 'Missing required fields'}, status=400)
         
-        # Get personnel using utility function
-        personnel_result = parse_qr_code(personnel_id)
-        if not personnel_result['success'] or personnel_result['type'] != 'personnel':
-            return JsonResponse({'error': personnel_result.get('error', 'Personnel not found')}, status=404)
+        # Read both records from the database, not the scan cache - the
+        # status check below must not see another worker's stale copy
+        try:
+            personnel_ref = id_codec.parse_id(personnel_id).value
+            item_ref = id_codec.parse_id(item_id).value
+        except id_codec.InvalidId as e:
+            return JsonResponse({'error': str(e)}, status=404)
         
-        personnel = Personnel.objects.get(id=personnel_result['data']['id'])
+        personnel = Personnel.objects.get(id=personnel_ref)
+        item = Item.objects.get(id=item_ref)
         
-        # Get item using utility function
-        item_result = parse_qr_code(item_id)
-        if not item_result['success'] or item_result['type'] != 'item':
-            return JsonResponse({'error': item_result.get('error', 'Item not found')}, status=404)
-        
-        item = Item.objects.get(id=item_result['data']['id'])
-        
-        # Validate transaction action
+        # Validate transaction action (early rejection only - the conditional
+        # status update in Transaction.save() decides concurrent scans)
         validation = validate_transaction_action(item, action)
         if not validation['valid']:
             return JsonResponse({'error': validation['message']}, status=400)
         
         # Create transaction
-        transaction = Transaction.objects.create(
+        transaction = record_transaction(
             personnel=personnel,
             item=item,
             action=action,
@@ -106,13 +270,7 @@ def create_transaction(request):
         )
         
         # Item status is automatically updated by Transaction.save() method
-        
-        return JsonResponse({
-            'success': True,
-            'transaction_id': transaction.id,
-            'message': f'Transaction completed successfully',
-            'item_new_status': item.status  # Return updated status
-        })
+        return transaction_created(transaction)
         
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
@@ -120,9 +278,361 @@ def create_transaction(request):
         return JsonResponse({'error': 'Personnel not found'}, status=404)
     except Item.DoesNotExist:
         return JsonResponse({'error': 'Item not found'}, status=404)
+    except TransactionConflict as e:
+        logger.warning(f"Transaction conflict: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=409)
     except ValueError as e:
         logger.warning(f"Transaction validation error: {str(e)}")
         return JsonResponse({'error': str(e)}, status=400)
+    except IntegrityError:
+        # Only a token's personnel, deleted since the scan, gets this far
+        return JsonResponse({'error': STALE_TOKEN_ERROR}, status=409)
     except Exception as e:
         logger.error(f"Transaction creation failed: {str(e)}", exc_info=True)
         return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+@require_http_methods(["GET"])
+@login_required
+def scan_pair(request):
+    """
+    Resolve a personnel scan and an item scan in one round trip.
+    
+    Query parameters: personnel, item (scanned IDs), action (optional,
+    inferred from item status), duty_type (for the autofill suggestion).
+    Returns both records with holder and status, the validation result,
+    the autofill suggestion and - when valid - a short-lived, single-use
+    scan_token that POST /api/transactions/ accepts in place of the IDs and
+    /api/transactions/sync/ rows carry with them.
+    """
+    personnel_ref = request.GET.get('personnel', '').strip()
+    item_ref = request.GET.get('item', '').strip()
+    if not personnel_ref or not item_ref:
+        return JsonResponse({'error': 'personnel and item are required'}, status=400)
+    
+    action = request.GET.get('action') or None
+    if action not in (None, Transaction.ACTION_TAKE, Transaction.ACTION_RETURN):
+        return JsonResponse({'error': f'Invalid action: {action}. Must be "Take" or "Return".'}, status=400)
+    
+    result = resolve_scan_pair(personnel_ref, item_ref, action=action, duty_type=request.GET.get('duty_type', ''))
+    if not result['success']:
+        return JsonResponse({'error': result['error']}, status=result['status'])
+    return JsonResponse(result)
+
+
+@require_http_methods(["POST"])
+@login_required
+def lookup_entities(request):
+    """
+    Resolve many personnel and item IDs in one request (rosters, print and
+    batch screens) instead of one /api/personnel/ or /api/items/ call each.
+    
+    Body: {"ids": ["PE-...", "IR-...", ...]}
+    Returns {"results": {id: {"type", "data"}}, "not_found": [id, ...]}
+    """
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Content-Type must be application/json'}, status=415)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        return JsonResponse({'error': 'ids must be a non-empty list'}, status=400)
+    if len(ids) > BULK_LOOKUP_MAX_IDS:
+        return JsonResponse({'error': f'Too many IDs (max {BULK_LOOKUP_MAX_IDS})'}, status=400)
+    if not all(isinstance(ref, str) for ref in ids):
+        return JsonResponse({'error': 'ids must be strings'}, status=400)
+    
+    return JsonResponse(bulk_lookup(ids))
+
+
+@require_http_methods(["POST"])
+@login_required
+def create_transactions_batch(request):
+    """
+    Create many transactions in one request (shift-change issuing and returns).
+    
+    Body: {"mode": "atomic" | "partial", "transactions": [row, ...]}
+    Each row is an object with personnel_id, item_id, action, duty_type,
+    mags, rounds, notes, idempotency_key and queued_at (optional, when the
+    scan was made) - or a list in that order.
+    """
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Content-Type must be application/json'}, status=415)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Request body must be an object'}, status=400)
+    
+    rows = data.get('transactions')
+    mode = data.get('mode', batch.MODE_ATOMIC)
+    if not isinstance(rows, list) or not rows:
+        return JsonResponse({'error': 'transactions must be a non-empty list'}, status=400)
+    if len(rows) > batch.MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'Batch too large (max {batch.MAX_BATCH_SIZE} rows)'}, status=400)
+    if mode not in batch.MODES:
+        return JsonResponse({'error': f'Invalid mode: {mode}. Must be "atomic" or "partial".'}, status=400)
+    
+    try:
+        result = batch.process_batch(rows, mode=mode)
+    except Exception as e:
+        logger.error(f"Batch transaction failed: {str(e)}", exc_info=True)
+        return JsonResponse({'error': 'Internal server error'}, status=500)
+    
+    if result['committed'] == 0 and mode == batch.MODE_ATOMIC:
+        return JsonResponse(result, status=409 if result['conflict'] else 400)
+    return JsonResponse(result)
+
+
+@require_http_methods(["POST"])
+@login_required
+def sync_transactions(request):
+    """
+    Replay scans queued offline by a station.
+    
+    Body: {"transactions": [row, ...]} with the batch row fields; every row
+    carries a client-generated idempotency_key and the queued_at time of the
+    scan, kept in its own column - the ledger date_time is the server's
+    commit time, so a station cannot backdate rows. Rows are written in
+    partial mode and applied in order, so an item taken and returned while
+    the station was offline syncs in one batch. A key that was already
+    recorded comes back as "duplicate" with its original transaction_id, so
+    retrying a sync never applies a scan twice. Rejected rows carry retry:
+    true when they failed on the item or holder state and may go through
+    in a later sync. A row may carry the scan_token of the /api/scan/pair/
+    check it was made after; the token must match the row and is used once.
+    """
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Content-Type must be application/json'}, status=415)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    rows = data.get('transactions') if isinstance(data, dict) else None
+    if not isinstance(rows, list) or not rows:
+        return JsonResponse({'error': 'transactions must be a non-empty list'}, status=400)
+    if len(rows) > batch.MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'Batch too large (max {batch.MAX_BATCH_SIZE} rows)'}, status=400)
+    if not all(isinstance(row, dict) and row.get('idempotency_key') for row in rows):
+        return JsonResponse({'error': 'Every row needs an idempotency_key'}, status=400)
+    
+    try:
+        result = batch.process_batch(rows, mode=batch.MODE_PARTIAL, replay=True)
+    except Exception as e:
+        logger.error(f"Transaction sync failed: {str(e)}", exc_info=True)
+        return JsonResponse({'error': 'Internal server error'}, status=500)
+    return JsonResponse(result)
+
+
+@require_http_methods(["GET"])
+@login_required
+def get_transaction_history(request):
+    """
+    Cursor-paginated transaction history, newest first.
+    
+    Query parameters: personnel, item (optional filters), after / before
+    (cursors from a previous response), limit (page size). Archived rows
+    are included once the page reaches back past the archive horizon.
+    """
+    filters = {}
+    personnel_id = request.GET.get('personnel', '').strip()
+    item_id = request.GET.get('item', '').strip()
+    if personnel_id:
+        filters['personnel_id'] = personnel_id
+    if item_id:
+        filters['item_id'] = item_id
+    queryset, archive = history_querysets(**filters)
+    
+    try:
+        page = fetch_page(
+            queryset,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size_from(request.GET),
+            archive=archive,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'results': [serialize_transaction(t) for t in page.rows],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+
+@require_http_methods(["GET"])
+@login_required
+def get_outstanding_ammunition(request):
+    """
+    Mags and rounds currently out, per personnel and duty type.
+    
+    Query parameters: personnel, duty_type (optional filters).
+    """
+    rows = ammunition.outstanding(
+        personnel_id=request.GET.get('personnel', '').strip() or None,
+        duty_type=request.GET.get('duty_type'),
+    )
+    return JsonResponse({
+        'results': [
+            {
+                'personnel_id': row.personnel_id,
+                'personnel_name': row.personnel.get_full_name(),
+                'rank': row.personnel.rank,
+                'duty_type': row.duty_type,
+                'mags': row.mags,
+                'rounds': row.rounds,
+                'updated_at': row.updated_at.isoformat(),
+            }
+            for row in rows
+        ],
+        'totals': ammunition.totals_by_duty(rows),
+    })
+
+
+def _parse_moment(raw):
+    """ISO 8601 query parameter as an aware datetime; None when absent, ValueError when malformed"""
+    if not raw:
+        return None
+    moment = parse_datetime(raw.strip().replace(' ', '+'))
+    if moment is None:
+        raise ValueError(f'Invalid date/time: {raw}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def serialize_custody_interval(interval):
+    """Convert a CustodyInterval to JSON (personnel select_related)"""
+    return {
+        'item_id': interval.item_id,
+        'personnel_id': interval.personnel_id,
+        'personnel_name': interval.personnel.get_full_name(),
+        'rank': interval.personnel.rank,
+        'start': interval.start.isoformat(),
+        'end': interval.end.isoformat() if interval.end else None,
+        'take_id': interval.take_id,
+        'return_id': interval.return_id,
+    }
+
+
+@require_http_methods(["GET"])
+@login_required
+def get_custody(request):
+    """
+    Who held what, and when.
+    
+    Query parameters:
+        item, at - the interval covering that moment ("who had item X at time T")
+        item, personnel, start, end - intervals overlapping [start, end), newest first
+    """
+    item_id = request.GET.get('item', '').strip()
+    personnel_id = request.GET.get('personnel', '').strip()
+    try:
+        at = _parse_moment(request.GET.get('at'))
+        start = _parse_moment(request.GET.get('start'))
+        end = _parse_moment(request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if at is not None:
+        if not item_id:
+            return JsonResponse({'error': 'item is required with at'}, status=400)
+        interval = custody.held_at(item_id, at)
+        return JsonResponse({
+            'item_id': item_id,
+            'at': at.isoformat(),
+            'held': interval is not None,
+            'interval': serialize_custody_interval(interval) if interval else None,
+        })
+    
+    if not item_id and not personnel_id:
+        return JsonResponse({'error': 'item or personnel is required'}, status=400)
+    rows = custody.intervals(item_id=item_id, personnel_id=personnel_id, start=start, end=end)[:custody.MAX_RESULTS + 1]
+    rows = list(rows)
+    return JsonResponse({
+        'results': [serialize_custody_interval(interval) for interval in rows[:custody.MAX_RESULTS]],
+        'truncated': len(rows) > custody.MAX_RESULTS,
+    })
+
+
+@require_http_methods(["GET"])
+@login_required
+def get_scan_cache_stats(request):
+    """Hit/miss counters of the scan resolution cache for this worker process"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    return JsonResponse(scan_cache.stats())
+
+
+@require_http_methods(["GET"])
+@login_required
+def transaction_stream(request):
+    """
+    Server-sent events for transactions posted after Last-Event-ID.
+    
+    A held-open stream would pin a sync worker, so this answers with the
+    buffered events and a retry interval; EventSource reconnects and resumes
+    from the last event ID. The async view keeps the stream open instead.
+    """
+    live.feed.touch()
+    messages, _ = live.messages_since(live.parse_last_event_id(request))
+    response = HttpResponse(live.retry_message() + ''.join(messages), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_http_methods(["POST"])
+@login_required
+def stock_take_scan(request, pk):
+    """
+    Record one scan into an open stock take.
+    
+    Body: {"id": "IR-..."}
+    Returns {"item_id", "result": expected | unexpected | duplicate, "expected_status"}
+    """
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Content-Type must be application/json'}, status=415)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    ref = data.get('id') if isinstance(data, dict) else None
+    if not isinstance(ref, str) or not ref.strip():
+        return JsonResponse({'error': 'id is required'}, status=400)
+    
+    try:
+        return JsonResponse(stocktake.record_scan(pk, ref, user=request.user))
+    except id_codec.InvalidId as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except StockTake.DoesNotExist:
+        return JsonResponse({'error': 'Stock take not found'}, status=404)
+    except stocktake.StockTakeClosed as e:
+        return JsonResponse({'error': str(e)}, status=409)
+
+
+@require_http_methods(["GET"])
+@login_required
+def stock_take_report(request, pk):
+    """Missing, unexpected and duplicate items of a stock take so far"""
+    try:
+        count = StockTake.objects.get(pk=pk)
+    except StockTake.DoesNotExist:
+        return JsonResponse({'error': 'Stock take not found'}, status=404)
+    return JsonResponse({
+        'id': count.pk,
+        'open': count.is_open,
+        **stocktake.report(count),
+    })
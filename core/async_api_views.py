@@ -0,0 +1,254 @@
+"""
+Async API Views for the scan and transaction path
+Async counterparts of get_personnel, get_item, create_transaction and
+verify_qr_code, plus a held-open transaction_stream. Lookups use the async ORM; only
+Transaction.save() - one atomic block with the conditional status update -
+runs through sync_to_async. Enabled by ASYNC_SCAN_API under an ASGI server
+(see deployment/README.md).
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.contrib.auth.decorators import login_required
+from django.core import signing
+from django.db import IntegrityError
+from django.utils.cache import get_conditional_response
+from personnel.models import Personnel
+from inventory.models import Item
+from transactions.models import TransactionConflict
+from transactions import live, autofill
+from qr_manager.models import QRCodeImage
+from . import id_codec
+from .api_views import (
+    lookup_record, lookup_timestamps, lookup_etag, lookup_last_modified, lookup_result, record_transaction,
+    transaction_created as _created, STALE_TOKEN_ERROR,
+)
+from .utils import (
+    aparse_qr_code,
+    validate_transaction_action,
+    read_scan_token,
+)
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def _conditional_lookup(request, ref, model, qr_type, kind, *etag_extra):
+    """
+    Resolve a scan for a conditional GET from one database read.
+
+    Returns:
+        tuple: (304 response or None, lookup result, etag, last_modified)
+    """
+    query = lookup_record(model, qr_type, ref)
+    record = await query.afirst() if query is not None else None
+    timestamps = lookup_timestamps(record)
+    etag = lookup_etag(qr_type, ref, timestamps, *etag_extra)
+    last_modified = lookup_last_modified(timestamps)
+    if etag:
+        not_modified = get_conditional_response(
+            request, etag=f'"{etag}"', last_modified=int(last_modified.timestamp())
+        )
+        if not_modified is not None:
+            return not_modified, None, etag, last_modified
+    return None, lookup_result(ref, kind, record), etag, last_modified
+
+
+def _with_validators(response, etag, last_modified):
+    if etag and response.status_code == 200:
+        response['ETag'] = f'"{etag}"'
+        response['Last-Modified'] = last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT')
+    return response
+
+
+@require_http_methods(["GET"])
+@login_required
+@cache_control(private=True, no_cache=True)
+async def get_personnel(request, personnel_id):
+    """Async get_personnel - same responses, including 304 on conditional GETs"""
+    not_modified, result, etag, last_modified = await _conditional_lookup(
+        request, personnel_id, Personnel, QRCodeImage.TYPE_PERSONNEL, id_codec.KIND_PERSONNEL
+    )
+    if not_modified:
+        return not_modified
+
+    if result['success'] and result['type'] == 'personnel':
+        response = JsonResponse(result['data'])
+    elif result['success'] and result['type'] != 'personnel':
+        response = JsonResponse({'error': f'QR code is for {result["type"]}, not personnel'}, status=400)
+    else:
+        response = JsonResponse({'error': result['error']}, status=404)
+    return _with_validators(response, etag, last_modified)
+
+
+@require_http_methods(["GET"])
+@login_required
+@cache_control(private=True, no_cache=True)
+async def get_item(request, item_id):
+    """Async get_item - same responses, including 304 on conditional GETs"""
+    duty_type = request.GET.get('duty_type', '')
+    rules = await autofill.arules()
+    not_modified, result, etag, last_modified = await _conditional_lookup(
+        request, item_id, Item, QRCodeImage.TYPE_ITEM, id_codec.KIND_ITEM, duty_type, rules.version
+    )
+    if not_modified:
+        return not_modified
+
+    if result['success'] and result['type'] == 'item':
+        if duty_type:
+            result['data']['autofill'] = rules.lookup(result['data']['item_type'], duty_type)
+        response = JsonResponse(result['data'])
+    elif result['success'] and result['type'] != 'item':
+        response = JsonResponse({'error': f'QR code is for {result["type"]}, not item'}, status=400)
+    else:
+        response = JsonResponse({'error': result['error']}, status=404)
+    return _with_validators(response, etag, last_modified)
+
+
+@require_http_methods(["POST"])
+@login_required
+async def create_transaction(request):
+    """Async create_transaction - accepts the same body, including scan_token"""
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Content-Type must be application/json'}, status=415)
+
+    try:
+        data = json.loads(request.body)
+        action = data.get('action')
+        fields = {
+            'notes': data.get('notes', ''),
+            'mags': data.get('mags', 0),
+            'rounds': data.get('rounds', 0),
+            'duty_type': data.get('duty_type', ''),
+        }
+
+        if data.get('scan_token'):
+            try:
+                pair = read_scan_token(data['scan_token'])
+            except signing.BadSignature:
+                return JsonResponse({'error': 'Scan token is invalid or expired - scan again'}, status=400)
+            if action and action != pair['action']:
+                return JsonResponse({'error': f'Scan token was issued for {pair["action"]}, not {action}'}, status=400)
+            # scan_pair already resolved and checked both records; commit from
+            # the token's IDs and let the status update reject stale state
+            transaction = await sync_to_async(record_transaction)(
+                pair['key'], personnel_id=pair['personnel_id'], item_id=pair['item_id'], action=pair['action'],
+                **fields
+            )
+            return _created(transaction)
+
+        personnel_ref, item_ref = data.get('personnel_id'), data.get('item_id')
+        if not personnel_ref or not item_ref or not action:
+            return JsonResponse({'error': 'Missing required fields'}, status=400)
+
+        try:
+            personnel_ref = id_codec.parse_id(personnel_ref).value
+            item_ref = id_codec.parse_id(item_ref).value
+        except id_codec.InvalidId as e:
+            return JsonResponse({'error': str(e)}, status=404)
+
+        # Both records are read from the database, not the scan cache;
+        # the conditional status update in Transaction.save() decides
+        # concurrent scans
+        personnel = await Personnel.objects.aget(pk=personnel_ref)
+        item = await Item.objects.aget(pk=item_ref)
+        validation = validate_transaction_action(item, action)
+        if not validation['valid']:
+            return JsonResponse({'error': validation['message']}, status=400)
+
+        # save() runs one atomic block; keep it on the ORM's sync thread
+        transaction = await sync_to_async(record_transaction)(
+            None, personnel=personnel, item=item, action=action, **fields
+        )
+        return _created(transaction)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except Personnel.DoesNotExist:
+        return JsonResponse({'error': 'Personnel not found'}, status=404)
+    except Item.DoesNotExist:
+        return JsonResponse({'error': 'Item not found'}, status=404)
+    except TransactionConflict as e:
+        logger.warning(f"Transaction conflict: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=409)
+    except ValueError as e:
+        logger.warning(f"Transaction validation error: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=400)
+    except IntegrityError:
+        return JsonResponse({'error': STALE_TOKEN_ERROR}, status=409)
+    except Exception as e:
+        logger.error(f"Transaction creation failed: {str(e)}", exc_info=True)
+        return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+@login_required
+async def verify_qr_code(request):
+    """Async verify_qr_code - same responses as transactions.views.verify_qr_code"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+
+    qr_data = request.POST.get('qr_data', '').strip()
+    if not qr_data:
+        return JsonResponse({'success': False, 'error': 'No QR code data provided'})
+
+    result = await aparse_qr_code(qr_data)
+    if not result['success']:
+        return JsonResponse({'success': False, 'error': result['error']})
+
+    data = result['data']
+    if result['type'] == 'personnel':
+        return JsonResponse({
+            'success': True,
+            'type': 'personnel',
+            'id': data['id'],
+            'name': data['full_name'],
+            'rank': data['rank'],
+            'serial': data['serial'],
+        })
+    return JsonResponse({
+        'success': True,
+        'type': 'item',
+        'id': data['id'],
+        'item_type': data['item_type'],
+        'serial': data['serial'],
+        'status': data['status'],
+        'condition': data['condition'],
+    })
+
+
+@require_http_methods(["GET"])
+@login_required
+async def transaction_stream(request):
+    """
+    Server-sent events for transactions posted after Last-Event-ID, held open
+    for LIVE_FEED_STREAM_SECONDS. Each stream only reads the process's live
+    feed buffer; the feed's poller is the one touching the database.
+    """
+    last_id = live.parse_last_event_id(request)
+    # The first watcher in a process waits for the poller to load the ledger tail
+    await sync_to_async(live.feed.touch, thread_sensitive=False)()
+
+    async def events(last_id):
+        yield live.retry_message()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + live.stream_seconds()
+        quiet = 0.0
+        while loop.time() < deadline:
+            live.feed.touch()
+            messages, last_id = live.messages_since(last_id)
+            if messages:
+                yield ''.join(messages)
+                quiet = 0.0
+            elif quiet >= live.KEEPALIVE_SECONDS:
+                yield ': keepalive\n\n'
+                quiet = 0.0
+            await asyncio.sleep(live.poll_interval())
+            quiet += live.poll_interval()
+
+    response = StreamingHttpResponse(events(last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,84 @@
+"""
+ID codec for ArmGuard
+Personnel and item IDs carry their type in a fixed prefix:
+
+    PE-<serial><DDMMYY>   enlisted personnel
+    PO-<serial><DDMMYY>   officer
+    IR-<serial><DDMMYY>   rifle
+    IP-<serial><DDMMYY>   pistol
+
+Scanned strings are parsed and classified here without touching the
+database, so resolving a scan is one primary-key lookup on the right table.
+"""
+import re
+from collections import namedtuple
+
+KIND_PERSONNEL = 'personnel'
+KIND_ITEM = 'item'
+
+PREFIX_ENLISTED = 'PE'
+PREFIX_OFFICER = 'PO'
+PREFIX_RIFLE = 'IR'
+PREFIX_PISTOL = 'IP'
+
+PREFIX_KINDS = {
+    PREFIX_ENLISTED: KIND_PERSONNEL,
+    PREFIX_OFFICER: KIND_PERSONNEL,
+    PREFIX_RIFLE: KIND_ITEM,
+    PREFIX_PISTOL: KIND_ITEM,
+}
+
+MAX_LENGTH = 50
+
+_ID_RE = re.compile(r'^(PE|PO|IR|IP)-(.+)$')
+
+ParsedId = namedtuple('ParsedId', ['value', 'kind', 'prefix', 'body'])
+
+
+class InvalidId(ValueError):
+    """Raised when a string is not a well-formed personnel or item ID"""
+
+
+def parse_id(raw):
+    """
+    Parse and classify a scanned ID.
+
+    Args:
+        raw (str): Scanned QR data or typed ID
+
+    Returns:
+        ParsedId: (value, kind, prefix, body) - value is the normalized ID
+
+    Raises:
+        InvalidId: if the string has no known prefix or is malformed
+    """
+    value = str(raw or '').strip()
+    if len(value) > MAX_LENGTH:
+        raise InvalidId(f'ID is too long: {value[:MAX_LENGTH]}...')
+    # Prefixes are always upper case; accept them typed in lower case
+    head = value[:3].upper()
+    if head[:2] in PREFIX_KINDS and head[2:] == '-':
+        value = head + value[3:]
+    match = _ID_RE.match(value)
+    if not match:
+        raise InvalidId(f'Unrecognized ID: {value or "(empty)"}')
+    prefix, body = match.groups()
+    return ParsedId(value, PREFIX_KINDS[prefix], prefix, body)
+
+
+def classify(raw):
+    """Return 'personnel', 'item' or None for a scanned ID"""
+    try:
+        return parse_id(raw).kind
+    except InvalidId:
+        return None
+
+
+def personnel_id(serial, date_suffix, officer=False):
+    """Build a personnel ID from a serial (without any O- prefix) and DDMMYY"""
+    return f"{PREFIX_OFFICER if officer else PREFIX_ENLISTED}-{serial}{date_suffix}"
+
+
+def item_id(category, serial, date_suffix):
+    """Build an item ID from the item category ('R' or 'P'), serial and DDMMYY"""
+    return f"I{category}-{serial}{date_suffix}"
@@ -0,0 +1,153 @@
+"""
+Management command to load-test the scan API of a running server
+
+Each scan round looks up a personnel and an item, verifies the item's QR
+code, then posts a Take and the matching Return - the Return puts the item
+back, so every round starts from the same state. Each station writes
+against its own available item, so stations never conflict.
+
+Run it once against the sync profile (gunicorn sync workers) and once
+against the async profile (uvicorn workers with ASYNC_SCAN_API=True),
+with the same options, and compare the reported throughput and latencies.
+"""
+import http.cookiejar
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from personnel.models import Personnel
+from inventory.models import Item
+
+
+class Command(BaseCommand):
+    help = 'Simulate concurrent scanning stations against the scan lookup, QR verify and transaction APIs of a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to test (default: http://127.0.0.1:8000)')
+        parser.add_argument('--username', required=True, help='Staff account to log in with (staff skip rate limiting)')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--stations', type=int, default=20, help='Concurrent scanning stations (default: 20)')
+        parser.add_argument('--scans', type=int, default=50, help='Scan rounds per station (default: 50)')
+        parser.add_argument('--ids', type=int, default=20, help='Distinct personnel/items to cycle through (default: 20)')
+        parser.add_argument('--label', default='', help='Profile name shown in the report, e.g. sync or async')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        personnel_ids = list(Personnel.objects.values_list('id', flat=True)[:options['ids']])
+        item_ids = list(Item.objects.values_list('id', flat=True)[:options['ids']])
+        if not personnel_ids or not item_ids:
+            raise CommandError('Need at least one personnel and one item in the database to scan')
+        # One available item per station for the Take/Return writes
+        write_items = list(
+            Item.objects.filter(status=Item.STATUS_AVAILABLE).values_list('id', 'qr_code')[:options['stations']]
+        )
+        if len(write_items) < options['stations']:
+            raise CommandError(
+                f"Need {options['stations']} available items (one per station) for the transaction scans, "
+                f"found {len(write_items)}"
+            )
+
+        cookies = self.login(base_url, options['username'], options['password'])
+        csrf = next((cookie.value for cookie in cookies if cookie.name == 'csrftoken'), '')
+        self.stdout.write(
+            f"Benchmarking {options['label'] or base_url}: {options['stations']} stations × "
+            f"{options['scans']} scan rounds..."
+        )
+
+        latencies = {name: [] for name in ('lookup', 'verify', 'write')}
+        errors = []
+        lock = threading.Lock()
+
+        def json_request(path, payload):
+            return urllib.request.Request(
+                base_url + path,
+                data=json.dumps(payload).encode(),
+                headers={'Content-Type': 'application/json', 'X-CSRFToken': csrf, 'Referer': base_url + '/'},
+            )
+
+        def form_request(path, payload):
+            return urllib.request.Request(
+                base_url + path,
+                data=urllib.parse.urlencode(payload).encode(),
+                headers={'X-CSRFToken': csrf, 'Referer': base_url + '/'},
+            )
+
+        def station(number):
+            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+            write_item, write_qr = write_items[number]
+            for scan in range(options['scans']):
+                personnel_id = personnel_ids[(number + scan) % len(personnel_ids)]
+                transaction = {'personnel_id': personnel_id, 'item_id': write_item}
+                for name, request in (
+                    ('lookup', f"{base_url}/api/personnel/{personnel_id}/"),
+                    ('lookup', f"{base_url}/api/items/{item_ids[(number + scan) % len(item_ids)]}/"),
+                    ('verify', form_request('/transactions/verify-qr/', {'qr_data': write_qr or write_item})),
+                    ('write', json_request('/api/transactions/', {**transaction, 'action': 'Take'})),
+                    # Cleanup - return the item so the next round can take it again
+                    ('write', json_request('/api/transactions/', {**transaction, 'action': 'Return'})),
+                ):
+                    started = time.perf_counter()
+                    try:
+                        with opener.open(request, timeout=30) as response:
+                            response.read()
+                        elapsed = time.perf_counter() - started
+                        with lock:
+                            latencies[name].append(elapsed)
+                    except (urllib.error.URLError, OSError) as e:
+                        with lock:
+                            errors.append(f"{name}: {e}")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['stations']) as pool:
+            list(pool.map(station, range(options['stations'])))
+        wall = time.perf_counter() - started
+
+        self.report(options['label'] or base_url, latencies, errors, wall)
+
+    def login(self, base_url, username, password):
+        """Log in through the login form and return the session cookie jar"""
+        cookies = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+        opener.open(f"{base_url}/login/", timeout=30).read()
+        csrf = next((cookie.value for cookie in cookies if cookie.name == 'csrftoken'), '')
+        body = urllib.parse.urlencode({
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': csrf,
+        }).encode()
+        request = urllib.request.Request(f"{base_url}/login/", data=body, headers={'Referer': f"{base_url}/login/"})
+        opener.open(request, timeout=30).read()
+        if not any(cookie.name == 'sessionid' for cookie in cookies):
+            raise CommandError('Login failed - check the username and password')
+        return cookies
+
+    def report(self, label, latencies, errors, wall):
+        total = sum(len(values) for values in latencies.values())
+        if not total:
+            raise CommandError(f"Every request failed, first error: {errors[0] if errors else 'unknown'}")
+
+        self.stdout.write(f"\n{label}")
+        self.stdout.write(f"  Requests:    {total} ok, {len(errors)} failed")
+        self.stdout.write(f"  Wall time:   {wall:.2f}s")
+        self.stdout.write(f"  Throughput:  {total / wall:.1f} req/s")
+        for name, values in latencies.items():
+            if not values:
+                continue
+            values.sort()
+
+            def percentile(p):
+                return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+            self.stdout.write(
+                f"  {name.capitalize() + ' ms:':<13}mean {statistics.mean(values) * 1000:.1f}, p50 {percentile(0.50):.1f}, "
+                f"p95 {percentile(0.95):.1f}, p99 {percentile(0.99):.1f}"
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"  First error: {errors[0]}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("✓ Benchmark complete"))
@@ -47,6 +47,34 @@ class RateLimitMiddleware(MiddlewareMixin):
         
         return None
     
+    async def __acall__(self, request):
+        """Async path: same checks with the async user and cache APIs (no thread hop)"""
+        response = await self.aprocess_request(request)
+        return response or await self.get_response(request)
+    
+    async def aprocess_request(self, request):
+        user = await request.auser()
+        if user.is_authenticated and user.is_staff:
+            return None
+        
+        if not getattr(settings, 'RATELIMIT_ENABLE', False):
+            return None
+        
+        cache_key = f'ratelimit_{self.get_client_ip(request)}'
+        now = time.time()
+        requests = [req_time for req_time in await cache.aget(cache_key, []) if now - req_time < 60]
+        
+        if len(requests) >= getattr(settings, 'RATELIMIT_REQUESTS_PER_MINUTE', 60):
+            return HttpResponseForbidden(
+                '<h1>429 Too Many Requests</h1>'
+                '<p>Rate limit exceeded. Please try again later.</p>',
+                content_type='text/html'
+            )
+        
+        requests.append(now)
+        await cache.aset(cache_key, requests, 60)
+        return None
+    
     def get_client_ip(self, request):
         """Get real client IP (handle proxies)"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -88,6 +116,10 @@ class SecurityHeadersMiddleware(MiddlewareMixin):
         response['X-Permitted-Cross-Domain-Policies'] = 'none'
         
         return response
+    
+    async def __acall__(self, request):
+        # Header edits only - skip the sync_to_async hop MiddlewareMixin would add
+        return self.process_response(request, await self.get_response(request))
 
 
 class AdminIPWhitelistMiddleware(MiddlewareMixin):
@@ -146,3 +178,7 @@ class StripSensitiveHeadersMiddleware(MiddlewareMixin):
                 del response[header]
         
         return response
+    
+    async def __acall__(self, request):
+        # Header edits only - skip the sync_to_async hop MiddlewareMixin would add
+        return self.process_response(request, await self.get_response(request))
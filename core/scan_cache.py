@@ -0,0 +1,122 @@
+"""
+Scan resolution cache for ArmGuard
+A short-lived in-process LRU in front of parse_qr_code(), for the scanner
+pages that verify the same IDs over and over. Entries are keyed by the
+normalized ID and evicted when the personnel, item or QR code behind them
+changes (see core/signals.py).
+
+There is no shared tier: the deployment's Django cache is per-process
+LocMemCache, and signal invalidation only reaches the process that made
+the change. Other worker processes see the change once their entry expires
+after SCAN_CACHE_LOCAL_TTL seconds, so the TTL is the staleness bound.
+Not-found results are never cached, so a newly registered record resolves
+on its first scan.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+_lock = threading.Lock()
+_local = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _local_size():
+    return getattr(settings, 'SCAN_CACHE_LOCAL_SIZE', 512)
+
+
+def _local_ttl():
+    return getattr(settings, 'SCAN_CACHE_LOCAL_TTL', 5)
+
+
+def _remember(key, payload):
+    if not payload['success']:
+        return
+    expires = time.monotonic() + _local_ttl()
+    with _lock:
+        _local[key] = (expires, payload)
+        _local.move_to_end(key)
+        while len(_local) > _local_size():
+            _local.popitem(last=False)
+
+
+def _lookup(key):
+    with _lock:
+        entry = _local.get(key)
+        if entry is None:
+            _stats['misses'] += 1
+            return None
+        expires, payload = entry
+        if expires <= time.monotonic():
+            del _local[key]
+            _stats['misses'] += 1
+            return None
+        _local.move_to_end(key)
+        _stats['hits'] += 1
+        return payload
+
+
+def _copy(payload):
+    return {**payload, 'data': dict(payload['data'])}
+
+
+def resolve(key, loader):
+    """
+    Return the cached payload for a normalized ID, loading it on a miss.
+
+    Args:
+        key (str): Normalized personnel or item ID
+        loader (callable): Resolves the key when it is not cached
+
+    Returns:
+        dict: A copy of the payload, safe for the caller to modify
+    """
+    payload = _lookup(key)
+    if payload is None:
+        payload = loader(key)
+        _remember(key, payload)
+    return _copy(payload)
+
+
+async def aresolve(key, aloader):
+    """Async resolve() for async views; aloader is a coroutine function"""
+    payload = _lookup(key)
+    if payload is None:
+        payload = await aloader(key)
+        _remember(key, payload)
+    return _copy(payload)
+
+
+def invalidate(*keys):
+    """Evict IDs from this process's cache"""
+    keys = [str(key) for key in keys if key]
+    if not keys:
+        return
+    with _lock:
+        for key in keys:
+            _local.pop(key, None)
+        _stats['invalidations'] += len(keys)
+
+
+def clear():
+    """Drop this process's entries and reset its counters"""
+    with _lock:
+        _local.clear()
+        for stat in _stats:
+            _stats[stat] = 0
+
+
+def stats():
+    """
+    Hit/miss counters for this process.
+
+    Returns:
+        dict: hits, misses, invalidations, hit_rate, entries
+    """
+    with _lock:
+        snapshot = dict(_stats)
+        snapshot['entries'] = len(_local)
+    lookups = snapshot['hits'] + snapshot['misses']
+    snapshot['hit_rate'] = round(snapshot['hits'] / lookups, 3) if lookups else None
+    return snapshot
@@ -94,6 +94,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Scanning stations write concurrently: take the write lock when a
+        # transaction starts and wait for it instead of failing fast
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Set DJANGO_TEST_DB_NAME to a file path to run the concurrency tests,
+        # which need real connections; the default in-memory database skips them
+        'TEST': {
+            'NAME': config('DJANGO_TEST_DB_NAME', default=None),
+        },
     }
 }
 
@@ -208,5 +219,57 @@ CACHES = {
     }
 }
 
+# Transaction archive horizon (days) - older transactions are moved to the
+# archive table by the archive_transactions management command
+TRANSACTION_ARCHIVE_DAYS = config('TRANSACTION_ARCHIVE_DAYS', default=365, cast=int)
+
+# Scan resolution cache (core/scan_cache.py) - entries per process, and
+# seconds an entry lives (how stale another worker's copy can get)
+SCAN_CACHE_LOCAL_SIZE = config('SCAN_CACHE_LOCAL_SIZE', default=512, cast=int)
+SCAN_CACHE_LOCAL_TTL = config('SCAN_CACHE_LOCAL_TTL', default=5, cast=int)
+
+# Offline scan sync (/api/transactions/sync/) - oldest scan time accepted
+# and how far ahead of the server clock a station's clock may run (seconds)
+SCAN_SYNC_MAX_AGE = config('SCAN_SYNC_MAX_AGE', default=604800, cast=int)
+SCAN_SYNC_CLOCK_SKEW = config('SCAN_SYNC_CLOCK_SKEW', default=300, cast=int)
+
+# Lifetime (seconds) of the signed token returned by /api/scan/pair/,
+# counted to when the server receives it (also for synced offline rows)
+SCAN_TOKEN_MAX_AGE = config('SCAN_TOKEN_MAX_AGE', default=120, cast=int)
+
+# Serve the scan lookup / single transaction endpoints with the async views
+# (core/async_api_views.py). Enable together with the ASGI deployment profile.
+ASYNC_SCAN_API = config('ASYNC_SCAN_API', default=False, cast=bool)
+
+# Seconds a worker keeps its compiled autofill rules before re-reading them
+# (the worker that saves a rule rebuilds immediately)
+AUTOFILL_RULES_TTL = config('AUTOFILL_RULES_TTL', default=60, cast=int)
+
+# Live transaction feed (transactions/live.py) - ledger poll interval and
+# buffered events per process, seconds without watchers before the poller
+# stops, browser reconnect delay (ms) and how long the async stream stays open
+LIVE_FEED_POLL_INTERVAL = config('LIVE_FEED_POLL_INTERVAL', default=1.0, cast=float)
+LIVE_FEED_BUFFER_SIZE = config('LIVE_FEED_BUFFER_SIZE', default=500, cast=int)
+LIVE_FEED_IDLE_SECONDS = config('LIVE_FEED_IDLE_SECONDS', default=60, cast=int)
+LIVE_FEED_RETRY_MS = config('LIVE_FEED_RETRY_MS', default=3000, cast=int)
+LIVE_FEED_STREAM_SECONDS = config('LIVE_FEED_STREAM_SECONDS', default=300, cast=int)
+# IDs below the newest one re-checked on every poll, for transactions that
+# commit after a higher ID (PostgreSQL hands IDs out before commit)
+LIVE_FEED_LOOKBACK_IDS = config('LIVE_FEED_LOOKBACK_IDS', default=100, cast=int)
+
+# Render QR images in the web process after commit instead of queueing them
+# for the process_qr_jobs worker. On by default with DEBUG (no worker in
+# development); production needs armguard-qr-worker.service
+QR_RENDER_INLINE = config('QR_RENDER_INLINE', default=DEBUG, cast=bool)
+
+# Content-addressed store of rendered QR PNGs (utils/qr_generator.py), shared
+# by all processes; empty means BASE_DIR/cache/qr_renders. Keep it outside
+# MEDIA_ROOT - the web server serves media without authentication. Renders
+# unused for MAX_AGE_DAYS, then the oldest beyond MAX_MB, are pruned by the
+# QR worker and by prune_qr_render_cache
+QR_RENDER_CACHE_DIR = config('QR_RENDER_CACHE_DIR', default='')
+QR_RENDER_CACHE_MAX_AGE_DAYS = config('QR_RENDER_CACHE_MAX_AGE_DAYS', default=30, cast=int)
+QR_RENDER_CACHE_MAX_MB = config('QR_RENDER_CACHE_MAX_MB', default=200, cast=int)
+
 # Admin URL Configuration
 ADMIN_URL_PREFIX = config('DJANGO_ADMIN_URL', default='superadmin')
@@ -0,0 +1,45 @@
+"""
+Core Signals - Evict cached scan results when the records behind them change
+"""
+
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from personnel.models import Personnel
+from inventory.models import Item
+from qr_manager.models import QRCodeImage
+from transactions.signals import transaction_posted
+from . import scan_cache
+
+
+def _evict(*keys):
+    """
+    Evict now and again once the surrounding transaction commits, so a
+    concurrent scan cannot re-cache the pre-commit row in between. Only
+    this process's cache is reached; other workers' copies expire after
+    SCAN_CACHE_LOCAL_TTL.
+    """
+    scan_cache.invalidate(*keys)
+    db_transaction.on_commit(lambda: scan_cache.invalidate(*keys))
+
+
+@receiver(post_save, sender=Personnel)
+@receiver(post_delete, sender=Personnel)
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_entity_scans(sender, instance, **kwargs):
+    """Evict the scan result for a changed personnel or item"""
+    _evict(instance.pk)
+
+
+@receiver(post_save, sender=QRCodeImage)
+@receiver(post_delete, sender=QRCodeImage)
+def invalidate_qr_scans(sender, instance, **kwargs):
+    """Evict the scan result for a changed QR code"""
+    _evict(instance.reference_id, instance.qr_data)
+
+
+@receiver(transaction_posted)
+def invalidate_transaction_scans(sender, transactions, **kwargs):
+    """Item status moves with a conditional UPDATE that sends no post_save"""
+    _evict(*{txn.item_id for txn in transactions})
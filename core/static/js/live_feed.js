@@ -0,0 +1,86 @@
+// Live transaction feed for ArmGuard
+//
+// Subscribes to /api/transactions/stream/ (server-sent events) and hands each
+// posted transaction to the page, so dashboards and lists patch themselves in
+// place instead of reloading. The page passes the newest transaction ID it
+// rendered; EventSource resumes from the last event ID after a reconnect.
+// A transaction can commit after one with a higher ID, so events are not
+// filtered by "higher than the last": each ID is applied once, and only IDs
+// above the page's own are new to it.
+
+(function (window) {
+    'use strict';
+
+    const STREAM_URL = '/api/transactions/stream/';
+
+    // Applied event IDs kept to drop repeats after a reconnect
+    const SEEN_LIMIT = 1000;
+
+    let source = null;
+    let pageId = 0;
+    const seen = new Set();
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value == null ? '' : String(value);
+        return div.innerHTML;
+    }
+
+    function formatDate(iso) {
+        // Matches the templates' d/m/y H:i
+        const date = new Date(iso);
+        const pad = value => String(value).padStart(2, '0');
+        return `${pad(date.getDate())}/${pad(date.getMonth() + 1)}/${pad(date.getFullYear() % 100)} ` +
+            `${pad(date.getHours())}:${pad(date.getMinutes())}`;
+    }
+
+    // Add a delta to a counter element, e.g. <span data-live-count="issued">
+    function bump(name, delta) {
+        document.querySelectorAll(`[data-live-count="${name}"]`).forEach(element => {
+            const value = parseInt(element.textContent, 10);
+            if (!isNaN(value)) element.textContent = value + delta;
+        });
+    }
+
+    // Prepend a row, dropping the "nothing yet" placeholder and trimming to limit rows
+    function prependRow(tbody, html, limit) {
+        if (!tbody) return;
+        const placeholder = tbody.querySelector('tr[data-empty]');
+        if (placeholder) placeholder.remove();
+        tbody.insertAdjacentHTML('afterbegin', html);
+        if (limit) {
+            while (tbody.rows.length > limit) tbody.deleteRow(-1);
+        }
+    }
+
+    // handlers: { transaction(event), reset() } - reset defaults to a reload
+    function connect(lastEventId, handlers) {
+        if (!window.EventSource || source) return false;
+        pageId = lastEventId || 0;
+
+        source = new EventSource(`${STREAM_URL}?last_event_id=${pageId}`);
+        source.addEventListener('transaction', message => {
+            const event = JSON.parse(message.data);
+            if (event.id <= pageId || seen.has(event.id)) return;
+            seen.add(event.id);
+            if (seen.size > SEEN_LIMIT) seen.delete(seen.values().next().value);
+            Object.entries(event.status_deltas || {}).forEach(([name, delta]) => bump(name, delta));
+            if (handlers.transaction) handlers.transaction(event);
+        });
+        source.addEventListener('reset', () => {
+            // Too far behind for the server's buffer - start over from a fresh page
+            if (handlers.reset) handlers.reset();
+            else window.location.reload();
+        });
+        return true;
+    }
+
+    window.LiveFeed = {
+        connect: connect,
+        connected: () => source !== null,
+        bump: bump,
+        prependRow: prependRow,
+        escapeHtml: escapeHtml,
+        formatDate: formatDate
+    };
+})(window);
@@ -0,0 +1,181 @@
+// Offline scan queue for ArmGuard
+//
+// Scans are written to localStorage before anything goes over the network,
+// each with a client-generated idempotency key, then synced in batches to
+// /api/transactions/sync/. The server records every key with the ledger row
+// it produced, so a sync that is retried after a dropped connection comes
+// back as "duplicate" instead of applying the scan twice.
+//
+// Each scan keeps the time it was made (queued_at), which the server stores
+// beside the transaction; the ledger time is when the sync commits. A scan that had to wait for the network and is
+// then rejected on item or holder state (retry: true) is held and sent again
+// on later syncs - another station may still be syncing the scans it depends
+// on. Permanent rejections, and scans rejected while the station was online,
+// are dropped and reported.
+
+(function (window) {
+    'use strict';
+
+    const STORAGE_KEY = 'armguard.scanQueue';
+    const SYNC_URL = '/api/transactions/sync/';
+    const BATCH_SIZE = 50;
+    const RETRY_MIN_MS = 2000;
+    const RETRY_MAX_MS = 60000;
+    const HOLD_MAX_MS = 24 * 60 * 60 * 1000;
+
+    let syncing = null;
+    let retryTimer = null;
+    let retryDelay = RETRY_MIN_MS;
+    const listeners = [];
+
+    function load() {
+        try {
+            return JSON.parse(window.localStorage.getItem(STORAGE_KEY)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+
+    function save(entries) {
+        window.localStorage.setItem(STORAGE_KEY, JSON.stringify(entries));
+    }
+
+    function newKey() {
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 14);
+    }
+
+    function csrfToken() {
+        const input = document.querySelector('[name=csrfmiddlewaretoken]');
+        if (input) return input.value;
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function notify(event) {
+        event.pending = load().length;
+        listeners.forEach(listener => listener(event));
+    }
+
+    function scheduleRetry() {
+        if (retryTimer) return;
+        retryTimer = setTimeout(() => {
+            retryTimer = null;
+            flush();
+        }, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, RETRY_MAX_MS);
+    }
+
+    // Scans that waited for the network are held when they fail on state, for up to HOLD_MAX_MS
+    function holds(entry, result) {
+        if (result.status === 'skipped') return true;
+        if (result.status !== 'error' || !result.retry || !entry.deferred) return false;
+        return Date.now() - Date.parse(entry.held_since || new Date().toISOString()) < HOLD_MAX_MS;
+    }
+
+    // Drop recorded and rejected rows from the stored queue, hold the rest, report each outcome
+    function settle(sent, response) {
+        const byKey = {};
+        response.results.forEach(result => {
+            byKey[sent[result.index].idempotency_key] = result;
+        });
+
+        const held = {};
+        save(load().filter(entry => {
+            const result = byKey[entry.idempotency_key];
+            if (!result) return true;
+            if (!holds(entry, result)) return false;
+            entry.held_since = entry.held_since || new Date().toISOString();
+            held[entry.idempotency_key] = true;
+            return true;
+        }));
+        sent.forEach(entry => {
+            const result = byKey[entry.idempotency_key];
+            if (!result) return;
+            const type = held[entry.idempotency_key] ? 'held' : result.status === 'error' ? 'rejected' : 'synced';
+            notify({ type: type, entry: entry, result: result });
+        });
+        return Object.keys(held).length;
+    }
+
+    // Everything still queued when the network fails was scanned offline
+    function markDeferred() {
+        save(load().map(entry => Object.assign(entry, { deferred: true })));
+    }
+
+    async function sendBatch(entries) {
+        const response = await fetch(SYNC_URL, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfToken()
+            },
+            body: JSON.stringify({ transactions: entries })
+        });
+        if (!response.ok) {
+            throw new Error('Sync failed with status ' + response.status);
+        }
+        return response.json();
+    }
+
+    // Send every queued row once, oldest first; resolves to the number of rows held
+    async function drain() {
+        const sentKeys = {};
+        let held = 0;
+        for (;;) {
+            const sent = load().filter(entry => !sentKeys[entry.idempotency_key]).slice(0, BATCH_SIZE);
+            if (!sent.length) return held;
+            sent.forEach(entry => { sentKeys[entry.idempotency_key] = true; });
+            held += settle(sent, await sendBatch(sent));
+        }
+    }
+
+    // Sync everything queued; resolves once every row was sent or the network failed
+    function flush() {
+        if (syncing) return syncing;
+        if (!load().length) return Promise.resolve(true);
+
+        syncing = drain()
+            .then(held => {
+                retryDelay = RETRY_MIN_MS;
+                // Held rows are tried again later, not in a loop
+                if (held) scheduleRetry();
+                return true;
+            })
+            .catch(error => {
+                markDeferred();
+                notify({ type: 'offline', error: error });
+                scheduleRetry();
+                return false;
+            })
+            .finally(() => {
+                syncing = null;
+            });
+        return syncing;
+    }
+
+    // Store a scan durably, then try to sync it
+    function enqueue(row) {
+        const entry = Object.assign({}, row, {
+            idempotency_key: newKey(),
+            queued_at: new Date().toISOString()
+        });
+        const entries = load();
+        entries.push(entry);
+        save(entries);
+        notify({ type: 'queued', entry: entry });
+        return flush().then(online => ({ entry: entry, online: online }));
+    }
+
+    window.addEventListener('online', flush);
+    document.addEventListener('DOMContentLoaded', flush);
+
+    window.ScanQueue = {
+        enqueue: enqueue,
+        flush: flush,
+        pending: () => load().length,
+        onChange: listener => listeners.push(listener)
+    };
+})(window);
@@ -0,0 +1,137 @@
+import json
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import Item
+from personnel.models import Personnel
+from transactions.models import AutofillRule
+from . import async_api_views, id_codec
+from .utils import parse_qr_code
+
+
+class IdCodecTest(TestCase):
+    """ID codec - prefixes classify a scan without touching the database"""
+
+    def test_parse_and_classify(self):
+        parsed = id_codec.parse_id('  IR-854643041125 ')
+        self.assertEqual(parsed, ('IR-854643041125', id_codec.KIND_ITEM, 'IR', '854643041125'))
+        self.assertEqual(id_codec.classify('PO-123456010125'), id_codec.KIND_PERSONNEL)
+        self.assertEqual(id_codec.classify('IP-A1'), id_codec.KIND_ITEM)
+
+        # Only the prefix is case-insensitive; the serial is kept as typed
+        self.assertEqual(id_codec.parse_id('pe-Ab1').value, 'PE-Ab1')
+
+    def test_malformed_ids(self):
+        for raw in ('', None, 'IR', 'IR-', 'XX-123', 'IR 123', 'QR:IR-123', 'IR-' + '9' * 50):
+            with self.subTest(raw=raw):
+                self.assertIsNone(id_codec.classify(raw))
+                with self.assertRaises(id_codec.InvalidId):
+                    id_codec.parse_id(raw)
+
+    def test_built_ids_round_trip(self):
+        self.assertEqual(id_codec.personnel_id('1', '010125', officer=True), 'PO-1010125')
+        self.assertEqual(id_codec.item_id('R', 'M16-1', '010125'), 'IR-M16-1010125')
+
+        officer = Personnel.objects.create(
+            surname='Codec', firstname='Test', rank='CPT',
+            serial='O-123456', office='HAS', tel='+639123456789',
+        )
+        item = Item.objects.create(item_type=Item.ITEM_TYPE_M16, serial='CODEC-1')
+        self.assertEqual(id_codec.parse_id(officer.id).prefix, id_codec.PREFIX_OFFICER)
+        self.assertEqual(id_codec.parse_id(item.id).prefix, id_codec.PREFIX_RIFLE)
+
+    def test_malformed_scan_costs_no_query(self):
+        with self.assertNumQueries(0):
+            result = parse_qr_code('not-an-id')
+        self.assertFalse(result['success'])
+        self.assertIn('Unrecognized ID', result['error'])
+
+
+@override_settings(RATELIMIT_ENABLE=False, SECURE_SSL_REDIRECT=False)
+class ConditionalLookupTest(TestCase):
+    """Lookup APIs - ETag and Last-Modified answer repeat scans with 304"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('scanner', password='x'))
+        self.person = Personnel.objects.create(
+            surname='Etag', firstname='Test', rank='AM',
+            serial='654321', office='HAS', tel='+639123456789',
+        )
+        self.item = Item.objects.create(item_type=Item.ITEM_TYPE_M16, serial='ETAG-1')
+
+    def test_personnel_not_modified(self):
+        url = f'/api/personnel/{self.person.id}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.person.id)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # The validators and the 304 share one lookup of the record
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(len([q for q in queries.captured_queries if '"personnel"' in q['sql']]), 1)
+
+        since = self.client.get(url, headers={'if-modified-since': response['Last-Modified']})
+        self.assertEqual(since.status_code, 304)
+
+        self.person.rank = 'SGT'
+        self.person.save()
+        changed = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertEqual(changed.json()['rank'], 'SGT')
+
+    def test_item_etag_follows_duty_and_rules(self):
+        url = f'/api/items/{self.item.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+
+        guard = self.client.get(url, {'duty_type': 'Guard'}, headers={'if-none-match': etag})
+        self.assertEqual(guard.status_code, 200)
+
+        AutofillRule.objects.create(duty_type='Guard', mags=2, rounds=60)
+        refreshed = self.client.get(url, {'duty_type': 'Guard'}, headers={'if-none-match': guard['ETag']})
+        self.assertEqual(refreshed.status_code, 200)
+
+    def test_missing_and_wrong_kind(self):
+        missing = self.client.get('/api/items/IR-MISSING/', headers={'if-none-match': '*'})
+        self.assertEqual(missing.status_code, 404)
+        self.assertFalse(missing.has_header('ETag'))
+
+        self.assertEqual(self.client.get(f'/api/personnel/{self.item.id}/').status_code, 400)
+        self.assertEqual(self.client.get('/api/items/not-an-id/').status_code, 404)
+
+
+@override_settings(RATELIMIT_ENABLE=False, SECURE_SSL_REDIRECT=False)
+class AsyncScanApiTest(TestCase):
+    """Async scan views answer like the sync ones, including conditional GETs"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('async-station', password='x')
+        self.item = Item.objects.create(item_type=Item.ITEM_TYPE_M16, serial='ASYNC-1')
+
+    def get(self, view, ref, **headers):
+        request = RequestFactory().get('/', headers=headers)
+        request.user = self.user
+
+        async def auser():
+            return self.user
+        request.auser = auser
+        return async_to_sync(view)(request, ref)
+
+    def test_item_lookup_and_not_modified(self):
+        response = self.get(async_api_views.get_item, self.item.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['id'], self.item.id)
+
+        cached = self.get(async_api_views.get_item, self.item.id, if_none_match=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        wrong_type = self.get(async_api_views.get_personnel, self.item.id)
+        self.assertEqual(wrong_type.status_code, 400)
@@ -9,6 +9,11 @@ from django.contrib.auth import views as auth_views
 from decouple import config
 from . import views
 from . import api_views
+from . import async_api_views
+
+# Scan lookups, single transactions and the live transaction stream are served
+# by the async views when ASYNC_SCAN_API is enabled (ASGI deployment profile)
+scan_api = async_api_views if settings.ASYNC_SCAN_API else api_views
 
 # Admin URL obfuscation - use environment variable
 ADMIN_URL = config('DJANGO_ADMIN_URL', default='superadmin')
@@ -26,9 +31,20 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     
     # API endpoints
-    path('api/personnel/<str:personnel_id>/', api_views.get_personnel, name='api_personnel'),
-    path('api/items/<str:item_id>/', api_views.get_item, name='api_item'),
-    path('api/transactions/', api_views.create_transaction, name='api_create_transaction'),
+    path('api/personnel/<str:personnel_id>/', scan_api.get_personnel, name='api_personnel'),
+    path('api/items/<str:item_id>/', scan_api.get_item, name='api_item'),
+    path('api/scan/pair/', api_views.scan_pair, name='api_scan_pair'),
+    path('api/lookup/', api_views.lookup_entities, name='api_lookup'),
+    path('api/transactions/', scan_api.create_transaction, name='api_create_transaction'),
+    path('api/transactions/stream/', scan_api.transaction_stream, name='api_transaction_stream'),
+    path('api/transactions/history/', api_views.get_transaction_history, name='api_transaction_history'),
+    path('api/transactions/batch/', api_views.create_transactions_batch, name='api_create_transactions_batch'),
+    path('api/transactions/sync/', api_views.sync_transactions, name='api_sync_transactions'),
+    path('api/ammunition/outstanding/', api_views.get_outstanding_ammunition, name='api_outstanding_ammunition'),
+    path('api/custody/', api_views.get_custody, name='api_custody'),
+    path('api/scan-cache/stats/', api_views.get_scan_cache_stats, name='api_scan_cache_stats'),
+    path('api/stock-take/<int:pk>/', api_views.stock_take_report, name='api_stock_take_report'),
+    path('api/stock-take/<int:pk>/scan/', api_views.stock_take_scan, name='api_stock_take_scan'),
     
     # App URLs
     path('personnel/', include('personnel.urls')),
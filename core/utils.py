@@ -1,10 +1,21 @@
 """
 Utility functions for ArmGuard
 """
-from qr_manager.models import QRCodeImage
 from personnel.models import Personnel
 from inventory.models import Item
+from django.conf import settings
+from django.core import signing
 from django.core.exceptions import ObjectDoesNotExist
+from . import id_codec, scan_cache
+import secrets
+import time
+
+# Signing salt for the tokens issued by resolve_scan_pair()
+SCAN_TOKEN_SALT = 'armguard.scan-pair'
+
+# Most IDs one bulk_lookup() call resolves (kept well under SQLite's
+# bound-parameter limit, since each table is one id__in query)
+BULK_LOOKUP_MAX_IDS = 5000
 
 
 def parse_qr_code(qr_data):
@@ -32,110 +43,89 @@ def parse_qr_code(qr_data):
         }
     
     try:
-        # Look up QR code in database
-        qr_code = QRCodeImage.objects.get(reference_id=qr_data)
-        
-        if qr_code.qr_type == 'personnel':
-            return get_personnel_from_qr(qr_data)
-        elif qr_code.qr_type == 'item':
-            return get_item_from_qr(qr_data)
-        else:
-            return {
-                'success': False,
-                'type': None,
-                'data': {},
-                'error': f'Unknown QR code type: {qr_code.qr_type}'
-            }
-            
-    except QRCodeImage.DoesNotExist:
-        # QR code not in system, try direct ID lookup
-        # First try personnel
-        personnel_result = get_personnel_by_id(qr_data)
-        if personnel_result['success']:
-            return personnel_result
-        
-        # Then try item
-        item_result = get_item_by_id(qr_data)
-        if item_result['success']:
-            return item_result
-        
+        parsed = id_codec.parse_id(qr_data)
+    except id_codec.InvalidId as e:
         return {
             'success': False,
             'type': None,
             'data': {},
-            'error': 'QR code not found in system and does not match any personnel or item ID'
+            'error': str(e)
         }
+    
+    return scan_cache.resolve(parsed.value, _resolve_id)
 
 
-def get_personnel_from_qr(qr_data):
-    """
-    Get personnel details from QR code data.
-    
-    Args:
-        qr_data (str): QR code reference ID
-        
-    Returns:
-        dict: Personnel details or error
-    """
-    try:
-        personnel = Personnel.objects.get(id=qr_data)
-        return {
-            'success': True,
-            'type': 'personnel',
-            'data': {
-                'id': personnel.id,
-                'firstname': personnel.firstname,
-                'surname': personnel.surname,
-                'middle_initial': personnel.middle_initial or '',
-                'full_name': personnel.get_full_name(),
-                'rank': personnel.rank,
-                'serial': personnel.serial,
-                'office': personnel.office,
-                'status': personnel.status,
-            },
-            'error': None
-        }
-    except Personnel.DoesNotExist:
+async def aparse_qr_code(qr_data):
+    """Async parse_qr_code() for async views - same result, async ORM lookup"""
+    if not qr_data:
         return {
             'success': False,
-            'type': 'personnel',
+            'type': None,
             'data': {},
-            'error': 'Personnel not found'
+            'error': 'No QR code data provided'
         }
-
-
-def get_item_from_qr(qr_data):
-    """
-    Get item details from QR code data.
     
-    Args:
-        qr_data (str): QR code reference ID
-        
-    Returns:
-        dict: Item details or error
-    """
     try:
-        item = Item.objects.get(id=qr_data)
-        return {
-            'success': True,
-            'type': 'item',
-            'data': {
-                'id': item.id,
-                'item_type': item.item_type,
-                'serial': item.serial,
-                'status': item.status,
-                'condition': item.condition,
-                'description': item.description or '',
-            },
-            'error': None
-        }
-    except Item.DoesNotExist:
+        parsed = id_codec.parse_id(qr_data)
+    except id_codec.InvalidId as e:
         return {
             'success': False,
-            'type': 'item',
+            'type': None,
             'data': {},
-            'error': 'Item not found'
+            'error': str(e)
         }
+    
+    return await scan_cache.aresolve(parsed.value, _aresolve_id)
+
+
+async def _aresolve_id(value):
+    """Async _resolve_id()"""
+    if id_codec.classify(value) == id_codec.KIND_PERSONNEL:
+        personnel = await Personnel.objects.filter(pk=value).afirst()
+        if personnel is None:
+            return {'success': False, 'type': 'personnel', 'data': {}, 'error': 'Personnel not found'}
+        return {'success': True, 'type': 'personnel', 'data': personnel_payload(personnel), 'error': None}
+    
+    item = await Item.objects.filter(pk=value).afirst()
+    if item is None:
+        return {'success': False, 'type': 'item', 'data': {}, 'error': 'Item not found'}
+    return {'success': True, 'type': 'item', 'data': item_payload(item), 'error': None}
+
+
+def _resolve_id(value):
+    """One primary-key lookup on the table the ID prefix names (uncached)"""
+    if id_codec.classify(value) == id_codec.KIND_PERSONNEL:
+        return get_personnel_by_id(value)
+    return get_item_by_id(value)
+
+
+def personnel_payload(personnel):
+    """Personnel details as returned by scan lookups"""
+    return {
+        'id': personnel.id,
+        'firstname': personnel.firstname,
+        'surname': personnel.surname,
+        'middle_initial': personnel.middle_initial or '',
+        'full_name': personnel.get_full_name(),
+        'rank': personnel.rank,
+        'serial': personnel.serial,
+        'office': personnel.office,
+        'status': personnel.status,
+        'updated_at': personnel.updated_at.isoformat(),
+    }
+
+
+def item_payload(item):
+    """Item details as returned by scan lookups"""
+    return {
+        'id': item.id,
+        'item_type': item.item_type,
+        'serial': item.serial,
+        'status': item.status,
+        'condition': item.condition,
+        'description': item.description or '',
+        'updated_at': item.updated_at.isoformat(),
+    }
 
 
 def get_personnel_by_id(personnel_id):
@@ -153,17 +143,7 @@ def get_personnel_by_id(personnel_id):
         return {
             'success': True,
             'type': 'personnel',
-            'data': {
-                'id': personnel.id,
-                'firstname': personnel.firstname,
-                'surname': personnel.surname,
-                'middle_initial': personnel.middle_initial or '',
-                'full_name': personnel.get_full_name(),
-                'rank': personnel.rank,
-                'serial': personnel.serial,
-                'office': personnel.office,
-                'status': personnel.status,
-            },
+            'data': personnel_payload(personnel),
             'error': None
         }
     except Personnel.DoesNotExist:
@@ -190,14 +170,7 @@ def get_item_by_id(item_id):
         return {
             'success': True,
             'type': 'item',
-            'data': {
-                'id': item.id,
-                'item_type': item.item_type,
-                'serial': item.serial,
-                'status': item.status,
-                'condition': item.condition,
-                'description': item.description or '',
-            },
+            'data': item_payload(item),
             'error': None
         }
     except Item.DoesNotExist:
@@ -212,6 +185,7 @@ def get_item_by_id(item_id):
 def get_transaction_autofill_data(item_type, duty_type):
     """
     Get auto-fill data for transaction form based on item type and duty type.
+    Served from the compiled AutofillRule table (transactions/autofill.py).
     
     Args:
         item_type (str): Type of item (e.g., 'GLOCK', 'M16')
@@ -223,25 +197,9 @@ def get_transaction_autofill_data(item_type, duty_type):
             'rounds': int
         }
     """
-    autofill_rules = {
-        ('GLOCK', 'Duty Sentinel'): {'mags': 4, 'rounds': 42},
-        ('GLOCK', 'Duty Security'): {'mags': 3, 'rounds': 30},
-        ('M16', 'Duty Sentinel'): {'mags': 3, 'rounds': 90},
-        ('M16', 'Guard Duty'): {'mags': 2, 'rounds': 60},
-        ('M4', 'Duty Sentinel'): {'mags': 3, 'rounds': 90},
-        ('.45', 'Duty Sentinel'): {'mags': 3, 'rounds': 21},
-    }
-    
-    # Normalize item type to uppercase
-    item_type_upper = item_type.upper() if item_type else ''
-    
-    # Check for exact match
-    key = (item_type_upper, duty_type)
-    if key in autofill_rules:
-        return autofill_rules[key]
-    
-    # Return empty values if no rule matches
-    return {'mags': 0, 'rounds': 0}
+    # Import here to avoid circular imports
+    from transactions import autofill
+    return autofill.rules().lookup(item_type, duty_type)
 
 
 def validate_transaction_action(item, action):
@@ -287,3 +245,191 @@ def validate_transaction_action(item, action):
             'valid': False,
             'message': f'Invalid action: {action}. Must be "Take" or "Return".'
         }
+
+
+def serialize_transaction(transaction):
+    """
+    Flatten a transaction with its personnel and item for JSON responses.
+    Expects personnel and item to be select_related.
+    
+    Args:
+        transaction (Transaction): Transaction instance
+        
+    Returns:
+        dict: Transaction details
+    """
+    return {
+        'id': transaction.id,
+        'date_time': transaction.date_time.isoformat(),
+        'queued_at': transaction.queued_at.isoformat() if transaction.queued_at else None,
+        'action': transaction.action,
+        'personnel_id': transaction.personnel_id,
+        'personnel_name': transaction.personnel.get_full_name(),
+        'personnel_rank': transaction.personnel.rank,
+        'item_id': transaction.item_id,
+        'item_type': transaction.item.item_type,
+        'item_serial': transaction.item.serial,
+        'mags': transaction.mags or 0,
+        'rounds': transaction.rounds or 0,
+        'duty_type': transaction.duty_type or '',
+        'notes': transaction.notes or '',
+        'archived': transaction.is_archived,
+    }
+
+
+def bulk_lookup(refs):
+    """
+    Resolve many scanned IDs at once - one id__in query per table.
+    
+    Args:
+        refs (list): Personnel and item IDs, mixed, in any case
+        
+    Returns:
+        dict: {
+            'results': {ref: {'type': 'personnel' | 'item', 'data': dict}},
+            'not_found': [refs that are malformed or match no record]
+        }
+    """
+    wanted = {id_codec.KIND_PERSONNEL: {}, id_codec.KIND_ITEM: {}}
+    not_found = []
+    for ref in dict.fromkeys(refs):
+        try:
+            parsed = id_codec.parse_id(ref)
+        except id_codec.InvalidId:
+            not_found.append(ref)
+            continue
+        wanted[parsed.kind].setdefault(parsed.value, []).append(ref)
+    
+    results = {}
+    for kind, model, payload in (
+        (id_codec.KIND_PERSONNEL, Personnel, personnel_payload),
+        (id_codec.KIND_ITEM, Item, item_payload),
+    ):
+        if not wanted[kind]:
+            continue
+        for record in model.objects.filter(id__in=list(wanted[kind])):
+            data = payload(record)
+            for ref in wanted[kind].pop(record.id):
+                results[ref] = {'type': kind, 'data': data}
+        for missing in wanted[kind].values():
+            not_found.extend(missing)
+    
+    return {'results': results, 'not_found': not_found}
+
+
+def resolve_scan_pair(personnel_ref, item_ref, action=None, duty_type=''):
+    """
+    Resolve a personnel scan and an item scan together for the issue window.
+    
+    Both rows come back with their active custody joined, so holder,
+    validation and autofill cost two primary-key queries in total.
+    If no action is given it is inferred from the item status.
+    
+    Args:
+        personnel_ref (str): Scanned personnel ID
+        item_ref (str): Scanned item ID
+        action (str): 'Take' or 'Return' (optional)
+        duty_type (str): Duty type for the autofill suggestion
+        
+    Returns:
+        dict: {
+            'success': bool,
+            'personnel': dict, 'item': dict, 'action': str,
+            'validation': {'valid': bool, 'message': str},
+            'autofill': {'mags': int, 'rounds': int},
+            'scan_token': str or None (only when valid),
+            'error': str (if success is False),
+            'status': int (HTTP status for errors)
+        }
+    """
+    refs = {}
+    for kind, ref in ((id_codec.KIND_PERSONNEL, personnel_ref), (id_codec.KIND_ITEM, item_ref)):
+        try:
+            parsed = id_codec.parse_id(ref)
+        except id_codec.InvalidId as e:
+            return {'success': False, 'error': str(e), 'status': 404}
+        if parsed.kind != kind:
+            return {'success': False, 'error': f'QR code is for {parsed.kind}, not {kind}', 'status': 400}
+        refs[kind] = parsed.value
+    
+    personnel = Personnel.objects.select_related('active_custody__item').filter(pk=refs['personnel']).first()
+    if personnel is None:
+        return {'success': False, 'error': 'Personnel not found', 'status': 404}
+    item = Item.objects.select_related('active_custody__personnel').filter(pk=refs['item']).first()
+    if item is None:
+        return {'success': False, 'error': 'Item not found', 'status': 404}
+    
+    held = getattr(personnel, 'active_custody', None)
+    custody = getattr(item, 'active_custody', None)
+    if not action:
+        action = 'Return' if item.status == Item.STATUS_ISSUED else 'Take'
+    
+    validation = validate_transaction_action(item, action)
+    if validation['valid'] and action == 'Take' and held:
+        validation = {
+            'valid': False,
+            'message': f'Item cannot be taken — personnel {personnel} already has an issued item: {held.item}'
+        }
+    
+    personnel_data = personnel_payload(personnel)
+    personnel_data['holding'] = held.item_id if held else None
+    item_data = item_payload(item)
+    item_data['holder'] = {
+        'id': custody.personnel.id,
+        'full_name': custody.personnel.get_full_name(),
+        'rank': custody.personnel.rank,
+        'since': custody.since.isoformat(),
+    } if custody else None
+    
+    return {
+        'success': True,
+        'personnel': personnel_data,
+        'item': item_data,
+        'action': action,
+        'validation': validation,
+        'autofill': get_transaction_autofill_data(item.item_type, duty_type),
+        'scan_token': make_scan_token(personnel.id, item.id, action) if validation['valid'] else None,
+    }
+
+
+def make_scan_token(personnel_id, item_id, action):
+    """
+    Sign a validated (personnel, item, action) pairing for the follow-up
+    commit. The token pins which scan may be committed, not whether it is
+    still valid - the item status and holder are checked again when it is
+    used. Its random nonce is recorded with the transaction it produced
+    (as an IdempotencyKey), so it is single-use.
+    """
+    payload = {'p': personnel_id, 'i': item_id, 'a': action, 'n': secrets.token_hex(16), 't': int(time.time())}
+    return signing.dumps(payload, salt=SCAN_TOKEN_SALT)
+
+
+def read_scan_token(token):
+    """
+    Verify a scan token from resolve_scan_pair().
+    
+    Expiry is measured to the server's clock when the token arrives, never
+    to a time the client reports, so a synced row cannot stretch its
+    token's lifetime with an early queued_at.
+    
+    Args:
+        token (str): The signed token
+    
+    Returns:
+        dict: {'personnel_id', 'item_id', 'action', 'key'} - key is the
+        IdempotencyKey that records the token as used
+    
+    Raises:
+        signing.BadSignature: if the token is forged, or was used more than
+            SCAN_TOKEN_MAX_AGE seconds after it was issued
+    """
+    payload = signing.loads(token, salt=SCAN_TOKEN_SALT)
+    max_age = getattr(settings, 'SCAN_TOKEN_MAX_AGE', 120)
+    if 'n' not in payload or time.time() - payload.get('t', 0) > max_age:
+        raise signing.SignatureExpired('Scan token expired')
+    return {
+        'personnel_id': payload['p'],
+        'item_id': payload['i'],
+        'action': payload['a'],
+        'key': f"scan-token:{payload['n']}",
+    }
@@ -6,10 +6,12 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout
 from django.contrib import messages
 from django.db.models import Count
-from datetime import datetime, timedelta
+from django.utils import timezone
+from datetime import timedelta
 from personnel.models import Personnel
 from inventory.models import Item
 from transactions.models import Transaction
+from transactions import rollups, live
 
 
 @login_required
@@ -32,11 +34,15 @@ def dashboard(request):
     items_by_type = Item.objects.values('item_type').annotate(count=Count('id'))
     
     # Recent Transactions
-    recent_transactions = Transaction.objects.select_related('personnel', 'item').order_by('-date_time')[:10]
+    recent_transactions = list(Transaction.objects.select_related('personnel', 'item').order_by('-date_time')[:10])
     
-    # Transactions this week
-    week_ago = datetime.now() - timedelta(days=7)
-    transactions_this_week = Transaction.objects.filter(date_time__gte=week_ago).count()
+    # Transactions this week (last 7 days, from the daily rollups)
+    week_start = timezone.localdate() - timedelta(days=6)
+    transactions_this_week = rollups.summarize(week_start)['count']
+    
+    # Live feed resume point - read after the counts and rows above, so a
+    # transaction posted while they ran is not both counted and replayed
+    live_last_event_id = live.latest_transaction_id()
     
     context = {
         'total_personnel': total_personnel,
@@ -50,6 +56,7 @@ def dashboard(request):
         'items_by_type': items_by_type,
         'recent_transactions': recent_transactions,
         'transactions_this_week': transactions_this_week,
+        'live_last_event_id': live_last_event_id,
     }
     
     return render(request, 'dashboard.html', context)
@@ -441,6 +441,21 @@ EOF
         journalctl -u gunicorn-armguard -n 20
         exit 1
     fi
+    
+    # Registrations only queue QR images; without this worker none are rendered
+    echo -e "${YELLOW}Installing QR render worker...${NC}"
+    cp "${PROJECT_DIR}/deployment/armguard-qr-worker.service" /etc/systemd/system/
+    systemctl daemon-reload
+    systemctl enable --now armguard-qr-worker
+    
+    sleep 2
+    if systemctl is-active --quiet armguard-qr-worker; then
+        echo -e "${GREEN}✓ QR render worker running${NC}"
+    else
+        echo -e "${RED}✗ QR render worker failed to start${NC}"
+        journalctl -u armguard-qr-worker -n 20
+        exit 1
+    fi
 }
 
 # Step 8: Configure Nginx
@@ -670,6 +685,7 @@ final_summary() {
     echo "Configuration:        ${PROJECT_DIR}/.env"
     echo ""
     echo "Gunicorn Service:     systemctl status gunicorn-armguard"
+    echo "QR Render Worker:     systemctl status armguard-qr-worker"
     echo "Nginx Service:        systemctl status nginx"
     echo "Application Logs:     /var/log/armguard/"
     echo ""
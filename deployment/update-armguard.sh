@@ -215,6 +215,11 @@ echo -e "${YELLOW}Collecting static files...${NC}"
 .venv/bin/python manage.py collectstatic --noinput --settings=core.settings_production > /dev/null 2>&1
 check_success "Static files collected"
 
+# Older versions kept the QR render cache under the public media directory
+echo -e "${YELLOW}Removing the old QR render cache from media...${NC}"
+rm -rf "$PROJECT_DIR/core/media/qr_codes/.render_cache" "$PROJECT_DIR/media/qr_codes/.render_cache"
+check_success "Old QR render cache removed"
+
 # Step 8: Fix permissions
 print_section "Step 8: Fixing Permissions"
 
@@ -254,6 +259,17 @@ else
     exit 1
 fi
 
+# Registrations only queue QR images - install the worker on servers
+# deployed before it existed, and restart it to pick up the new code
+echo -e "${YELLOW}Restarting QR render worker...${NC}"
+if [ ! -f /etc/systemd/system/armguard-qr-worker.service ]; then
+    cp "$PROJECT_DIR/deployment/armguard-qr-worker.service" /etc/systemd/system/
+    systemctl daemon-reload
+    systemctl enable armguard-qr-worker
+fi
+systemctl restart armguard-qr-worker
+check_success "QR render worker restarted"
+
 # Step 10: Verify deployment
 print_section "Step 10: Verifying Deployment"
 
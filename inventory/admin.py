@@ -2,7 +2,7 @@
 Inventory Admin Configuration
 """
 from django.contrib import admin
-from .models import Item
+from .models import Item, StockTake, StockTakeScan
 
 
 @admin.register(Item)
@@ -26,3 +26,22 @@ class ItemAdmin(admin.ModelAdmin):
         }),
     )
 
+
+@admin.register(StockTake)
+class StockTakeAdmin(admin.ModelAdmin):
+    """Admin interface for Stock Takes (read-only - counts run from the inventory pages)"""
+    
+    list_display = ['id', 'started_at', 'started_by', 'closed_at', 'notes']
+    list_filter = ['started_at', 'closed_at']
+    readonly_fields = ['started_by', 'started_at', 'closed_at', 'expected', 'report']
+    date_hierarchy = 'started_at'
+
+
+@admin.register(StockTakeScan)
+class StockTakeScanAdmin(admin.ModelAdmin):
+    """Admin interface for Stock Take Scans"""
+    
+    list_display = ['stock_take', 'item_ref', 'result', 'expected_status', 'duplicates', 'scanned_at']
+    list_filter = ['result', 'stock_take']
+    search_fields = ['item_ref']
+    readonly_fields = ['scanned_at']
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockTake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('expected', models.JSONField(default=dict)),
+                ('report', models.JSONField(blank=True, null=True)),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_takes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stock Take',
+                'verbose_name_plural': 'Stock Takes',
+                'db_table': 'stock_takes',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTakeScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_ref', models.CharField(max_length=50)),
+                ('result', models.CharField(choices=[('expected', 'Expected'), ('unexpected', 'Unexpected')], max_length=20)),
+                ('expected_status', models.CharField(blank=True, max_length=20)),
+                ('duplicates', models.PositiveIntegerField(default=0)),
+                ('scanned_at', models.DateTimeField(auto_now_add=True)),
+                ('scanned_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('stock_take', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scans', to='inventory.stocktake')),
+            ],
+            options={
+                'verbose_name': 'Stock Take Scan',
+                'verbose_name_plural': 'Stock Take Scans',
+                'db_table': 'stock_take_scans',
+                'ordering': ['scanned_at'],
+                'unique_together': {('stock_take', 'item_ref')},
+            },
+        ),
+    ]
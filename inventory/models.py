@@ -3,9 +3,11 @@ Inventory Models for ArmGuard
 Based on APP/app/backend/database.py items table
 """
 
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from core.validator import validate_item_data
+from core import id_codec
 
 
 class Item(models.Model):
@@ -102,9 +104,83 @@ class Item(models.Model):
             # Generate ID: I + R/P + serial + DDMMYY
             category = self.get_item_category()
             date_suffix = timezone.now().strftime('%d%m%y')
-            self.id = f"I{category}-{self.serial}{date_suffix}"
+            self.id = id_codec.item_id(category, self.serial, date_suffix)
         # Set QR code to ID if not set
         if not self.qr_code:
             self.qr_code = self.id
         super().save(*args, **kwargs)
 
+
+
+class StockTake(models.Model):
+    """
+    Stock take (inventory count) session. The expected item IDs and their
+    status are snapshotted when the count starts, so every scan is checked
+    against the snapshot rather than the live items table. Closing the
+    count freezes its report.
+    """
+    
+    started_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_takes'
+    )
+    started_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    notes = models.TextField(blank=True)
+    
+    # {item_id: status} when the count started
+    expected = models.JSONField(default=dict)
+    # Final report, written on close
+    report = models.JSONField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'stock_takes'
+        ordering = ['-started_at']
+        verbose_name = 'Stock Take'
+        verbose_name_plural = 'Stock Takes'
+    
+    def __str__(self):
+        return f"Stock take #{self.pk} ({self.started_at:%d/%m/%y %H:%M})"
+    
+    @property
+    def is_open(self):
+        return self.closed_at is None
+
+
+class StockTakeScan(models.Model):
+    """One scanned item in a stock take - repeat scans bump duplicates"""
+    
+    RESULT_EXPECTED = 'expected'
+    RESULT_UNEXPECTED = 'unexpected'
+    
+    RESULT_CHOICES = [
+        (RESULT_EXPECTED, 'Expected'),
+        (RESULT_UNEXPECTED, 'Unexpected'),
+    ]
+    
+    stock_take = models.ForeignKey(StockTake, on_delete=models.CASCADE, related_name='scans')
+    item_ref = models.CharField(max_length=50)
+    result = models.CharField(max_length=20, choices=RESULT_CHOICES)
+    expected_status = models.CharField(max_length=20, blank=True)
+    duplicates = models.PositiveIntegerField(default=0)
+    scanned_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    scanned_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'stock_take_scans'
+        ordering = ['scanned_at']
+        verbose_name = 'Stock Take Scan'
+        verbose_name_plural = 'Stock Take Scans'
+        unique_together = ['stock_take', 'item_ref']
+    
+    def __str__(self):
+        return f"{self.item_ref} ({self.result})"
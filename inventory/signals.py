@@ -14,9 +14,9 @@ from qr_manager.models import QRCodeImage
 
 @receiver(post_save, sender=Item)
 def generate_item_qr_code(sender, instance, created, **kwargs):
-    """Generate QR code for item after save"""
+    """Queue the QR code for item after save"""
     # Create/update QRCodeImage for this item
-    # The QRCodeImage model's save() method will automatically generate the PNG file
+    # The QRCodeImage model's save() method queues the PNG for the render worker
     qr_obj, _ = QRCodeImage.objects.get_or_create(
         qr_type=QRCodeImage.TYPE_ITEM,
         reference_id=instance.id,
@@ -24,8 +24,10 @@ def generate_item_qr_code(sender, instance, created, **kwargs):
             'qr_data': instance.id,
         }
     )
-    # Update qr_data if needed
+    # Update qr_data if needed - the old image encodes the old data
     if qr_obj.qr_data != instance.id:
         qr_obj.qr_data = instance.id
+        if qr_obj.qr_image:
+            qr_obj.qr_image.delete(save=False)
         qr_obj.save()
 
@@ -0,0 +1,160 @@
+"""
+Stock take (inventory count) for ArmGuard
+A count snapshots {item_id: status} once when it starts. Each worker process
+keeps the snapshot of open counts in memory, so a scan is a dictionary
+membership check plus one insert - the items table is never read per scan.
+
+Scans are stored rather than kept in process memory because the app runs
+several worker processes and a count must survive a restart. A repeat scan
+hits the (stock take, item) unique constraint and is reported as a duplicate.
+"""
+import threading
+import time
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from core import id_codec
+from .models import Item, StockTake, StockTakeScan
+
+SCAN_EXPECTED = StockTakeScan.RESULT_EXPECTED
+SCAN_UNEXPECTED = StockTakeScan.RESULT_UNEXPECTED
+SCAN_DUPLICATE = 'duplicate'
+
+# Seconds a process trusts its copy of a count's open/closed state. Scans
+# another process still accepts right after a close are stored but do not
+# change the frozen report.
+SNAPSHOT_TTL = 30
+
+_lock = threading.Lock()
+_snapshots = {}
+
+
+class StockTakeClosed(Exception):
+    """Raised when scanning into a stock take that has been closed"""
+
+
+def start(user=None, notes=''):
+    """Snapshot every item's current status into a new stock take"""
+    expected = dict(Item.objects.values_list('id', 'status'))
+    return StockTake.objects.create(started_by=user, notes=notes, expected=expected)
+
+
+def _snapshot(stock_take_id):
+    """
+    Expected {item_id: status} of an open stock take, from this process's copy.
+
+    Raises:
+        StockTake.DoesNotExist: unknown stock take
+        StockTakeClosed: the stock take has been closed
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _snapshots.get(stock_take_id)
+    if entry is None or entry[0] < now:
+        stock_take = StockTake.objects.only('expected', 'closed_at').get(pk=stock_take_id)
+        if not stock_take.is_open:
+            forget(stock_take_id)
+            raise StockTakeClosed(f'Stock take #{stock_take_id} is closed')
+        entry = (now + SNAPSHOT_TTL, stock_take.expected)
+        with _lock:
+            _snapshots[stock_take_id] = entry
+    return entry[1]
+
+
+def forget(stock_take_id):
+    """Drop this process's copy of a stock take's snapshot"""
+    with _lock:
+        _snapshots.pop(stock_take_id, None)
+
+
+def record_scan(stock_take_id, ref, user=None):
+    """
+    Check a scanned ID against the snapshot and record it.
+
+    Returns:
+        dict: {'item_id', 'result': expected | unexpected | duplicate,
+               'expected_status': snapshot status or ''}
+
+    Raises:
+        id_codec.InvalidId: the scan is not an item ID
+        StockTake.DoesNotExist / StockTakeClosed
+    """
+    parsed = id_codec.parse_id(ref)
+    if parsed.kind != id_codec.KIND_ITEM:
+        raise id_codec.InvalidId(f'{parsed.value} is a {parsed.kind} ID, not an item')
+
+    expected_status = _snapshot(stock_take_id).get(parsed.value, '')
+    result = SCAN_EXPECTED if expected_status else SCAN_UNEXPECTED
+    try:
+        with transaction.atomic():
+            StockTakeScan.objects.create(
+                stock_take_id=stock_take_id,
+                item_ref=parsed.value,
+                result=result,
+                expected_status=expected_status,
+                scanned_by=user,
+            )
+    except IntegrityError:
+        StockTakeScan.objects.filter(
+            stock_take_id=stock_take_id, item_ref=parsed.value
+        ).update(duplicates=F('duplicates') + 1)
+        result = SCAN_DUPLICATE
+    return {'item_id': parsed.value, 'result': result, 'expected_status': expected_status}
+
+
+def build_report(stock_take):
+    """
+    Reconcile a stock take's scans against its snapshot.
+
+    Returns:
+        dict: {
+            'by_status': [{'status', 'expected', 'found', 'missing': [item_id, ...]}],
+            'unexpected': [item_id, ...],
+            'duplicates': [{'item_id', 'count'}],
+            'scanned': int, 'expected': int, 'missing': int,
+        }
+    """
+    found = set()
+    unexpected = []
+    duplicates = []
+    for item_ref, result, repeats in stock_take.scans.values_list('item_ref', 'result', 'duplicates'):
+        if result == SCAN_EXPECTED:
+            found.add(item_ref)
+        else:
+            unexpected.append(item_ref)
+        if repeats:
+            duplicates.append({'item_id': item_ref, 'count': repeats})
+
+    by_status = {}
+    for item_id, status in stock_take.expected.items():
+        row = by_status.setdefault(status, {'status': status, 'expected': 0, 'found': 0, 'missing': []})
+        row['expected'] += 1
+        if item_id in found:
+            row['found'] += 1
+        else:
+            row['missing'].append(item_id)
+    for row in by_status.values():
+        row['missing'].sort()
+
+    return {
+        'by_status': [by_status[status] for status, _ in Item.STATUS_CHOICES if status in by_status],
+        'unexpected': sorted(unexpected),
+        'duplicates': duplicates,
+        'scanned': len(found) + len(unexpected),
+        'expected': len(stock_take.expected),
+        'missing': len(stock_take.expected) - len(found),
+    }
+
+
+def report(stock_take):
+    """Frozen report of a closed stock take, or the live one of an open count"""
+    return stock_take.report if stock_take.report is not None else build_report(stock_take)
+
+
+def close(stock_take):
+    """Close a stock take and freeze its report"""
+    stock_take.report = build_report(stock_take)
+    stock_take.closed_at = timezone.now()
+    stock_take.save(update_fields=['report', 'closed_at'])
+    forget(stock_take.pk)
+    return stock_take
@@ -1,3 +1,45 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import stocktake
+from .models import Item
+
+
+def make_item(serial):
+    return Item.objects.create(item_type=Item.ITEM_TYPE_M16, serial=serial)
+
+
+@override_settings(RATELIMIT_ENABLE=False, SECURE_SSL_REDIRECT=False)
+class StockTakeTest(TestCase):
+    """Stock take - scans checked against the snapshot, not the items table"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('counter', password='x'))
+        self.items = [make_item(f'COUNT-{n}') for n in range(3)]
+
+    def scan(self, count, ref):
+        return self.client.post(f'/api/stock-take/{count.pk}/scan/', json.dumps({'id': ref}), content_type='application/json')
+
+    def test_count_reconciles(self):
+        count = stocktake.start()
+        late = make_item('COUNT-LATE')  # registered after the snapshot
+
+        self.assertEqual(self.scan(count, self.items[0].id).json()['result'], 'expected')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.scan(count, self.items[1].id).json()['result'], 'expected')
+        self.assertFalse([q for q in queries.captured_queries if '"items"' in q['sql'] or '"stock_takes"' in q['sql']])
+        self.assertEqual(self.scan(count, self.items[1].id).json()['result'], 'duplicate')
+        self.assertEqual(self.scan(count, late.id).json()['result'], 'unexpected')
+        self.assertEqual(self.scan(count, 'PE-123').status_code, 400)
+
+        report = self.client.get(f'/api/stock-take/{count.pk}/').json()
+        self.assertEqual(report['by_status'][0]['missing'], [self.items[2].id])
+        self.assertEqual(report['unexpected'], [late.id])
+        self.assertEqual(report['duplicates'], [{'item_id': self.items[1].id, 'count': 1}])
+
+        self.client.post(f'/inventory/stock-take/{count.pk}/close/')
+        self.assertEqual(self.scan(count, self.items[2].id).status_code, 409)
@@ -1,10 +1,16 @@
 from django.urls import path
-from .views import ItemListView, ItemDetailView, update_item_status
+from .views import (
+    ItemListView, ItemDetailView, update_item_status,
+    stock_take_list, stock_take_detail, close_stock_take,
+)
 
 app_name = 'inventory'
 
 urlpatterns = [
     path('', ItemListView.as_view(), name='item_list'),
+    path('stock-take/', stock_take_list, name='stock_take_list'),
+    path('stock-take/<int:pk>/', stock_take_detail, name='stock_take_detail'),
+    path('stock-take/<int:pk>/close/', close_stock_take, name='close_stock_take'),
     path('<str:pk>/', ItemDetailView.as_view(), name='item_detail'),
     path('<str:pk>/update-status/', update_item_status, name='update_item_status'),
 ]
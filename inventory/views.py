@@ -6,7 +6,13 @@ from django.views.generic import ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Item
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Item, StockTake
+from . import stocktake
+
+# Custody intervals listed on the item detail page
+CUSTODY_HISTORY_ROWS = 50
 
 
 class ItemListView(LoginRequiredMixin, ListView):
@@ -57,6 +63,26 @@ class ItemDetailView(LoginRequiredMixin, DetailView):
             )
         except QRCodeImage.DoesNotExist:
             context['qr_code_obj'] = None
+        context.update(self.get_custody_context())
+        return context
+    
+    def get_custody_context(self):
+        """Custody history and the "who held it at" lookup"""
+        # Import here to avoid circular imports
+        from transactions import custody
+        context = {
+            'custody_intervals': custody.intervals(item_id=self.object.id)[:CUSTODY_HISTORY_ROWS],
+            'custody_at': self.request.GET.get('at', ''),
+        }
+        if context['custody_at']:
+            at = parse_datetime(context['custody_at'])
+            if at is None:
+                context['custody_at_error'] = 'Enter a valid date and time.'
+            else:
+                if timezone.is_naive(at):
+                    at = timezone.make_aware(at)
+                context['custody_held_at'] = custody.held_at(self.object.id, at)
+                context['custody_at_checked'] = True
         return context
 
 
@@ -88,3 +114,41 @@ def update_item_status(request, pk):
     messages.success(request, f'Item status changed from "{old_status}" to "{new_status}".')
     return redirect('inventory:item_detail', pk=pk)
 
+
+
+@login_required
+def stock_take_list(request):
+    """Past and open stock takes; POST starts a new count"""
+    if request.method == 'POST':
+        count = stocktake.start(user=request.user, notes=request.POST.get('notes', '').strip())
+        messages.success(request, f'Stock take #{count.pk} started with {len(count.expected)} items expected.')
+        return redirect('inventory:stock_take_detail', pk=count.pk)
+    
+    context = {
+        'stock_takes': StockTake.objects.select_related('started_by').defer('expected')[:50],
+    }
+    return render(request, 'inventory/stock_take_list.html', context)
+
+
+@login_required
+def stock_take_detail(request, pk):
+    """Count screen - scan items and watch missing / unexpected / duplicates"""
+    count = get_object_or_404(StockTake, pk=pk)
+    context = {
+        'stock_take': count,
+        'report': stocktake.report(count),
+    }
+    return render(request, 'inventory/stock_take_detail.html', context)
+
+
+@login_required
+def close_stock_take(request, pk):
+    """Close a stock take and freeze its report"""
+    if request.method != 'POST':
+        return redirect('inventory:stock_take_detail', pk=pk)
+    
+    count = get_object_or_404(StockTake, pk=pk)
+    if count.is_open:
+        stocktake.close(count)
+        messages.success(request, f'Stock take #{count.pk} closed - {count.report["missing"]} items missing.')
+    return redirect('inventory:stock_take_detail', pk=pk)
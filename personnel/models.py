@@ -6,6 +6,7 @@ from django.db import models
 from django.core.validators import RegexValidator, FileExtensionValidator
 from django.utils import timezone
 from django.contrib.auth.models import User
+from core import id_codec
 
 
 class Personnel(models.Model):
@@ -143,10 +144,9 @@ class Personnel(models.Model):
 
         if not self.id:
             # Generate ID: PE/PO + serial + DDMMYY
-            prefix = 'PO' if self.is_officer() else 'PE'
             date_suffix = timezone.now().strftime('%d%m%y')
             clean_serial = self.serial.replace('O-', '') if self.is_officer() else self.serial
-            self.id = f"{prefix}-{clean_serial}{date_suffix}"
+            self.id = id_codec.personnel_id(clean_serial, date_suffix, officer=self.is_officer())
         # Set QR code to ID if not set
         if not self.qr_code:
             self.qr_code = self.id
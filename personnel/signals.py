@@ -14,9 +14,9 @@ from qr_manager.models import QRCodeImage
 
 @receiver(post_save, sender=Personnel)
 def generate_personnel_qr_code(sender, instance, created, **kwargs):
-    """Generate QR code for personnel after save"""
+    """Queue the QR code for personnel after save"""
     # Create/update QRCodeImage for this personnel
-    # The QRCodeImage model's save() method will automatically generate the PNG file
+    # The QRCodeImage model's save() method queues the PNG for the render worker
     qr_obj, _ = QRCodeImage.objects.get_or_create(
         qr_type=QRCodeImage.TYPE_PERSONNEL,
         reference_id=instance.id,
@@ -24,7 +24,9 @@ def generate_personnel_qr_code(sender, instance, created, **kwargs):
             'qr_data': instance.id,
         }
     )
-    # Update qr_data if needed
+    # Update qr_data if needed - the old image encodes the old data
     if qr_obj.qr_data != instance.id:
         qr_obj.qr_data = instance.id
+        if qr_obj.qr_image:
+            qr_obj.qr_image.delete(save=False)
         qr_obj.save()
@@ -3,6 +3,7 @@ Print Handler Views - Super Simple
 """
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q
 from qr_manager.models import QRCodeImage
 from transactions.models import Transaction
 from personnel.models import Personnel
@@ -15,8 +16,18 @@ def print_qr_codes(request):
     """Simple QR code printing"""
     qr_type = request.GET.get('type', 'all')
     
-    personnel_qrcodes = QRCodeImage.objects.filter(qr_type='personnel') if qr_type in ['all', 'personnel'] else QRCodeImage.objects.none()
-    item_qrcodes = QRCodeImage.objects.filter(qr_type='item') if qr_type in ['all', 'items'] else QRCodeImage.objects.none()
+    # Codes still queued for the render worker have no image to print yet;
+    # the page says how many were left out
+    unrendered = Q(qr_image='') | Q(qr_image__isnull=True)
+    types = []
+    if qr_type in ['all', 'personnel']:
+        types.append('personnel')
+    if qr_type in ['all', 'items']:
+        types.append('item')
+    rendered = QRCodeImage.objects.exclude(unrendered)
+    personnel_qrcodes = rendered.filter(qr_type='personnel') if 'personnel' in types else QRCodeImage.objects.none()
+    item_qrcodes = rendered.filter(qr_type='item') if 'item' in types else QRCodeImage.objects.none()
+    pending_qrcodes = QRCodeImage.objects.filter(unrendered, qr_type__in=types).count()
     
     # Add names to QR codes
     for qr in personnel_qrcodes:
@@ -36,6 +47,7 @@ def print_qr_codes(request):
     context = {
         'personnel_qrcodes': personnel_qrcodes,
         'item_qrcodes': item_qrcodes,
+        'pending_qrcodes': pending_qrcodes,
         'qr_type': qr_type,
         'qr_size_mm': QR_SIZE_MM,
         'cards_per_row': CARDS_PER_ROW,
@@ -2,7 +2,7 @@
 QR Code Admin Configuration
 """
 from django.contrib import admin
-from .models import QRCodeImage
+from .models import QRCodeImage, QRRenderJob
 
 
 @admin.register(QRCodeImage)
@@ -14,3 +14,15 @@ class QRCodeImageAdmin(admin.ModelAdmin):
     search_fields = ['reference_id', 'qr_data']
     readonly_fields = ['qr_image', 'created_at', 'updated_at']
 
+
+@admin.register(QRRenderJob)
+class QRRenderJobAdmin(admin.ModelAdmin):
+    """Admin interface for queued QR renders (failed jobs keep their last error)"""
+    
+    list_display = ['qr_code', 'requested_at', 'run_after', 'claimed_at', 'attempts']
+    list_filter = ['attempts']
+    search_fields = ['qr_code__reference_id']
+    readonly_fields = ['qr_code', 'requested_at', 'claimed_at', 'attempts', 'last_error']
+    
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,109 @@
+"""
+QR render queue for ArmGuard
+Rendering a print-resolution QR PNG takes long enough to hold up a
+registration, so saving a QRCodeImage without an image only records a
+QRRenderJob row. The process_qr_jobs worker renders queued codes; pages show
+a placeholder until the image exists.
+
+Workers claim jobs with a conditional UPDATE on claimed_at, so several
+workers never render the same code. A claim older than CLAIM_TIMEOUT belongs
+to a worker that died and is taken over. A job re-requested while it renders
+(the encoded data changed) stays queued and is rendered again.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import QRRenderJob
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a claimed job is considered abandoned
+CLAIM_TIMEOUT = 300
+
+# Failed renders are retried with backoff, then left for an admin to inspect
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 30
+
+
+def _inline():
+    return getattr(settings, 'QR_RENDER_INLINE', False)
+
+
+def enqueue(qr_code):
+    """
+    Queue a QR code for rendering. Re-queuing an already queued code resets
+    its retries instead of adding a second job.
+    """
+    now = timezone.now()
+    job, created = QRRenderJob.objects.get_or_create(qr_code=qr_code, defaults={'requested_at': now, 'run_after': now})
+    if not created:
+        QRRenderJob.objects.filter(pk=job.pk).update(requested_at=now, run_after=now, attempts=0, last_error='')
+    if _inline():
+        # No worker (development) - render in this process once the row is committed
+        db_transaction.on_commit(lambda: run(job_ids=[job.pk]))
+    return job
+
+
+def pending_count():
+    """Jobs waiting for a worker, including ones backing off after a failure"""
+    return QRRenderJob.objects.filter(attempts__lt=MAX_ATTEMPTS).count()
+
+
+def claim(batch_size, job_ids=None):
+    """
+    Claim up to batch_size due jobs for this worker.
+
+    Returns:
+        list: Claimed QRRenderJob instances with qr_code loaded
+    """
+    now = timezone.now()
+    due = (
+        QRRenderJob.objects.filter(run_after__lte=now, attempts__lt=MAX_ATTEMPTS)
+        .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT)))
+    )
+    if job_ids is not None:
+        due = due.filter(pk__in=job_ids)
+    claimed = [
+        pk for pk, claimed_at in due.order_by('run_after').values_list('pk', 'claimed_at')[:batch_size]
+        if QRRenderJob.objects.filter(pk=pk, claimed_at=claimed_at).update(claimed_at=now)
+    ]
+    return list(QRRenderJob.objects.select_related('qr_code').filter(pk__in=claimed).order_by('run_after'))
+
+
+def render(qr_code):
+    """Render a QR code's image, replacing any previous file"""
+    qr_code.generate_qr_code()
+    # Only the image - the encoded data may have been changed since it was read
+    qr_code.save(update_fields=['qr_image', 'render_hash', 'updated_at'])
+
+
+def run(batch_size=20, job_ids=None):
+    """
+    Claim and render one batch of jobs.
+
+    Returns:
+        dict: {'claimed': int, 'rendered': int, 'failed': int}
+    """
+    jobs = claim(batch_size, job_ids)
+    rendered = failed = 0
+    for job in jobs:
+        try:
+            render(job.qr_code)
+        except Exception as e:
+            failed += 1
+            logger.exception('QR render failed for %s', job.qr_code)
+            QRRenderJob.objects.filter(pk=job.pk).update(
+                claimed_at=None,
+                attempts=F('attempts') + 1,
+                last_error=str(e)[:1000],
+                run_after=timezone.now() + timedelta(seconds=RETRY_BACKOFF * 2 ** job.attempts),
+            )
+            continue
+        rendered += 1
+        # Keep the job if it was re-requested while rendering
+        if not QRRenderJob.objects.filter(pk=job.pk, requested_at=job.requested_at).delete()[0]:
+            QRRenderJob.objects.filter(pk=job.pk).update(claimed_at=None)
+    return {'claimed': len(jobs), 'rendered': rendered, 'failed': failed}
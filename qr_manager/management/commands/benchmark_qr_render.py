@@ -0,0 +1,62 @@
+"""
+Management command to compare QR renderers
+
+Renders the same codes with the original renderer and with each current
+rasterizer, bypassing the render cache, and reports per-code time for
+building the image and for image + PNG encode.
+"""
+import statistics
+import time
+from io import BytesIO
+from django.core.management.base import BaseCommand
+from utils.qr_generator import RASTERIZERS, RENDER_SETTINGS, generate_qr_code
+
+# The renderer before the rasterizer change: render at box_size, LANCZOS
+# resize, RGB image, optimized PNG
+ORIGINAL = {'rasterizer': 'resample', 'resample': 'LANCZOS', 'mode': 'RGB', 'optimize': True}
+
+
+class Command(BaseCommand):
+    help = 'Time per-code QR rendering - original renderer vs each rasterizer (render cache bypassed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--codes', type=int, default=200, help='Codes rendered per case (default: 200)')
+        parser.add_argument('--size', type=int, default=600, help='Output size in pixels (default: 600)')
+
+    def handle(self, *args, **options):
+        data = [f"IR-{854643041125 + n}" for n in range(max(1, options['codes']))]
+        size = options['size']
+        self.stdout.write(f"Rendering {len(data)} codes at {size}px per case...")
+
+        cases = {'original': ORIGINAL}
+        cases.update((rasterizer, {'rasterizer': rasterizer}) for rasterizer in RASTERIZERS)
+
+        results = {}
+        for name, overrides in cases.items():
+            settings = {**RENDER_SETTINGS, **overrides}
+            # Warm up imports and allocator
+            generate_qr_code(data[0], size=size, **overrides)
+            image_ms, total_ms, png_bytes = [], [], 0
+            for value in data:
+                started = time.perf_counter()
+                img = generate_qr_code(value, size=size, **overrides)
+                built = time.perf_counter()
+                buffer = BytesIO()
+                img.save(buffer, format='PNG', optimize=settings['optimize'], dpi=(settings['dpi'], settings['dpi']))
+                done = time.perf_counter()
+                image_ms.append((built - started) * 1000)
+                total_ms.append((done - started) * 1000)
+                png_bytes += buffer.tell()
+            results[name] = statistics.mean(total_ms)
+            self.stdout.write(
+                f"  {name:<9} image p50 {statistics.median(image_ms):6.2f} ms, "
+                f"image + PNG mean {statistics.mean(total_ms):6.2f} ms "
+                f"(p95 {sorted(total_ms)[int(len(total_ms) * 0.95) - 1]:6.2f} ms), "
+                f"{png_bytes // len(data)} bytes/code"
+            )
+
+        current = RENDER_SETTINGS['rasterizer']
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ current settings ({current} rasterizer, {RENDER_SETTINGS['mode']} mode): "
+            f"{results['original'] / results[current]:.1f}x faster per code than the original renderer"
+        ))
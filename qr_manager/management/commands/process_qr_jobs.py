@@ -0,0 +1,71 @@
+"""
+Management command to run the QR render worker
+
+Renders queued QR code images (see qr_manager/jobs.py), and prunes the
+render cache hourly. Run it as a service next to the web workers, or with
+--once from cron.
+"""
+import signal
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from qr_manager import jobs
+from qr_manager.models import prune_render_cache
+
+# Seconds between render cache prunes while the worker runs
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Render queued QR code images until stopped (or once with --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Render everything currently due, then exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Jobs claimed per round (default: 20)',
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        batch_size = max(1, options['batch_size'])
+        self.stdout.write(f"QR render worker started - {jobs.pending_count()} jobs queued")
+        rendered = failed = 0
+        next_prune = 0
+        while not self.stopping:
+            if time.monotonic() >= next_prune:
+                removed, freed, _ = prune_render_cache()
+                if removed:
+                    self.stdout.write(f"  ✓ Pruned {removed} cached renders ({freed} bytes)")
+                next_prune = time.monotonic() + PRUNE_INTERVAL
+            close_old_connections()
+            result = jobs.run(batch_size)
+            rendered += result['rendered']
+            failed += result['failed']
+            if result['claimed']:
+                self.stdout.write(f"  ✓ Rendered {result['rendered']}, failed {result['failed']}")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['idle_sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"\n✓ Worker stopped: {rendered} rendered, {failed} failed"))
+
+    def stop(self, signum, frame):
+        """Finish the current batch, then exit"""
+        self.stopping = True
@@ -0,0 +1,32 @@
+"""
+Management command to prune the QR render cache
+
+Deletes cached renders unused for QR_RENDER_CACHE_MAX_AGE_DAYS, then the
+least recently used ones until the cache fits in QR_RENDER_CACHE_MAX_MB.
+The QR worker does this hourly; run it from cron where there is no worker.
+"""
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from qr_manager.models import prune_render_cache
+
+
+class Command(BaseCommand):
+    help = 'Delete old QR renders until the render cache is within its age and size limits'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-days',
+            type=int,
+            help='Delete renders unused for this many days (default: QR_RENDER_CACHE_MAX_AGE_DAYS, 0 = no limit)',
+        )
+        parser.add_argument(
+            '--max-mb',
+            type=int,
+            help='Trim the cache to this many MB (default: QR_RENDER_CACHE_MAX_MB, 0 = no limit)',
+        )
+
+    def handle(self, *args, **options):
+        removed, freed, kept = prune_render_cache(options['max_age_days'], options['max_mb'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Pruned {removed} cached renders ({filesizeformat(freed)}), {filesizeformat(kept)} kept"
+        ))
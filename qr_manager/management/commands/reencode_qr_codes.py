@@ -0,0 +1,68 @@
+"""
+Management command to re-encode stored QR images in the current output mode
+
+Images from older settings (RGB truecolour, LANCZOS-resampled) are replaced
+by the compact 1-bit palette PNG. A blurred RGB file cannot be reduced to
+two colours without guessing at module edges, so each image is re-rendered
+from its encoded data through the render cache rather than converted.
+"""
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from qr_manager.models import QRCodeImage
+from utils.qr_generator import render_png
+
+
+class Command(BaseCommand):
+    help = 'Re-encode stored QR images as compact palette PNGs and report the bytes saved'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many bytes re-encoding would save',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        qr_codes = QRCodeImage.objects.exclude(qr_image='').exclude(qr_image__isnull=True).order_by('pk')
+        total = qr_codes.count()
+        self.stdout.write(f"Found {total} stored QR images to check...")
+
+        reencoded = unchanged = failed = 0
+        old_bytes = new_bytes = 0
+        for checked, qr_code in enumerate(qr_codes.iterator(chunk_size=200), start=1):
+            if not qr_code.is_stale:
+                unchanged += 1
+                continue
+            try:
+                try:
+                    before = qr_code.qr_image.size
+                except FileNotFoundError:
+                    before = 0
+                if dry_run:
+                    # Sizing only - nothing is written, not even to the render cache
+                    after = len(render_png(qr_code.qr_data, cache_dir=None)[1])
+                else:
+                    qr_code.generate_qr_code()
+                    qr_code.save(update_fields=['qr_image', 'render_hash', 'updated_at'])
+                    after = qr_code.qr_image.size
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(
+                    f"✗ Failed to re-encode {qr_code.qr_type} QR {qr_code.reference_id}: {str(e)}"
+                ))
+                continue
+            reencoded += 1
+            old_bytes += before
+            new_bytes += after
+            if reencoded % 100 == 0:
+                self.stdout.write(
+                    f"  ✓ {checked}/{total} - {filesizeformat(old_bytes)} -> {filesizeformat(new_bytes)}"
+                )
+
+        verb = 'would save' if dry_run else 'saved'
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ Re-encode {'estimate' if dry_run else 'complete'}: {reencoded} re-encoded, "
+            f"{unchanged} already current, {failed} failed - "
+            f"{filesizeformat(old_bytes)} -> {filesizeformat(new_bytes)}, {verb} {filesizeformat(old_bytes - new_bytes)}"
+        ))
@@ -1,42 +1,166 @@
 """
 Management command to regenerate all QR codes with new format
+
+PNGs are rendered in a process pool (--workers) through the shared render
+cache, so renders that already exist are read back instead of redone; files
+and rows are written by this process. Progress is checkpointed after every
+batch, so an interrupted run resumes where it stopped. --only-stale skips
+codes whose image was rendered from the same data and render settings.
 """
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
-from qr_manager.models import QRCodeImage
+from django.utils import timezone
+from qr_manager.models import QRCodeImage, QRRenderJob, render_cache_dir
+from utils import qr_generator
+
+
+def render_png(data, cache_dir=None):
+    """Render one QR code in a pool process. Returns (signature, png bytes, error)"""
+    try:
+        return (*qr_generator.render_png(data, cache_dir=cache_dir), None)
+    except Exception as e:
+        return None, None, str(e)
 
 
 class Command(BaseCommand):
     help = 'Regenerate all QR codes with updated format (cleaner, standard layout)'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes rendering PNGs in parallel (default: 1)',
+        )
+        parser.add_argument(
+            '--only-stale',
+            action='store_true',
+            help='Skip codes already rendered from the same data and render settings',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Codes rendered and checkpointed per batch (default: 100)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=None,
+            help='Checkpoint file (default: MEDIA_ROOT/qr_codes/.regenerate_checkpoint.json)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and start from the first code',
+        )
+
     def handle(self, *args, **options):
-        qr_codes = QRCodeImage.objects.all()
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+        only_stale = options['only_stale']
+        checkpoint = Path(options['checkpoint'] or Path(settings.MEDIA_ROOT) / 'qr_codes' / '.regenerate_checkpoint.json')
+
+        qr_codes = QRCodeImage.objects.order_by('pk')
+        last_pk = None if options['restart'] else self.read_checkpoint(checkpoint, only_stale)
+        if last_pk is not None:
+            qr_codes = qr_codes.filter(pk__gt=last_pk)
+            self.stdout.write(f"Resuming after QR code #{last_pk} (use --restart to start over)")
         total = qr_codes.count()
-        
-        self.stdout.write(f"Found {total} QR codes to regenerate...")
-        
-        success_count = 0
-        error_count = 0
-        
-        for qr_code in qr_codes:
+
+        self.stdout.write(
+            f"Found {total} QR codes to {'check' if only_stale else 'regenerate'} "
+            f"with {workers} worker{'s' if workers > 1 else ''}..."
+        )
+
+        self.started = time.monotonic()
+        self.checked = self.success_count = self.error_count = self.skipped = 0
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            rows = qr_codes.iterator(chunk_size=batch_size)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                self.checked += len(batch)
+                stale = [qr_code for qr_code in batch if not only_stale or qr_code.is_stale]
+                self.skipped += len(batch) - len(stale)
+                self.regenerate(stale, pool)
+                self.write_checkpoint(checkpoint, batch[-1].pk, only_stale)
+                self.report_progress(total)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        checkpoint.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ Regeneration complete: {self.success_count} succeeded, {self.error_count} failed, "
+            f"{self.skipped} unchanged"
+        ))
+
+    def regenerate(self, qr_codes, pool):
+        """Render a batch (in the pool if there is one) and store the images"""
+        if not qr_codes:
+            return
+        started_at = timezone.now()
+        data = [qr_code.qr_data for qr_code in qr_codes]
+        render = partial(render_png, cache_dir=render_cache_dir())
+        results = pool.map(render, data) if pool is not None else map(render, data)
+
+        rendered = []
+        for qr_code, (signature, png, error) in zip(qr_codes, results):
             try:
+                if error:
+                    raise RuntimeError(error)
                 # Delete old image
                 if qr_code.qr_image:
                     qr_code.qr_image.delete(save=False)
-                
-                # Generate new QR code with updated settings
-                qr_code.generate_qr_code()
-                qr_code.save()
-                
-                success_count += 1
-                self.stdout.write(self.style.SUCCESS(
-                    f"✓ Regenerated {qr_code.qr_type} QR: {qr_code.reference_id}"
-                ))
+                qr_code.qr_image.save(f"{qr_code.reference_id}.png", ContentFile(png), save=False)
+                qr_code.render_hash = signature
+                qr_code.save(update_fields=['qr_image', 'render_hash', 'updated_at'])
+                rendered.append(qr_code.pk)
+                self.success_count += 1
             except Exception as e:
-                error_count += 1
+                self.error_count += 1
                 self.stdout.write(self.style.ERROR(
                     f"✗ Failed to regenerate {qr_code.qr_type} QR {qr_code.reference_id}: {str(e)}"
                 ))
-        
-        self.stdout.write(self.style.SUCCESS(
-            f"\n✓ Regeneration complete: {success_count} succeeded, {error_count} failed"
-        ))
+
+        # Renders queued before this batch started are now done
+        QRRenderJob.objects.filter(
+            qr_code_id__in=rendered, requested_at__lte=started_at, claimed_at__isnull=True
+        ).delete()
+
+    def report_progress(self, total):
+        elapsed = time.monotonic() - self.started
+        rate = self.checked / elapsed if elapsed else 0
+        eta = timedelta(seconds=round((total - self.checked) / rate)) if rate else '?'
+        percent = self.checked * 100 // total if total else 100
+        self.stdout.write(
+            f"  ✓ {self.checked}/{total} ({percent}%) - {self.success_count} regenerated, "
+            f"{self.skipped} unchanged, {rate:.1f}/s, ETA {eta}"
+        )
+
+    def read_checkpoint(self, path, only_stale):
+        """Last finished QR code pk of an interrupted run with the same mode, or None"""
+        try:
+            state = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        if state.get('only_stale') != only_stale:
+            self.stdout.write(self.style.WARNING("Ignoring checkpoint from a run with different options"))
+            return None
+        return state.get('last_pk')
+
+    def write_checkpoint(self, path, last_pk, only_stale):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'last_pk': last_pk, 'only_stale': only_stale}))
+        tmp.replace(path)
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def queue_missing_images(apps, schema_editor):
+    """Queue QR codes that were saved without an image"""
+    QRCodeImage = apps.get_model('qr_manager', 'QRCodeImage')
+    QRRenderJob = apps.get_model('qr_manager', 'QRRenderJob')
+    missing = QRCodeImage.objects.filter(Q(qr_image__isnull=True) | Q(qr_image=''))
+    QRRenderJob.objects.bulk_create([QRRenderJob(qr_code=qr_code) for qr_code in missing])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qr_manager', '0002_alter_qrcodeimage_qr_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QRRenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Last time a render was requested')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Not picked up before this time (retry backoff)')),
+                ('claimed_at', models.DateTimeField(blank=True, help_text='Set while a worker is rendering', null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('qr_code', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='render_job', to='qr_manager.qrcodeimage')),
+            ],
+            options={
+                'verbose_name': 'QR Render Job',
+                'verbose_name_plural': 'QR Render Jobs',
+                'db_table': 'qr_render_jobs',
+                'ordering': ['run_after'],
+                'indexes': [models.Index(fields=['run_after'], name='qr_render_j_run_aft_a18acb_idx')],
+            },
+        ),
+        migrations.RunPython(queue_missing_images, migrations.RunPython.noop),
+    ]
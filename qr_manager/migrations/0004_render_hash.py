@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qr_manager', '0003_render_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qrcodeimage',
+            name='render_hash',
+            field=models.CharField(blank=True, default='', help_text='Data and render settings of the current image', max_length=64),
+        ),
+    ]
@@ -2,11 +2,13 @@
 QR Code Models for ArmGuard
 Handles QR code generation and management using unified qr_generator
 """
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.utils.text import get_valid_filename
-from django.core.files import File
-from utils.qr_generator import generate_qr_code_to_buffer
+from django.core.files.base import ContentFile
+from utils import qr_generator
+from utils.qr_generator import render_png, render_signature
 import os
 
 
@@ -21,6 +23,33 @@ def qr_upload_path(instance, filename):
         return f'qr_codes/{instance.qr_type}/{safe_filename}'
 
 
+def render_cache_dir():
+    """Directory of content-addressed QR renders shared by all processes (never under MEDIA_ROOT)"""
+    return getattr(settings, 'QR_RENDER_CACHE_DIR', '') or os.path.join(settings.BASE_DIR, 'cache', 'qr_renders')
+
+
+def prune_render_cache(max_age_days=None, max_mb=None):
+    """
+    Prune the render cache to its age and size limits (0 disables a limit).
+
+    Args:
+        max_age_days (int, optional): Defaults to QR_RENDER_CACHE_MAX_AGE_DAYS
+        max_mb (int, optional): Defaults to QR_RENDER_CACHE_MAX_MB
+
+    Returns:
+        tuple: (files removed, bytes freed, bytes kept)
+    """
+    if max_age_days is None:
+        max_age_days = getattr(settings, 'QR_RENDER_CACHE_MAX_AGE_DAYS', 30)
+    if max_mb is None:
+        max_mb = getattr(settings, 'QR_RENDER_CACHE_MAX_MB', 200)
+    return qr_generator.prune_render_cache(
+        render_cache_dir(),
+        max_age=max_age_days * 86400 if max_age_days else None,
+        max_bytes=max_mb * 1024 * 1024 if max_mb else None,
+    )
+
+
 class QRCodeImage(models.Model):
     """QR Code storage model"""
     
@@ -38,6 +67,7 @@ class QRCodeImage(models.Model):
     reference_id = models.CharField(max_length=100, help_text="Personnel ID or Item ID")
     qr_data = models.CharField(max_length=255, help_text="Data encoded in QR code")
     qr_image = models.ImageField(upload_to=qr_upload_path, blank=True, null=True)
+    render_hash = models.CharField(max_length=64, blank=True, default='', help_text="Data and render settings of the current image")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -53,20 +83,61 @@ class QRCodeImage(models.Model):
     def __str__(self):
         return f"{self.qr_type} QR: {self.reference_id}"
     
-    def generate_qr_code(self, size=600, box_size=20, border=2):
-        """Generate HIGH-RESOLUTION QR code image for crisp printing"""
+    def generate_qr_code(self, size=600):
+        """
+        Generate HIGH-RESOLUTION QR code image for crisp printing.
+        Box size and border come from utils.qr_generator.RENDER_SETTINGS.
+        The file is left alone when it already holds this exact render.
+        """
+        signature = render_signature(self.qr_data, size=size)
+        if self.qr_image and self.render_hash == signature and self.qr_image.storage.exists(self.qr_image.name):
+            return self.qr_image
+        
         # Use unified QR generator with HD settings for print quality
-        buffer = generate_qr_code_to_buffer(self.qr_data, size=size)
+        signature, png = render_png(self.qr_data, size=size, cache_dir=render_cache_dir())
         
         # Save to model - filename is just the reference_id (e.g., IP-854643041125.png)
+        if self.qr_image:
+            self.qr_image.delete(save=False)
         filename = f"{self.reference_id}.png"
-        self.qr_image.save(filename, File(buffer), save=False)
+        self.qr_image.save(filename, ContentFile(png), save=False)
+        self.render_hash = signature
         
         return self.qr_image
     
+    @property
+    def is_stale(self):
+        """True when there is no image or it was rendered from other data or settings"""
+        return not self.qr_image or self.render_hash != render_signature(self.qr_data)
+    
     def save(self, *args, **kwargs):
-        """Override save to generate QR code if not exists"""
-        if not self.qr_image:
-            self.generate_qr_code()
+        """Save, queueing the image for the render worker if there is none"""
         super().save(*args, **kwargs)
+        if not self.qr_image:
+            # Import here to avoid circular imports
+            from . import jobs
+            jobs.enqueue(self)
+
+
+class QRRenderJob(models.Model):
+    """Pending QR image render, processed by the process_qr_jobs worker"""
+    
+    qr_code = models.OneToOneField(QRCodeImage, on_delete=models.CASCADE, related_name='render_job')
+    requested_at = models.DateTimeField(default=timezone.now, help_text="Last time a render was requested")
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not picked up before this time (retry backoff)")
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="Set while a worker is rendering")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        db_table = 'qr_render_jobs'
+        ordering = ['run_after']
+        verbose_name = 'QR Render Job'
+        verbose_name_plural = 'QR Render Jobs'
+        indexes = [
+            models.Index(fields=['run_after']),
+        ]
+    
+    def __str__(self):
+        return f"Render {self.qr_code}"
 
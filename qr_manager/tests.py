@@ -1,3 +1,257 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from admin.views import registration_qr_base64
+from inventory.models import Item
+from utils import qr_generator
+from .models import QRCodeImage, QRRenderJob, render_cache_dir
+from . import jobs as qr_jobs
+
+MEDIA_ROOT = None
+RENDER_CACHE_DIR = None
+_dir_settings = None
+
+
+def setUpModule():
+    # Scratch media and render cache directories for this module only
+    global MEDIA_ROOT, RENDER_CACHE_DIR, _dir_settings
+    MEDIA_ROOT = tempfile.mkdtemp(prefix='armguard-test-media-')
+    RENDER_CACHE_DIR = tempfile.mkdtemp(prefix='armguard-test-render-cache-')
+    _dir_settings = override_settings(MEDIA_ROOT=MEDIA_ROOT, QR_RENDER_CACHE_DIR=RENDER_CACHE_DIR)
+    _dir_settings.enable()
+
+
+def tearDownModule():
+    _dir_settings.disable()
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+    shutil.rmtree(RENDER_CACHE_DIR, ignore_errors=True)
+
+
+def make_item(serial):
+    return Item.objects.create(item_type=Item.ITEM_TYPE_M16, serial=serial)
+
+
+def cached_renders():
+    return sorted(Path(RENDER_CACHE_DIR).glob('*/*.png'))
+
+
+@override_settings(QR_RENDER_INLINE=False, RATELIMIT_ENABLE=False, SECURE_SSL_REDIRECT=False)
+class RenderQueueTest(TestCase):
+    """QR images are rendered by the worker, not during registration"""
+
+    def test_save_queues_and_worker_renders(self):
+        item = make_item('QUEUE-1')
+        qr_code = QRCodeImage.objects.get(reference_id=item.id)
+        self.assertFalse(qr_code.qr_image)
+        self.assertTrue(QRRenderJob.objects.filter(qr_code=qr_code).exists())
+
+        # A second worker claiming the same job gets nothing
+        claimed = qr_jobs.claim(10)
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(qr_jobs.claim(10), [])
+        QRRenderJob.objects.update(claimed_at=None)
+
+        self.assertEqual(qr_jobs.run(), {'claimed': 1, 'rendered': 1, 'failed': 0})
+        qr_code.refresh_from_db()
+        self.assertTrue(qr_code.qr_image.name.endswith(f'{item.id}.png'))
+        self.assertFalse(QRRenderJob.objects.exists())
+
+    @override_settings(QR_RENDER_INLINE=True)
+    def test_inline_renders_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = make_item('INLINE-1')
+        self.assertTrue(QRCodeImage.objects.get(reference_id=item.id).qr_image)
+        self.assertFalse(QRRenderJob.objects.exists())
+
+    def test_print_page_reports_unrendered_codes(self):
+        make_item('PRINT-1')
+        make_item('PRINT-2')
+        qr_jobs.run(batch_size=1)
+        self.client.force_login(User.objects.create_user('printer', password='x'))
+
+        response = self.client.get(reverse('print_handler:print_qr_codes'))
+        self.assertEqual(len(response.context['item_qrcodes']), 1)
+        self.assertEqual(response.context['pending_qrcodes'], 1)
+        self.assertContains(response, '1 QR code still being generated')
+
+        response = self.client.get(reverse('print_handler:print_qr_codes'), {'type': 'personnel'})
+        self.assertEqual(response.context['pending_qrcodes'], 0)
+
+
+@override_settings(QR_RENDER_INLINE=False)
+class RenderCacheTest(TestCase):
+    """Render cache - reuses identical renders, stays private, is pruned"""
+
+    def setUp(self):
+        shutil.rmtree(RENDER_CACHE_DIR, ignore_errors=True)
+        qr_generator._render_cache.clear()
+
+    def test_render_cache_reuses_bytes(self):
+        signature, png = qr_generator.render_png('IR-CACHE-1', cache_dir=render_cache_dir())
+        self.assertIs(qr_generator.render_png('IR-CACHE-1', cache_dir=render_cache_dir())[1], png)
+        qr_generator._render_cache.clear()
+        self.assertEqual(qr_generator.render_png('IR-CACHE-1', cache_dir=render_cache_dir()), (signature, png))
+
+        item = make_item('CACHE-1')
+        qr_jobs.run()
+        qr_code = QRCodeImage.objects.get(reference_id=item.id)
+        name = qr_code.qr_image.name
+        qr_code.generate_qr_code()
+        self.assertEqual(qr_code.qr_image.name, name)  # unchanged file is not rewritten
+
+    def test_cache_is_outside_media(self):
+        with override_settings(QR_RENDER_CACHE_DIR=''):
+            self.assertFalse(os.path.abspath(render_cache_dir()).startswith(os.path.abspath(MEDIA_ROOT)))
+
+    def test_registration_codes_are_not_cached_on_disk(self):
+        registration_qr_base64('USER:7:armorer:armorer@example.com')
+        self.assertEqual(cached_renders(), [])
+
+    def test_prune_by_age_then_size(self):
+        for n in range(4):
+            qr_generator.render_png(f'IR-PRUNE-{n}', cache_dir=RENDER_CACHE_DIR)
+        paths = cached_renders()
+        now = time.time()
+        ages = {path: n * 86400 for n, path in enumerate(paths)}
+        for path, age in ages.items():
+            os.utime(path, (now - age, now - age))
+        oldest = max(paths, key=ages.get)
+
+        # Unused for 3 days: pruned at a 2.5-day limit
+        removed, _, kept = qr_generator.prune_render_cache(RENDER_CACHE_DIR, max_age=2.5 * 86400, now=now)
+        self.assertEqual(removed, 1)
+        self.assertFalse(oldest.exists())
+
+        # Least recently used first until the rest fits
+        newest = min(paths, key=ages.get)
+        removed, _, kept = qr_generator.prune_render_cache(RENDER_CACHE_DIR, max_bytes=newest.stat().st_size)
+        self.assertEqual(removed, 2)
+        self.assertEqual(cached_renders(), [newest])
+        self.assertEqual(kept, newest.stat().st_size)
+
+    def test_disk_hit_refreshes_last_use(self):
+        qr_generator.render_png('IR-TOUCH-1', cache_dir=RENDER_CACHE_DIR)
+        path, = cached_renders()
+        os.utime(path, (0, 0))
+        qr_generator._render_cache.clear()
+        qr_generator.render_png('IR-TOUCH-1', cache_dir=RENDER_CACHE_DIR)
+        self.assertGreater(path.stat().st_mtime, 0)
+
+    @override_settings(QR_RENDER_CACHE_MAX_AGE_DAYS=1, QR_RENDER_CACHE_MAX_MB=0)
+    def test_prune_command(self):
+        qr_generator.render_png('IR-PRUNE-CMD', cache_dir=RENDER_CACHE_DIR)
+        path, = cached_renders()
+        os.utime(path, (0, 0))
+        out = StringIO()
+        call_command('prune_qr_render_cache', stdout=out)
+        self.assertIn('Pruned 1 cached renders', out.getvalue())
+        self.assertEqual(cached_renders(), [])
+
+
+class RasterizerTest(TestCase):
+    """Exact rasterizer - module-aligned pixels instead of a LANCZOS resize"""
+
+    def test_exact_rasterizer_has_sharp_modules(self):
+        img = qr_generator.generate_qr_code('IR-854643041125', size=600)
+        self.assertEqual(img.size, (600, 600))
+        self.assertEqual(len(img.getcolors()), 2)  # no resampling blur
+        natural = qr_generator.generate_qr_code('IR-854643041125', size=None)
+        legacy = qr_generator.generate_qr_code('IR-854643041125', size=None, rasterizer='resample')
+        self.assertEqual(natural.convert('RGB').tobytes(), legacy.convert('RGB').tobytes())
+
+        png = qr_generator.render_png('IR-854643041125')[1]
+        self.assertEqual((png[24], png[25]), (1, 3))  # 1-bit palette PNG
+
+
+@override_settings(QR_RENDER_INLINE=False)
+class ReencodeTest(TestCase):
+    """reencode_qr_codes - stored images become 1-bit palette PNGs; --dry-run writes nothing"""
+
+    def setUp(self):
+        shutil.rmtree(RENDER_CACHE_DIR, ignore_errors=True)
+        qr_generator._render_cache.clear()
+        self.item = make_item('REENCODE-1')
+        qr_jobs.run()
+        QRCodeImage.objects.filter(reference_id=self.item.id).update(render_hash='rgb-era')
+        shutil.rmtree(RENDER_CACHE_DIR, ignore_errors=True)
+        qr_generator._render_cache.clear()
+
+    def test_dry_run_writes_nothing(self):
+        out = StringIO()
+        call_command('reencode_qr_codes', dry_run=True, stdout=out)
+        self.assertIn('1 re-encoded', out.getvalue())
+        self.assertEqual(cached_renders(), [])
+        self.assertEqual(QRCodeImage.objects.get(reference_id=self.item.id).render_hash, 'rgb-era')
+
+    def test_reencode(self):
+        call_command('reencode_qr_codes', stdout=StringIO())
+        qr_code = QRCodeImage.objects.get(reference_id=self.item.id)
+        self.assertFalse(qr_code.is_stale)
+        with qr_code.qr_image.open('rb') as f:
+            png = f.read()
+        self.assertEqual((png[24], png[25]), (1, 3))  # 1-bit palette PNG
+
+
+@override_settings(QR_RENDER_INLINE=False)
+class RegenerateTest(TestCase):
+    """regenerate_qr_codes - --only-stale skips current images; interrupted runs resume"""
+
+    def setUp(self):
+        items = [make_item(f'REGEN-{n}') for n in range(3)]
+        qr_jobs.run()
+        self.codes = list(QRCodeImage.objects.filter(reference_id__in=[item.id for item in items]).order_by('pk'))
+        self.checkpoint = Path(MEDIA_ROOT) / 'regen-checkpoint.json'
+        self.checkpoint.unlink(missing_ok=True)
+
+    def regenerate(self, **options):
+        out = StringIO()
+        call_command('regenerate_qr_codes', checkpoint=str(self.checkpoint), stdout=out, **options)
+        return out.getvalue()
+
+    def render_hashes(self):
+        codes = QRCodeImage.objects.filter(pk__in=[c.pk for c in self.codes]).order_by('pk')
+        return list(codes.values_list('render_hash', flat=True))
+
+    def test_only_stale_rerenders_stale_codes(self):
+        self.assertIn('0 succeeded, 0 failed, 3 unchanged', self.regenerate(only_stale=True))
+
+        # Rendered with other settings: only that code is redone
+        stale = self.codes[1]
+        QRCodeImage.objects.filter(pk=stale.pk).update(render_hash='old-settings')
+        self.assertIn('1 succeeded, 0 failed, 2 unchanged', self.regenerate(only_stale=True))
+        stale.refresh_from_db()
+        self.assertFalse(stale.is_stale)
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_resumes_after_checkpoint(self):
+        QRCodeImage.objects.filter(pk__in=[c.pk for c in self.codes]).update(render_hash='old-settings')
+        # A full run stopped after the first code
+        self.checkpoint.write_text(json.dumps({'last_pk': self.codes[0].pk, 'only_stale': False}))
+
+        out = self.regenerate(batch_size=1)
+        self.assertIn(f'Resuming after QR code #{self.codes[0].pk}', out)
+        self.assertIn('2 succeeded, 0 failed', out)
+        self.assertEqual(self.render_hashes()[0], 'old-settings')
+        self.assertNotIn('old-settings', self.render_hashes()[1:])
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_checkpoint_from_other_mode_is_ignored(self):
+        QRCodeImage.objects.filter(pk__in=[c.pk for c in self.codes]).update(render_hash='old-settings')
+        self.checkpoint.write_text(json.dumps({'last_pk': self.codes[1].pk, 'only_stale': False}))
+
+        out = self.regenerate(only_stale=True)
+        self.assertIn('Ignoring checkpoint', out)
+        self.assertIn('3 succeeded, 0 failed, 0 unchanged', out)
+
+        self.checkpoint.write_text(json.dumps({'last_pk': self.codes[1].pk, 'only_stale': False}))
+        self.assertIn('3 succeeded', self.regenerate(restart=True))
@@ -2,7 +2,7 @@
 Transactions Admin Configuration
 """
 from django.contrib import admin
-from .models import Transaction
+from .models import Transaction, ActiveCustody, TransactionArchive, OutstandingAmmunition, AutofillRule, CustodyInterval
 
 
 @admin.register(Transaction)
@@ -12,12 +12,12 @@ class TransactionAdmin(admin.ModelAdmin):
     list_display = ['id', 'personnel', 'item', 'action', 'date_time', 'duty_type']
     list_filter = ['action', 'date_time']
     search_fields = ['personnel__surname', 'personnel__firstname', 'item__serial', 'notes']
-    readonly_fields = ['created_at']
+    readonly_fields = ['queued_at', 'created_at']
     date_hierarchy = 'date_time'
     
     fieldsets = (
         ('Transaction Information', {
-            'fields': ('personnel', 'item', 'action', 'date_time')
+            'fields': ('personnel', 'item', 'action', 'date_time', 'queued_at')
         }),
         ('Withdrawal Details', {
             'fields': ('duty_type', 'mags', 'rounds', 'notes'),
@@ -28,3 +28,73 @@ class TransactionAdmin(admin.ModelAdmin):
         }),
     )
 
+
+
+@admin.register(ActiveCustody)
+class ActiveCustodyAdmin(admin.ModelAdmin):
+    """Admin interface for Active Custody (read-only, maintained by transactions)"""
+    
+    list_display = ['item', 'personnel', 'since', 'transaction']
+    search_fields = ['personnel__surname', 'personnel__firstname', 'item__serial']
+    readonly_fields = ['item', 'personnel', 'transaction', 'since']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    """Admin interface for Archived Transactions (read-only)"""
+    
+    list_display = ['id', 'personnel', 'item', 'action', 'date_time', 'duty_type', 'archived_at']
+    list_filter = ['action', 'date_time']
+    search_fields = ['personnel__surname', 'personnel__firstname', 'item__serial', 'notes']
+    date_hierarchy = 'date_time'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutstandingAmmunition)
+class OutstandingAmmunitionAdmin(admin.ModelAdmin):
+    """Admin interface for Outstanding Ammunition (maintained by transactions; edit to clear shortfalls)"""
+    
+    list_display = ['personnel', 'duty_type', 'mags', 'rounds', 'updated_at']
+    list_filter = ['duty_type']
+    search_fields = ['personnel__surname', 'personnel__firstname']
+    readonly_fields = ['personnel', 'duty_type', 'updated_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AutofillRule)
+class AutofillRuleAdmin(admin.ModelAdmin):
+    """Admin interface for Autofill Rules (changes apply without a restart)"""
+    
+    list_display = ['duty_type', 'item_type', 'mags', 'rounds', 'is_active', 'updated_at']
+    list_editable = ['mags', 'rounds', 'is_active']
+    list_filter = ['duty_type', 'item_type', 'is_active']
+    search_fields = ['duty_type']
+
+
+@admin.register(CustodyInterval)
+class CustodyIntervalAdmin(admin.ModelAdmin):
+    """Admin interface for Custody Intervals (read-only, maintained by transactions)"""
+    
+    list_display = ['item', 'personnel', 'start', 'end', 'take_id', 'return_id']
+    search_fields = ['personnel__surname', 'personnel__firstname', 'item__serial']
+    readonly_fields = ['item', 'personnel', 'start', 'end', 'take_id', 'return_id']
+    date_hierarchy = 'start'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,96 @@
+"""
+Outstanding ammunition ledger for ArmGuard
+Tracks magazines and rounds currently out with each personnel, per duty
+type, so end-of-shift reconciliation reads the outstanding table instead
+of replaying the transaction history.
+"""
+from collections import defaultdict
+from django.db.models import Count, F, Q, Sum
+from .models import Transaction, OutstandingAmmunition
+
+
+def _deltas(transactions, closed):
+    """
+    Net (mags, rounds) change per (personnel_id, duty_type).
+
+    A Return is charged to whoever held the item under the duty type of
+    the Take it closes - one earlier in the same list, or else the one in
+    closed. If the return records no mags or rounds, the full issued
+    amounts come back.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    opened = {}
+    for txn in transactions:
+        mags, rounds = txn.mags or 0, txn.rounds or 0
+        if txn.action == Transaction.ACTION_TAKE:
+            key = (txn.personnel_id, txn.duty_type or '')
+            deltas[key][0] += mags
+            deltas[key][1] += rounds
+            opened[txn.item_id] = txn
+            continue
+
+        take = opened.pop(txn.item_id, None) or closed.get(txn.item_id)
+        if take is None:
+            continue
+        if not mags and not rounds:
+            mags, rounds = take.mags or 0, take.rounds or 0
+        key = (take.personnel_id, take.duty_type or '')
+        deltas[key][0] -= mags
+        deltas[key][1] -= rounds
+    return deltas
+
+
+def apply_transactions(transactions, closed):
+    """
+    Post new transactions to the outstanding ledger.
+    Call inside the atomic block that wrote the transactions.
+
+    Args:
+        transactions (list): New Transaction instances
+        closed (dict): {item_id: Take transaction} for custody held before these
+                       transactions and closed by their Returns
+    """
+    touched = []
+    for (personnel_id, duty_type), (mags, rounds) in _deltas(transactions, closed).items():
+        if not mags and not rounds:
+            continue
+        lookup = {'personnel_id': personnel_id, 'duty_type': duty_type}
+        touched.append(Q(**lookup))
+        updated = OutstandingAmmunition.objects.filter(**lookup).update(
+            mags=F('mags') + mags, rounds=F('rounds') + rounds
+        )
+        if not updated and (mags > 0 or rounds > 0):
+            OutstandingAmmunition.objects.create(mags=max(mags, 0), rounds=max(rounds, 0), **lookup)
+
+    if not touched:
+        return
+    # Over-returns never leave a negative balance; settled rows are dropped
+    rows = OutstandingAmmunition.objects.filter(Q(*touched, _connector=Q.OR))
+    rows.filter(mags__lt=0).update(mags=0)
+    rows.filter(rounds__lt=0).update(rounds=0)
+    rows.filter(mags=0, rounds=0).delete()
+
+
+def outstanding(personnel_id=None, duty_type=None):
+    """Outstanding rows, holder joined, optionally filtered"""
+    rows = OutstandingAmmunition.objects.select_related('personnel')
+    if personnel_id:
+        rows = rows.filter(personnel_id=personnel_id)
+    if duty_type is not None:
+        rows = rows.filter(duty_type=duty_type)
+    return rows.order_by('duty_type', 'personnel__surname', 'personnel__firstname')
+
+
+def totals_by_duty(rows):
+    """
+    Mags/rounds out per duty type for the given outstanding rows.
+
+    Returns:
+        list: [{'duty_type', 'holders', 'mags', 'rounds'}, ...]
+    """
+    return list(
+        rows.order_by().values('duty_type')
+        .annotate(holders=Count('personnel'), mags=Sum('mags'), rounds=Sum('rounds'))
+        .order_by('duty_type')
+    )
+
@@ -0,0 +1,71 @@
+"""
+Transaction archive for ArmGuard
+Moves ledger rows past the archive horizon out of the live transactions
+table, and decides when history queries need to look at the archive.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import Transaction, TransactionArchive
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def archive_cutoff(days=None):
+    """Datetime before which transactions are eligible for archiving"""
+    if days is None:
+        days = getattr(settings, 'TRANSACTION_ARCHIVE_DAYS', 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    """
+    Live transactions older than the cutoff.
+    Takes that still open an active custody stay live until returned.
+    """
+    return Transaction.objects.filter(date_time__lt=cutoff, active_custody__isnull=True)
+
+
+def archive_chunk(cutoff, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Move the oldest chunk of archivable transactions into the archive.
+
+    Copy and delete run in one atomic block, so a row is always in
+    exactly one of the two tables.
+
+    Returns:
+        int: Number of transactions moved (0 when nothing is left)
+    """
+    with db_transaction.atomic():
+        rows = list(
+            archivable(cutoff)
+            .order_by('date_time', 'id')
+            .values(*TransactionArchive.COPIED_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return 0
+        TransactionArchive.objects.bulk_create([TransactionArchive(**row) for row in rows])
+        Transaction.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_watermark():
+    """Newest archived date_time, or None if the archive is empty (one index lookup)"""
+    return TransactionArchive.objects.aggregate(newest=Max('date_time'))['newest']
+
+
+def history_querysets(**filters):
+    """
+    Matching live and archive querysets for a history view.
+
+    Args:
+        **filters: Field lookups valid on both tables (e.g. personnel_id=...)
+
+    Returns:
+        tuple: (live queryset, archive queryset), both select_related
+    """
+    live = Transaction.objects.filter(**filters).select_related('personnel', 'item')
+    archived = TransactionArchive.objects.filter(**filters).select_related('personnel', 'item')
+    return live, archived
@@ -0,0 +1,96 @@
+"""
+Autofill rules for ArmGuard
+The AutofillRule table is compiled into an in-process lookup table -
+{(item_type, duty_type): (mags, rounds)} plus the duty type list - so
+suggesting defaults for a scan costs no query.
+
+Saving or deleting a rule rebuilds the table in the process that made the
+change (see signals.py). Other worker processes rebuild theirs once it is
+AUTOFILL_RULES_TTL seconds old, so rule edits never need a restart.
+"""
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+from .models import AutofillRule
+
+NO_SUGGESTION = {'mags': 0, 'rounds': 0}
+
+_lock = threading.Lock()
+_compiled = None
+
+
+class CompiledRules(namedtuple('CompiledRules', ['table', 'duty_types', 'version', 'built_at'])):
+    """Compiled rule table; version changes whenever any rule does"""
+
+    def lookup(self, item_type, duty_type):
+        """
+        Suggested mags and rounds for an item type on a duty type.
+        An item-type rule wins over the duty's any-item rule.
+
+        Returns:
+            dict: {'mags': int, 'rounds': int}
+        """
+        item_type = (item_type or '').upper()
+        mags_rounds = self.table.get((item_type, duty_type)) or self.table.get(('', duty_type))
+        if mags_rounds is None:
+            return dict(NO_SUGGESTION)
+        return {'mags': mags_rounds[0], 'rounds': mags_rounds[1]}
+
+
+def _ttl():
+    return getattr(settings, 'AUTOFILL_RULES_TTL', 60)
+
+
+def _compile(rows):
+    table = {}
+    duty_types = []
+    for item_type, duty_type, mags, rounds in rows:
+        table[(item_type.upper(), duty_type)] = (mags, rounds)
+        if duty_type not in duty_types:
+            duty_types.append(duty_type)
+    version = hashlib.md5(repr(sorted(table.items())).encode(), usedforsecurity=False).hexdigest()[:12]
+    return CompiledRules(table, sorted(duty_types), version, time.monotonic())
+
+
+def _active_rules():
+    return AutofillRule.objects.filter(is_active=True).values_list('item_type', 'duty_type', 'mags', 'rounds')
+
+
+def _fresh(compiled):
+    return compiled is not None and time.monotonic() - compiled.built_at < _ttl()
+
+
+def rules():
+    """The compiled rule table, rebuilt from the database when stale"""
+    global _compiled
+    compiled = _compiled
+    if not _fresh(compiled):
+        compiled = _compile(list(_active_rules()))
+        with _lock:
+            _compiled = compiled
+    return compiled
+
+
+async def arules():
+    """Async rules() for async views"""
+    global _compiled
+    compiled = _compiled
+    if not _fresh(compiled):
+        compiled = _compile([row async for row in _active_rules()])
+        with _lock:
+            _compiled = compiled
+    return compiled
+
+
+def invalidate():
+    """Drop this process's compiled table; the next lookup rebuilds it"""
+    global _compiled
+    with _lock:
+        _compiled = None
+
+
+def duty_type_choices(blank_label='Select Duty Type'):
+    """Choices for duty type dropdowns - the duty types that have a rule"""
+    return [('', blank_label)] + [(duty_type, duty_type) for duty_type in rules().duty_types]
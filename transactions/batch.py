@@ -0,0 +1,412 @@
+"""
+Batch transaction processing for ArmGuard
+Issues and returns many items at once (e.g. guard mount) with set-based
+lookups, in-memory validation and bulk writes.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from personnel.models import Personnel
+from inventory.models import Item
+from core.utils import validate_transaction_action, read_scan_token
+from .models import Transaction, ActiveCustody, IdempotencyKey
+from .signals import transaction_posted
+
+MODE_ATOMIC = 'atomic'
+MODE_PARTIAL = 'partial'
+MODES = (MODE_ATOMIC, MODE_PARTIAL)
+
+MAX_BATCH_SIZE = 500
+
+# Idempotency keys deleted per statement by prune_idempotency_keys()
+PRUNE_CHUNK_SIZE = 5000
+
+# Positional order accepted for rows sent as lists
+ROW_FIELDS = (
+    'personnel_id', 'item_id', 'action', 'duty_type', 'mags', 'rounds', 'notes', 'idempotency_key', 'queued_at',
+    'scan_token',
+)
+
+# Row statuses that mean the row is recorded in the ledger
+RECORDED_STATUSES = ('ok', 'duplicate')
+
+
+class BatchConflict(Exception):
+    """Raised inside the write block when the database state moved under the batch"""
+
+
+def _scan_time(value, now):
+    """
+    Parse a row's queued_at (when the station made the scan).
+
+    Returns:
+        tuple: (aware datetime or None, error message or None)
+    """
+    if not value:
+        return None, None
+    try:
+        scanned = parse_datetime(str(value))
+    except ValueError:
+        scanned = None
+    if scanned is None:
+        return None, 'queued_at must be an ISO 8601 date/time'
+    if timezone.is_naive(scanned):
+        scanned = timezone.make_aware(scanned)
+    if scanned > now + timedelta(seconds=settings.SCAN_SYNC_CLOCK_SKEW):
+        return None, 'Scan time is in the future - check the station clock'
+    if scanned < now - timedelta(seconds=settings.SCAN_SYNC_MAX_AGE):
+        return None, 'Scan is too old to sync - record it by hand'
+    # A station clock running slightly ahead is pulled back to now
+    return min(scanned, now), None
+
+
+def normalize_row(row, now=None):
+    """
+    Turn one incoming row (dict or positional list) into a clean dict.
+
+    Returns:
+        tuple: (row dict, error message or None)
+    """
+    if isinstance(row, (list, tuple)):
+        row = dict(zip(ROW_FIELDS, row))
+    if not isinstance(row, dict):
+        return {}, 'Row must be an object or a list'
+
+    clean = {
+        'personnel_id': str(row.get('personnel_id') or '').strip(),
+        'item_id': str(row.get('item_id') or '').strip(),
+        'action': row.get('action'),
+        'duty_type': row.get('duty_type') or '',
+        'notes': row.get('notes') or '',
+        'idempotency_key': str(row.get('idempotency_key') or '').strip(),
+    }
+    if not clean['personnel_id'] or not clean['item_id'] or not clean['action']:
+        return clean, 'Missing required fields'
+    if clean['action'] not in (Transaction.ACTION_TAKE, Transaction.ACTION_RETURN):
+        return clean, f'Invalid action: {clean["action"]}. Must be "Take" or "Return".'
+    if len(clean['idempotency_key']) > IdempotencyKey._meta.get_field('key').max_length:
+        return clean, 'idempotency_key is too long'
+
+    for field in ('mags', 'rounds'):
+        try:
+            value = int(row.get(field) or 0)
+        except (TypeError, ValueError):
+            return clean, f'{field} must be a whole number'
+        if value < 0:
+            return clean, f'{field} cannot be negative'
+        clean[field] = value
+
+    now = now or timezone.now()
+    clean['queued_at'], error = _scan_time(row.get('queued_at'), now)
+    if error:
+        return clean, error
+
+    # A scan_token from /api/scan/pair/ must match the row; it is recorded
+    # as a second key so the token cannot produce another ledger row. It
+    # expires by the server clock, so a row queued offline for longer than
+    # SCAN_TOKEN_MAX_AGE has to be scanned again
+    clean['token_key'] = ''
+    if row.get('scan_token'):
+        try:
+            pair = read_scan_token(str(row['scan_token']))
+        except signing.BadSignature:
+            return clean, 'Scan token is invalid or expired - scan again'
+        if (pair['personnel_id'], pair['item_id'], pair['action']) != (
+            clean['personnel_id'], clean['item_id'], clean['action']
+        ):
+            return clean, 'Scan token was issued for a different scan'
+        clean['token_key'] = pair['key']
+    return clean, None
+
+
+def _error(index, message, retry=False):
+    """
+    Per-row error result. retry marks errors caused by the current state of
+    the item or holder, which a later sync may get past; the rest are permanent.
+    """
+    return {'index': index, 'status': 'error', 'error': message, 'retry': retry}
+
+
+def _plan(rows, now, replay=False):
+    """
+    Resolve and validate every row against the current database state.
+
+    Uses one query per table, then simulates the batch in memory so rows
+    are checked against each other as well (same item twice, one person
+    taking two items). Rows whose idempotency key is already recorded are
+    reported as duplicates of the transaction they produced; a row whose
+    scan token was already used by another row is rejected.
+
+    With replay, an item may appear more than once: its rows are applied
+    in order against the simulated status, as an offline station scanned
+    them. Rows are recorded at the server's commit time; a row's queued_at
+    is kept alongside, not used as the ledger time.
+
+    Returns:
+        tuple: (list of per-row results, list of (index, row, personnel, item) to write)
+    """
+    personnel = Personnel.objects.in_bulk({r['personnel_id'] for _, r in rows})
+    items = Item.objects.in_bulk({r['item_id'] for _, r in rows})
+    holder_items = dict(
+        ActiveCustody.objects.filter(personnel_id__in=personnel.keys()).values_list('personnel_id', 'item_id')
+    )
+    keys = {key for _, r in rows for key in (r['idempotency_key'], r['token_key']) if key}
+    recorded = dict(IdempotencyKey.objects.filter(key__in=keys).values_list('key', 'transaction_id')) if keys else {}
+    seen_keys = set()
+
+    results = []
+    accepted = []
+    seen_items = set()
+    item_status = {item_id: item.status for item_id, item in items.items()}
+
+    for index, row in rows:
+        key = row['idempotency_key']
+        if key in recorded:
+            results.append({'index': index, 'status': 'duplicate', 'transaction_id': recorded[key]})
+            continue
+        if key and key in seen_keys:
+            results.append(_error(index, f'Idempotency key {key} appears more than once in batch'))
+            continue
+        token_key = row['token_key']
+        if token_key and (token_key in recorded or token_key in seen_keys):
+            results.append(_error(index, 'Scan token was already used - scan again'))
+            continue
+        
+        person = personnel.get(row['personnel_id'])
+        item = items.get(row['item_id'])
+
+        if person is None:
+            results.append(_error(index, 'Personnel not found'))
+            continue
+        if item is None:
+            results.append(_error(index, 'Item not found'))
+            continue
+        if item.id in seen_items and not replay:
+            results.append(_error(index, f'Item {item.id} appears more than once in batch'))
+            continue
+
+        item.status = item_status[item.id]
+        validation = validate_transaction_action(item, row['action'])
+        if not validation['valid']:
+            results.append(_error(index, validation['message'], retry=True))
+            continue
+        if row['action'] == Transaction.ACTION_TAKE and person.id in holder_items:
+            results.append(_error(
+                index,
+                f'Item cannot be taken — personnel {person} already has an issued item: {holder_items[person.id]}',
+                retry=True,
+            ))
+            continue
+
+        # Apply the row to the simulated state for the rows that follow
+        seen_items.add(item.id)
+        seen_keys.update(k for k in (key, token_key) if k)
+        if row['action'] == Transaction.ACTION_TAKE:
+            item_status[item.id] = Item.STATUS_ISSUED
+            holder_items[person.id] = item.id
+        else:
+            item_status[item.id] = Item.STATUS_AVAILABLE
+            for holder, held in list(holder_items.items()):
+                if held == item.id:
+                    del holder_items[holder]
+
+        results.append({'index': index, 'status': 'ok'})
+        accepted.append((index, row, person, item))
+
+    return results, accepted
+
+
+def _write(accepted, now):
+    """
+    Write accepted rows: one conditional status update per (from, to)
+    status pair, bulk inserts for the ledger and custody rows.
+
+    An item with several rows moves from the status its first row expects
+    to the status its last row leaves, in one update.
+
+    Must run inside an atomic block. Raises BatchConflict if another
+    station changed any of the items since the batch was planned.
+    """
+    moves = {}
+    for _, row, _, item in accepted:
+        take = row['action'] == Transaction.ACTION_TAKE
+        expected = moves[item.id][0] if item.id in moves else (Item.STATUS_AVAILABLE if take else Item.STATUS_ISSUED)
+        moves[item.id] = (expected, Item.STATUS_ISSUED if take else Item.STATUS_AVAILABLE)
+
+    by_move = defaultdict(list)
+    for item_id, move in moves.items():
+        by_move[move].append(item_id)
+    for (expected_status, new_status), item_ids in by_move.items():
+        claimed = Item.objects.filter(
+            pk__in=item_ids, status=expected_status
+        ).update(status=new_status, updated_at=now)
+        if claimed != len(item_ids):
+            raise BatchConflict('One or more items changed status during the batch')
+    for _, _, _, item in accepted:
+        item.status = moves[item.id][1]
+
+    # Custody held before the batch ends at the item's first row when that is a Return
+    closed = {}
+    returned = [item_id for item_id, (expected_status, _) in moves.items() if expected_status == Item.STATUS_ISSUED]
+    if returned:
+        custody = ActiveCustody.objects.filter(item_id__in=returned).select_related('transaction')
+        closed = {c.item_id: c.transaction for c in custody}
+        custody.delete()
+
+    created = Transaction.objects.bulk_create([
+        Transaction(
+            personnel=person,
+            item=item,
+            action=row['action'],
+            date_time=now,
+            queued_at=row['queued_at'],
+            mags=row['mags'],
+            rounds=row['rounds'],
+            duty_type=row['duty_type'],
+            notes=row['notes'],
+        )
+        for _, row, person, item in accepted
+    ])
+
+    # Custody left open by each item's last row being a Take
+    open_takes = {}
+    for txn in created:
+        if txn.action == Transaction.ACTION_TAKE:
+            open_takes[txn.item_id] = txn
+        else:
+            open_takes.pop(txn.item_id, None)
+    custody = [
+        ActiveCustody(item_id=txn.item_id, personnel_id=txn.personnel_id, transaction=txn, since=txn.date_time)
+        for txn in open_takes.values()
+    ]
+    if custody:
+        try:
+            with db_transaction.atomic():
+                ActiveCustody.objects.bulk_create(custody)
+        except IntegrityError:
+            raise BatchConflict('A holder or item already has an active custody record')
+
+    keys = [
+        IdempotencyKey(key=key, transaction_id=txn.id)
+        for (_, row, _, _), txn in zip(accepted, created)
+        for key in (row['idempotency_key'], row['token_key']) if key
+    ]
+    if keys:
+        try:
+            with db_transaction.atomic():
+                IdempotencyKey.objects.bulk_create(keys)
+        except IntegrityError:
+            raise BatchConflict('A scan in this batch was recorded by another request')
+
+    transaction_posted.send(sender=Transaction, transactions=created, closed=closed)
+    return created
+
+
+def process_batch(raw_rows, mode=MODE_ATOMIC, replay=False):
+    """
+    Process a batch of Take/Return rows.
+
+    Args:
+        raw_rows (list): Rows as dicts or lists in ROW_FIELDS order
+        mode (str): 'atomic' - write nothing unless every row is valid
+                    'partial' - write the valid rows, report the rest
+        replay (bool): Rows are scans queued offline - an item may appear
+                       more than once and its rows apply in order
+
+    Returns:
+        dict: {
+            'success': bool,
+            'mode': str,
+            'committed': int,
+            'conflict': bool,
+            'results': list of per-row dicts ordered by index; errors carry
+                       retry - true if the row may succeed in a later sync
+        }
+    """
+    now = timezone.now()
+    rows = []
+    invalid = []
+    for index, raw in enumerate(raw_rows):
+        row, error = normalize_row(raw, now)
+        if error:
+            invalid.append(_error(index, error))
+        else:
+            rows.append((index, row))
+
+    # Partial mode re-plans once if another station won a race mid-batch
+    attempts = 2 if mode == MODE_PARTIAL else 1
+    conflict = False
+    for _ in range(attempts):
+        results, accepted = _plan(rows, now, replay=replay)
+        results = invalid + results
+        has_errors = any(r['status'] == 'error' for r in results)
+
+        if not accepted or (has_errors and mode == MODE_ATOMIC):
+            for result in results:
+                if result['status'] == 'ok':
+                    result['status'] = 'skipped'
+            accepted = []
+            break
+
+        try:
+            with db_transaction.atomic():
+                created = _write(accepted, now)
+        except BatchConflict as e:
+            conflict = True
+            conflict_error = str(e)
+            continue
+
+        conflict = False
+        by_index = {index: txn for (index, _, _, _), txn in zip(accepted, created)}
+        for result in results:
+            if result['index'] in by_index:
+                txn = by_index[result['index']]
+                result['transaction_id'] = txn.id
+                result['item_new_status'] = Item.STATUS_ISSUED if txn.is_withdrawal() else Item.STATUS_AVAILABLE
+        break
+
+    if conflict:
+        accepted = []
+        for result in results:
+            if result['status'] == 'ok':
+                result.update(status='error', error=conflict_error, retry=True)
+
+    results.sort(key=lambda r: r['index'])
+    committed = len(accepted)
+    return {
+        'success': bool(results) and all(r['status'] in RECORDED_STATUSES for r in results),
+        'mode': mode,
+        'committed': committed,
+        'conflict': conflict,
+        'results': results,
+    }
+
+
+def prune_idempotency_keys(max_age=None, chunk_size=PRUNE_CHUNK_SIZE):
+    """
+    Delete idempotency keys older than the replay window.
+
+    A queued scan whose queued_at is older than SCAN_SYNC_MAX_AGE is refused
+    before its key is looked up, and scan tokens expire long before that,
+    so older keys can no longer match. Deletes in chunks along the created_at index.
+
+    Args:
+        max_age (int): Seconds to keep keys (default: SCAN_SYNC_MAX_AGE)
+
+    Returns:
+        int: Number of keys deleted
+    """
+    if max_age is None:
+        max_age = settings.SCAN_SYNC_MAX_AGE
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    expired = IdempotencyKey.objects.filter(created_at__lt=cutoff).order_by('created_at')
+    deleted = 0
+    while True:
+        keys = list(expired.values_list('key', flat=True)[:chunk_size])
+        if not keys:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(key__in=keys).delete()[0]
@@ -0,0 +1,135 @@
+"""
+Custody intervals for ArmGuard
+(item, personnel, start, end) rows answer "who had item X at time T" and
+"who held what during a window" with one indexed query, instead of pairing
+Take and Return rows from the ledger by hand.
+"""
+import heapq
+from itertools import islice
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from .models import Transaction, TransactionArchive, CustodyInterval
+
+LEDGER_FIELDS = ('item_id', 'date_time', 'id', 'personnel_id', 'action')
+
+# Most intervals one API response or item page lists
+MAX_RESULTS = 500
+
+
+def apply_transactions(transactions):
+    """
+    Open an interval for each Take and close the item's open interval on
+    each Return. Call inside the atomic block that wrote the transactions.
+
+    Args:
+        transactions (list): Transaction instances in the order they were written
+    """
+    opened = {}
+    new = []
+    for txn in transactions:
+        if txn.action == Transaction.ACTION_TAKE:
+            interval = CustodyInterval(
+                item_id=txn.item_id, personnel_id=txn.personnel_id, start=txn.date_time, take_id=txn.id
+            )
+            opened[txn.item_id] = interval
+            new.append(interval)
+        elif txn.item_id in opened:
+            # Taken and returned within the same batch
+            interval = opened.pop(txn.item_id)
+            interval.end, interval.return_id = txn.date_time, txn.id
+        else:
+            CustodyInterval.objects.filter(item_id=txn.item_id, end__isnull=True).update(
+                end=txn.date_time, return_id=txn.id
+            )
+    CustodyInterval.objects.bulk_create(new)
+
+
+def ledger_order(row):
+    """Merge key for ledger rows - (date_time, id), compared in Python."""
+    return row[1], row[2]
+
+
+def build_intervals(rows, model=CustodyInterval):
+    """
+    Pair Takes with Returns in one pass over ledger rows in time order,
+    keeping only each item's open interval in memory.
+
+    Args:
+        rows: (item_id, date_time, id, personnel_id, action) tuples, sorted by ledger_order
+        model: Interval model to instantiate
+
+    Yields:
+        CustodyInterval (unsaved). A Take on an item that is still open - a
+        gap in the ledger - closes the previous interval at the new Take.
+    """
+    opened = {}
+    for item_id, date_time, txn_id, personnel_id, action in rows:
+        current = opened.pop(item_id, None)
+        if action == Transaction.ACTION_TAKE:
+            if current is not None:
+                current.end = date_time
+                yield current
+            opened[item_id] = model(item_id=item_id, personnel_id=personnel_id, start=date_time, take_id=txn_id)
+        elif current is not None:
+            current.end, current.return_id = date_time, txn_id
+            yield current
+    yield from opened.values()
+
+
+def _ledger_rows(model):
+    return model.objects.order_by('date_time', 'id').values_list(*LEDGER_FIELDS).iterator(chunk_size=2000)
+
+
+def rebuild(batch_size=1000):
+    """
+    Rebuild every interval from the live ledger and the archive, merged
+    into a single time-ordered stream.
+
+    Returns:
+        int: Number of intervals written
+    """
+    rows = heapq.merge(_ledger_rows(Transaction), _ledger_rows(TransactionArchive), key=ledger_order)
+    intervals = build_intervals(rows)
+    written = 0
+    with db_transaction.atomic():
+        CustodyInterval.objects.all().delete()
+        while True:
+            chunk = list(islice(intervals, batch_size))
+            if not chunk:
+                break
+            CustodyInterval.objects.bulk_create(chunk)
+            written += len(chunk)
+    return written
+
+
+def held_at(item_id, at):
+    """
+    The custody interval covering a moment, or None if the item was in the armory.
+    An interval covers its start and ends just before its Return.
+    """
+    interval = (
+        CustodyInterval.objects.select_related('personnel')
+        .filter(item_id=item_id, start__lte=at)
+        .order_by('-start')
+        .first()
+    )
+    if interval is None or (interval.end is not None and interval.end <= at):
+        return None
+    return interval
+
+
+def intervals(item_id=None, personnel_id=None, start=None, end=None):
+    """
+    Intervals overlapping [start, end), newest first.
+    Any of the filters may be omitted.
+    """
+    queryset = CustodyInterval.objects.select_related('item', 'personnel')
+    if item_id:
+        queryset = queryset.filter(item_id=item_id)
+    if personnel_id:
+        queryset = queryset.filter(personnel_id=personnel_id)
+    if end is not None:
+        queryset = queryset.filter(start__lt=end)
+    if start is not None:
+        queryset = queryset.filter(Q(end__isnull=True) | Q(end__gt=start))
+    return queryset.order_by('-start')
@@ -0,0 +1,143 @@
+"""
+Streaming ledger export for ArmGuard
+Produces CSV or NDJSON lines for the transaction ledger (live and archived)
+one row at a time, so memory stays flat regardless of export size.
+"""
+import csv
+import heapq
+import json
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Transaction, TransactionArchive
+from .archive import archive_watermark
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+FORMATS = (FORMAT_CSV, FORMAT_NDJSON)
+
+CONTENT_TYPES = {
+    FORMAT_CSV: 'text/csv',
+    FORMAT_NDJSON: 'application/x-ndjson',
+}
+
+CHUNK_SIZE = 2000
+
+# (column header, lookup) - personnel and item columns come in through the join
+EXPORT_COLUMNS = [
+    ('transaction_id', 'id'),
+    ('date_time', 'date_time'),
+    ('queued_at', 'queued_at'),
+    ('action', 'action'),
+    ('personnel_id', 'personnel_id'),
+    ('rank', 'personnel__rank'),
+    ('surname', 'personnel__surname'),
+    ('firstname', 'personnel__firstname'),
+    ('middle_initial', 'personnel__middle_initial'),
+    ('personnel_serial', 'personnel__serial'),
+    ('office', 'personnel__office'),
+    ('item_id', 'item_id'),
+    ('item_type', 'item__item_type'),
+    ('item_serial', 'item__serial'),
+    ('duty_type', 'duty_type'),
+    ('mags', 'mags'),
+    ('rounds', 'rounds'),
+    ('notes', 'notes'),
+]
+HEADERS = [header for header, _ in EXPORT_COLUMNS]
+LOOKUPS = [lookup for _, lookup in EXPORT_COLUMNS]
+
+
+def parse_bound(value, end=False):
+    """
+    Parse a date or datetime filter value into an aware datetime.
+    A bare end date covers that whole day.
+
+    Returns:
+        datetime or None
+    """
+    if not value:
+        return None
+    # Dates first: parse_datetime() also accepts a bare date (as midnight)
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is not None:
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    else:
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValueError(f"Invalid date: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _filtered(model, start=None, end=None, action=None, duty_type=None):
+    queryset = model.objects.all()
+    if start:
+        queryset = queryset.filter(date_time__gte=start)
+    if end:
+        queryset = queryset.filter(date_time__lt=end)
+    if action:
+        queryset = queryset.filter(action=action)
+    if duty_type:
+        queryset = queryset.filter(duty_type=duty_type)
+    return queryset.order_by('date_time', 'id').values_list(*LOOKUPS).iterator(chunk_size=CHUNK_SIZE)
+
+
+def iter_ledger(start=None, end=None, action=None, duty_type=None):
+    """
+    Yield ledger rows (tuples in EXPORT_COLUMNS order), oldest first.
+
+    The archive is only read when the range reaches back into it; live and
+    archived rows are merged by (date_time, id) as they stream.
+    """
+    sources = [_filtered(Transaction, start, end, action, duty_type)]
+    watermark = archive_watermark()
+    if watermark is not None and (start is None or start <= watermark):
+        sources.append(_filtered(TransactionArchive, start, end, action, duty_type))
+    if len(sources) == 1:
+        return sources[0]
+    return heapq.merge(*sources, key=lambda row: (row[1], row[0]))
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _cell(value):
+    return '' if value is None else _json_value(value)
+
+
+def csv_lines(rows):
+    """Yield the header and one CSV line per row"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADERS)
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def ndjson_lines(rows):
+    """Yield one JSON object per line per row"""
+    for row in rows:
+        yield json.dumps(dict(zip(HEADERS, (_json_value(value) for value in row)))) + '\n'
+
+
+def export_lines(export_format, **filters):
+    """Stream the filtered ledger in the requested format"""
+    rows = iter_ledger(**filters)
+    if export_format == FORMAT_NDJSON:
+        return ndjson_lines(rows)
+    return csv_lines(rows)
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Transaction
+from .autofill import duty_type_choices
 from personnel.models import Personnel
 from inventory.models import Item
 
@@ -55,16 +56,9 @@ class TransactionForm(forms.ModelForm):
     )
     
     # Duty Type dropdown
+    # Duty types come from the autofill rules (editable in admin)
     duty_type = forms.ChoiceField(
-        choices=[
-            ('', 'Select Duty Type'),
-            ('Duty Sentinel', 'Duty Sentinel'),
-            ('Duty Security', 'Duty Security'),
-            ('Vigil', 'Vigil'),
-            ('Guard Duty', 'Guard Duty'),
-            ('Patrol', 'Patrol'),
-            ('Training', 'Training'),
-        ],
+        choices=duty_type_choices,
         required=False,
         widget=forms.Select(attrs={
             'class': 'form-control',
@@ -174,13 +168,7 @@ class TransactionFilterForm(forms.Form):
     
     duty_filter = forms.ChoiceField(
         required=False,
-        choices=[
-            ('', 'All Duty Types'),
-            ('Duty Sentinel', 'Duty Sentinel'),
-            ('Duty Security', 'Duty Security'),
-            ('Vigil', 'Vigil'),
-            ('Guard Duty', 'Guard Duty'),
-        ],
+        choices=lambda: duty_type_choices('All Duty Types'),
         widget=forms.Select(attrs={
             'class': 'form-control form-select',
             'id': 'dutyFilterDropdown'
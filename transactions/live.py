@@ -0,0 +1,255 @@
+"""
+Live transaction feed for ArmGuard
+One poller thread per process follows the ledger (new Transaction IDs) and
+keeps the latest events in memory; every server-sent-events stream in the
+process reads from that buffer. Any number of watchers therefore cost one
+small indexed query per poll interval, instead of each re-rendering the
+dashboard.
+
+Polling the ledger (rather than only publishing from this process) means
+transactions committed by other worker processes reach every watcher too.
+Commits made in this process wake the poller straight away (see signals.py).
+
+Transaction IDs are handed out before commit, so on PostgreSQL a lower ID can
+commit after a higher one. Each poll re-checks the last LIVE_FEED_LOOKBACK_IDS
+IDs below the cursor, and events are buffered in the order they were seen:
+a stream resumes after the position of its last event ID, so a late commit
+is still delivered even though its ID is lower. Pages drop event IDs they
+have already applied (see core/static/js/live_feed.js).
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import close_old_connections, connection
+from .models import Transaction
+
+logger = logging.getLogger(__name__)
+
+EVENT_TRANSACTION = 'transaction'
+EVENT_RESET = 'reset'
+
+# Comment line sent on idle held-open streams so proxies keep them alive
+KEEPALIVE_SECONDS = 15
+
+# Change in item status counts caused by each action
+STATUS_DELTAS = {
+    Transaction.ACTION_TAKE: {'available': -1, 'issued': 1},
+    Transaction.ACTION_RETURN: {'available': 1, 'issued': -1},
+}
+
+
+def poll_interval():
+    return getattr(settings, 'LIVE_FEED_POLL_INTERVAL', 1.0)
+
+
+def stream_seconds():
+    return getattr(settings, 'LIVE_FEED_STREAM_SECONDS', 300)
+
+
+def _buffer_size():
+    return getattr(settings, 'LIVE_FEED_BUFFER_SIZE', 500)
+
+
+def _idle_seconds():
+    return getattr(settings, 'LIVE_FEED_IDLE_SECONDS', 60)
+
+
+def _lookback_ids():
+    return getattr(settings, 'LIVE_FEED_LOOKBACK_IDS', 100)
+
+
+def latest_transaction_id():
+    """Highest transaction ID, for pages to start their feed from"""
+    return Transaction.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def parse_last_event_id(request):
+    """Resume point from the Last-Event-ID header (reconnects) or ?last_event_id="""
+    raw = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_message():
+    """Tell EventSource how long to wait before reconnecting"""
+    return f"retry: {getattr(settings, 'LIVE_FEED_RETRY_MS', 3000)}\n\n"
+
+
+def sse_message(event, data, event_id=None):
+    """Format one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def messages_since(last_id):
+    """
+    Server-sent event messages for everything after last_id.
+
+    Returns:
+        tuple: (list of message strings, new last_id)
+    """
+    events, reset = feed.since(last_id)
+    if reset:
+        latest = feed.latest()
+        return [sse_message(EVENT_RESET, {'latest_id': latest}, latest)], latest
+    if events:
+        return [sse_message(EVENT_TRANSACTION, payload, event_id) for event_id, payload in events], events[-1][0]
+    if last_id is None and feed.latest() is not None:
+        # No resume point given - start from now so reconnects miss nothing
+        return [f'id: {feed.latest()}\n\n'], feed.latest()
+    return [], last_id
+
+
+def event_payload(transaction):
+    """
+    Event body for a posted transaction.
+    Expects personnel and item to be select_related.
+    """
+    # Import here to avoid circular imports
+    from core.utils import serialize_transaction
+    payload = serialize_transaction(transaction)
+    payload['item_status'] = transaction.item.status
+    payload['status_deltas'] = STATUS_DELTAS.get(transaction.action, {})
+    return payload
+
+
+class LiveFeed:
+    """In-memory tail of the ledger, filled by a lazily started poller thread"""
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._events = deque()  # (id, payload) in the order the poller saw them
+        self._ids = set()       # IDs in _events
+        self._floor = None      # Transactions at or below this ID are not buffered
+        self._cursor = None     # Highest transaction ID seen
+        self._thread = None
+        self._last_used = 0.0
+        self._wake = threading.Event()
+
+    def touch(self):
+        """Record a watcher and make sure the poller is running"""
+        with self._lock:
+            self._last_used = time.monotonic()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='armguard-live-feed', daemon=True)
+                self._thread.start()
+            started = self._cursor is not None
+        if not started:
+            self.wait(None, timeout=5)
+
+    def wake(self):
+        """Poll now instead of at the next interval"""
+        self._wake.set()
+
+    def since(self, last_id):
+        """
+        Buffered events after a transaction ID: those seen after it when it
+        is still buffered (including later commits with lower IDs), else
+        those with higher IDs.
+
+        Returns:
+            tuple: (list of (id, payload), reset) - reset is True when events
+            after last_id are no longer buffered and the page must reload
+        """
+        with self._lock:
+            if self._cursor is None:
+                return [], False
+            if last_id is None:
+                return [], False
+            if last_id < self._floor:
+                return [], True
+            if last_id in self._ids:
+                events = list(self._events)
+                position = next(n for n, (event_id, _) in enumerate(events) if event_id == last_id)
+                return events[position + 1:], False
+            return [(event_id, payload) for event_id, payload in self._events if event_id > last_id], False
+
+    def latest(self):
+        """Highest transaction ID seen, or None before the first poll"""
+        with self._lock:
+            return self._cursor
+
+    def wait(self, last_id, timeout):
+        """Block until the feed has polled past last_id or timeout passes"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                if self._cursor is not None and (last_id is None or self._cursor > last_id):
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._lock.wait(remaining)
+
+    def _load_tail(self):
+        """Buffer the most recent transactions so reconnecting watchers can catch up"""
+        recent = list(
+            Transaction.objects.select_related('personnel', 'item').order_by('-id')[:_buffer_size()]
+        )
+        recent.reverse()
+        with self._lock:
+            self._events.clear()
+            self._events.extend((txn.id, event_payload(txn)) for txn in recent)
+            self._ids = {txn.id for txn in recent}
+            self._floor = recent[0].id - 1 if recent else 0
+            self._cursor = recent[-1].id if recent else 0
+            self._lock.notify_all()
+
+    def _poll(self):
+        # IDs only for the lookback window; full rows only for unseen ones
+        low = max(self._floor, self._cursor - _lookback_ids())
+        ids = Transaction.objects.filter(id__gt=low).order_by('id').values_list('id', flat=True)
+        unseen = [txn_id for txn_id in ids[:_buffer_size() + _lookback_ids()] if txn_id not in self._ids]
+        if not unseen:
+            return
+        new = list(
+            Transaction.objects.select_related('personnel', 'item')
+            .filter(id__in=unseen[:_buffer_size()]).order_by('id')
+        )
+        with self._lock:
+            for txn in new:
+                self._events.append((txn.id, event_payload(txn)))
+                self._ids.add(txn.id)
+            while len(self._events) > _buffer_size():
+                dropped = self._events.popleft()[0]
+                self._ids.discard(dropped)
+                self._floor = max(self._floor, dropped)
+            self._cursor = max(self._cursor, new[-1].id)
+            self._lock.notify_all()
+
+    def _run(self):
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    if self._cursor is None:
+                        self._load_tail()
+                    else:
+                        self._poll()
+                except Exception:
+                    logger.exception('Live feed poll failed')
+
+                with self._lock:
+                    if time.monotonic() - self._last_used > _idle_seconds():
+                        # Nobody watching - stop; the next watcher reloads the tail
+                        self._cursor = self._floor = None
+                        self._events.clear()
+                        self._ids.clear()
+                        self._thread = None
+                        return
+                self._wake.wait(poll_interval())
+                self._wake.clear()
+        finally:
+            connection.close()
+
+
+feed = LiveFeed()
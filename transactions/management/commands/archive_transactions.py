@@ -0,0 +1,48 @@
+"""
+Management command to move old transactions into the archive table
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from transactions.archive import archive_cutoff, archivable, archive_chunk, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Move transactions older than the archive horizon into the archive table, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=getattr(settings, 'TRANSACTION_ARCHIVE_DAYS', 365),
+            help='Archive transactions older than this many days (default: TRANSACTION_ARCHIVE_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Transactions moved per database transaction (default: {DEFAULT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many transactions would be archived',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['older_than_days'])
+        chunk_size = max(1, options['chunk_size'])
+
+        pending = archivable(cutoff).count()
+        self.stdout.write(f"Found {pending} transactions older than {cutoff:%d/%m/%y %H:%M} to archive...")
+        if options['dry_run'] or not pending:
+            return
+
+        moved = 0
+        while True:
+            count = archive_chunk(cutoff, chunk_size)
+            if not count:
+                break
+            moved += count
+            self.stdout.write(f"  ✓ Archived {moved}/{pending}")
+
+        self.stdout.write(self.style.SUCCESS(f"\n✓ Archive complete: {moved} transactions moved"))
@@ -0,0 +1,43 @@
+"""
+Management command to export the transaction ledger as CSV or NDJSON
+"""
+from django.core.management.base import BaseCommand, CommandError
+from transactions import export
+
+
+class Command(BaseCommand):
+    help = 'Stream the transaction ledger (live and archived) to a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=export.FORMATS, default=export.FORMAT_CSV)
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--start', help='Earliest date/datetime to include')
+        parser.add_argument('--end', help='Latest date to include (whole day) or datetime')
+        parser.add_argument('--action', help='Only this action (Take or Return)')
+        parser.add_argument('--duty-type', help='Only this duty type')
+
+    def handle(self, *args, **options):
+        try:
+            filters = {
+                'start': export.parse_bound(options['start']),
+                'end': export.parse_bound(options['end'], end=True),
+                'action': options['action'],
+                'duty_type': options['duty_type'],
+            }
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        lines = export.export_lines(options['format'], **filters)
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        count = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as handle:
+            for line in lines:
+                handle.write(line)
+                count += 1
+        if options['format'] == export.FORMAT_CSV:
+            count -= 1  # header line
+        self.stderr.write(self.style.SUCCESS(f"✓ Exported {count} transactions to {options['output']}"))
@@ -0,0 +1,34 @@
+"""
+Management command to delete idempotency keys older than the offline sync window
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from transactions.batch import prune_idempotency_keys, PRUNE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Delete sync and scan-token idempotency keys that are past the replay window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=float,
+            default=None,
+            help='Delete keys older than this many days (default: SCAN_SYNC_MAX_AGE)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=PRUNE_CHUNK_SIZE,
+            help=f'Keys deleted per statement (default: {PRUNE_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        days = options['older_than_days']
+        max_age = settings.SCAN_SYNC_MAX_AGE if days is None else days * 86400
+        if max_age < settings.SCAN_SYNC_MAX_AGE:
+            self.stdout.write(self.style.WARNING(
+                "Keeping keys for less than SCAN_SYNC_MAX_AGE - a retried sync of an older scan may apply it twice"
+            ))
+        deleted = prune_idempotency_keys(max_age, max(1, options['chunk_size']))
+        self.stdout.write(self.style.SUCCESS(f"✓ Pruned {deleted} idempotency keys"))
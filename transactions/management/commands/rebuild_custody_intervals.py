@@ -0,0 +1,22 @@
+"""
+Management command to rebuild the custody interval table from history
+"""
+from django.core.management.base import BaseCommand
+from transactions import custody
+
+
+class Command(BaseCommand):
+    help = 'Rebuild custody intervals from the live ledger and the archive in one sorted pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Intervals inserted per query (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding custody intervals...")
+        count = custody.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"\n✓ Rebuild complete: {count} custody intervals written"))
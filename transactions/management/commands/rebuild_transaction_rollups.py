@@ -0,0 +1,14 @@
+"""
+Management command to recompute the daily transaction rollups from history
+"""
+from django.core.management.base import BaseCommand
+from transactions import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily transaction rollup table from the live ledger and the archive'
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding daily transaction rollups...")
+        count = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"\n✓ Rebuild complete: {count} rollup rows written"))
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_active_custody(apps, schema_editor):
+    """Open a custody row for every issued item whose latest transaction is a Take"""
+    Item = apps.get_model('inventory', 'Item')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    ActiveCustody = apps.get_model('transactions', 'ActiveCustody')
+
+    holders = set()
+    for item in Item.objects.filter(status='Issued'):
+        last = Transaction.objects.filter(item=item).order_by('-date_time', '-id').first()
+        if not last or last.action != 'Take' or last.personnel_id in holders:
+            continue
+        holders.add(last.personnel_id)
+        ActiveCustody.objects.create(
+            item_id=item.id,
+            personnel_id=last.personnel_id,
+            transaction_id=last.id,
+            since=last.date_time,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('personnel', '0003_alter_personnel_picture'),
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveCustody',
+            fields=[
+                ('item', models.OneToOneField(db_column='item_id', on_delete=django.db.models.deletion.PROTECT, primary_key=True, related_name='active_custody', serialize=False, to='inventory.item')),
+                ('since', models.DateTimeField(default=django.utils.timezone.now)),
+                ('personnel', models.OneToOneField(db_column='personnel_id', on_delete=django.db.models.deletion.PROTECT, related_name='active_custody', to='personnel.personnel')),
+                ('transaction', models.OneToOneField(db_column='transaction_id', help_text='Take transaction that opened this custody', on_delete=django.db.models.deletion.PROTECT, related_name='active_custody', to='transactions.transaction')),
+            ],
+            options={
+                'verbose_name': 'Active Custody',
+                'verbose_name_plural': 'Active Custody',
+                'db_table': 'active_custody',
+            },
+        ),
+        migrations.RunPython(backfill_active_custody, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('personnel', '0003_alter_personnel_picture'),
+        ('transactions', '0002_active_custody'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('Take', 'Take/Withdraw'), ('Return', 'Return')], max_length=20)),
+                ('date_time', models.DateTimeField()),
+                ('mags', models.IntegerField(blank=True, default=0, null=True)),
+                ('rounds', models.IntegerField(blank=True, default=0, null=True)),
+                ('duty_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(db_column='item_id', on_delete=django.db.models.deletion.PROTECT, related_name='archived_transactions', to='inventory.item')),
+                ('personnel', models.ForeignKey(db_column='personnel_id', on_delete=django.db.models.deletion.PROTECT, related_name='archived_transactions', to='personnel.personnel')),
+            ],
+            options={
+                'verbose_name': 'Archived Transaction',
+                'verbose_name_plural': 'Archived Transactions',
+                'db_table': 'transactions_archive',
+                'ordering': ['-date_time'],
+                'indexes': [models.Index(fields=['-date_time'], name='transaction_date_ti_7dc586_idx'), models.Index(fields=['personnel', '-date_time'], name='transaction_personn_24cdb4_idx'), models.Index(fields=['item', '-date_time'], name='transaction_item_id_c17fe4_idx')],
+            },
+        ),
+    ]
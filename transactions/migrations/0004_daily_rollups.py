@@ -0,0 +1,61 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:20
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_rollups(apps, schema_editor):
+    """Populate the rollup table from the existing ledger and archive"""
+    Rollup = apps.get_model('transactions', 'DailyTransactionRollup')
+    totals = {}
+    for model_name in ('Transaction', 'TransactionArchive'):
+        rows = (
+            apps.get_model('transactions', model_name).objects
+            .annotate(day=TruncDate('date_time'))
+            .values('day', 'item__item_type', 'duty_type', 'action')
+            .annotate(count=Count('id'), mags=Sum('mags'), rounds=Sum('rounds'))
+            .order_by()
+        )
+        for row in rows:
+            key = (row['day'], row['item__item_type'], row['duty_type'] or '', row['action'])
+            total = totals.setdefault(key, [0, 0, 0])
+            total[0] += row['count']
+            total[1] += row['mags'] or 0
+            total[2] += row['rounds'] or 0
+    Rollup.objects.bulk_create([
+        Rollup(day=day, item_type=item_type, duty_type=duty_type, action=action,
+               count=count, mags=mags, rounds=rounds)
+        for (day, item_type, duty_type, action), (count, mags, rounds) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('item_type', models.CharField(max_length=20)),
+                ('duty_type', models.CharField(blank=True, default='', max_length=100)),
+                ('action', models.CharField(choices=[('Take', 'Take/Withdraw'), ('Return', 'Return')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mags', models.PositiveIntegerField(default=0)),
+                ('rounds', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Transaction Rollup',
+                'verbose_name_plural': 'Daily Transaction Rollups',
+                'db_table': 'transaction_daily_rollups',
+                'ordering': ['-day', 'item_type', 'duty_type', 'action'],
+                'unique_together': {('day', 'item_type', 'duty_type', 'action')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
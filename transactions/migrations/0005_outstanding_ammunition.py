@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_outstanding(apps, schema_editor):
+    """Seed the ledger with the amounts issued on every open Take"""
+    ActiveCustody = apps.get_model('transactions', 'ActiveCustody')
+    OutstandingAmmunition = apps.get_model('transactions', 'OutstandingAmmunition')
+
+    totals = {}
+    for custody in ActiveCustody.objects.select_related('transaction'):
+        take = custody.transaction
+        if not take.mags and not take.rounds:
+            continue
+        total = totals.setdefault((take.personnel_id, take.duty_type or ''), [0, 0])
+        total[0] += take.mags or 0
+        total[1] += take.rounds or 0
+    OutstandingAmmunition.objects.bulk_create([
+        OutstandingAmmunition(personnel_id=personnel_id, duty_type=duty_type, mags=mags, rounds=rounds)
+        for (personnel_id, duty_type), (mags, rounds) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personnel', '0003_alter_personnel_picture'),
+        ('transactions', '0004_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutstandingAmmunition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('duty_type', models.CharField(blank=True, default='', max_length=100)),
+                ('mags', models.IntegerField(default=0)),
+                ('rounds', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('personnel', models.ForeignKey(db_column='personnel_id', on_delete=django.db.models.deletion.PROTECT, related_name='outstanding_ammunition', to='personnel.personnel')),
+            ],
+            options={
+                'verbose_name': 'Outstanding Ammunition',
+                'verbose_name_plural': 'Outstanding Ammunition',
+                'db_table': 'outstanding_ammunition',
+                'ordering': ['duty_type', 'personnel'],
+                'indexes': [models.Index(fields=['duty_type'], name='outstanding_duty_ty_e4235d_idx')],
+                'unique_together': {('personnel', 'duty_type')},
+            },
+        ),
+        migrations.RunPython(backfill_outstanding, migrations.RunPython.noop),
+    ]
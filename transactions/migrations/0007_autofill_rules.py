@@ -0,0 +1,56 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+# The rules hard-coded in core.utils.get_transaction_autofill_data. The .45
+# rule was keyed '.45' there, which never matched the stored item type '45'.
+SEED_RULES = [
+    ('GLOCK', 'Duty Sentinel', 4, 42),
+    ('GLOCK', 'Duty Security', 3, 30),
+    ('M16', 'Duty Sentinel', 3, 90),
+    ('M16', 'Guard Duty', 2, 60),
+    ('M4', 'Duty Sentinel', 3, 90),
+    ('45', 'Duty Sentinel', 3, 21),
+]
+
+# Duty types the forms offered, kept as no-default rules for every item type
+SEED_DUTY_TYPES = ['Duty Sentinel', 'Duty Security', 'Vigil', 'Guard Duty', 'Patrol', 'Training']
+
+
+def seed_rules(apps, schema_editor):
+    AutofillRule = apps.get_model('transactions', 'AutofillRule')
+    AutofillRule.objects.bulk_create(
+        [AutofillRule(item_type=item_type, duty_type=duty_type, mags=mags, rounds=rounds)
+         for item_type, duty_type, mags, rounds in SEED_RULES]
+        + [AutofillRule(item_type='', duty_type=duty_type) for duty_type in SEED_DUTY_TYPES]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutofillRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(blank=True, choices=[('M14', 'M14 Rifle'), ('M16', 'M16 Rifle'), ('M4', 'M4 Carbine'), ('GLOCK', 'Glock Pistol'), ('45', '.45 Pistol')], help_text='Leave blank to apply to every item type', max_length=20)),
+                ('duty_type', models.CharField(max_length=100)),
+                ('mags', models.PositiveIntegerField(default=0)),
+                ('rounds', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Autofill Rule',
+                'verbose_name_plural': 'Autofill Rules',
+                'db_table': 'transaction_autofill_rules',
+                'ordering': ['duty_type', 'item_type'],
+                'unique_together': {('item_type', 'duty_type')},
+            },
+        ),
+        migrations.RunPython(seed_rules, migrations.RunPython.noop),
+    ]
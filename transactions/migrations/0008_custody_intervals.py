@@ -0,0 +1,76 @@
+# Generated by Django 5.1.1 on 2026-10-16 23:42
+
+import heapq
+from itertools import islice
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_custody_intervals(apps, schema_editor):
+    """
+    Pair Takes with Returns from the existing ledger and archive, merged
+    from two time-ordered streams on (date_time, id) so the ledger is never
+    loaded into memory - only each item's open interval is kept.
+    """
+    Interval = apps.get_model('transactions', 'CustodyInterval')
+    fields = ('item_id', 'date_time', 'id', 'personnel_id', 'action')
+    streams = [
+        apps.get_model('transactions', model_name).objects
+        .order_by('date_time', 'id').values_list(*fields).iterator(chunk_size=2000)
+        for model_name in ('Transaction', 'TransactionArchive')
+    ]
+
+    def intervals():
+        opened = {}
+        for item_id, date_time, txn_id, personnel_id, action in heapq.merge(*streams, key=lambda row: (row[1], row[2])):
+            current = opened.pop(item_id, None)
+            if action == 'Take':
+                if current is not None:
+                    current.end = date_time
+                    yield current
+                opened[item_id] = Interval(item_id=item_id, personnel_id=personnel_id, start=date_time, take_id=txn_id)
+            elif current is not None:
+                current.end, current.return_id = date_time, txn_id
+                yield current
+        yield from opened.values()
+
+    pending = intervals()
+    while True:
+        chunk = list(islice(pending, 1000))
+        if not chunk:
+            break
+        Interval.objects.bulk_create(chunk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_stock_take'),
+        ('personnel', '0003_alter_personnel_picture'),
+        ('transactions', '0007_autofill_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustodyInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('take_id', models.IntegerField()),
+                ('return_id', models.IntegerField(blank=True, null=True)),
+                ('item', models.ForeignKey(db_column='item_id', on_delete=django.db.models.deletion.PROTECT, related_name='custody_intervals', to='inventory.item')),
+                ('personnel', models.ForeignKey(db_column='personnel_id', on_delete=django.db.models.deletion.PROTECT, related_name='custody_intervals', to='personnel.personnel')),
+            ],
+            options={
+                'verbose_name': 'Custody Interval',
+                'verbose_name_plural': 'Custody Intervals',
+                'db_table': 'custody_intervals',
+                'ordering': ['-start'],
+                'indexes': [models.Index(fields=['item', '-start'], name='custody_int_item_id_b46842_idx'), models.Index(fields=['personnel', '-start'], name='custody_int_personn_6a41c9_idx'), models.Index(fields=['start', 'end'], name='custody_int_start_7246ff_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('end__isnull', True)), fields=('item',), name='custody_interval_one_open_per_item')],
+            },
+        ),
+        migrations.RunPython(build_custody_intervals, migrations.RunPython.noop),
+    ]
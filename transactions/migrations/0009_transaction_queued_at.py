@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_custody_intervals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, help_text='When the station made the scan, for scans synced from its offline queue', null=True),
+        ),
+        migrations.AddField(
+            model_name='transactionarchive',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
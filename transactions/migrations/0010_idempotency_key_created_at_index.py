@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_transaction_queued_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='idempotencykey',
+            index=models.Index(fields=['created_at'], name='transaction_created_3f4fd3_idx'),
+        ),
+    ]
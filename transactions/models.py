@@ -2,10 +2,15 @@
 Transaction Models for ArmGuard
 Based on APP/app/backend/database.py transactions table
 """
-from django.db import models
+from django.db import models, IntegrityError, transaction as db_transaction
 from django.utils import timezone
 from personnel.models import Personnel
 from inventory.models import Item
+from .signals import transaction_posted
+
+
+class TransactionConflict(ValueError):
+    """Raised when a transaction loses the race for an item or holder"""
 
 
 class Transaction(models.Model):
@@ -40,6 +45,11 @@ class Transaction(models.Model):
     # Transaction Details
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     date_time = models.DateTimeField(default=timezone.now)
+    queued_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the station made the scan, for scans synced from its offline queue"
+    )
     
     # Additional fields for withdrawals
     mags = models.IntegerField(
@@ -76,6 +86,9 @@ class Transaction(models.Model):
             models.Index(fields=['item', '-date_time']),
         ]
     
+    # Rows in the live ledger; TransactionArchive overrides this
+    is_archived = False
+    
     def __str__(self):
         return f"{self.action} - {self.item} by {self.personnel} on {self.date_time.strftime('%d/%m/%y %H:%M')}"
     
@@ -88,42 +101,351 @@ class Transaction(models.Model):
         return self.action == self.ACTION_RETURN
     
     def save(self, *args, **kwargs):
-        """Override save to update item status based on action"""
-        is_new = self.pk is None
+        """
+        Override save to update item status and active custody based on action.
+        
+        New transactions claim the item with a conditional UPDATE
+        (compare-and-swap on Item.status) inside one atomic block together
+        with the transaction insert, so the affected row count decides which
+        of two concurrent scans wins.
+        """
+        if self.pk is not None:
+            super().save(*args, **kwargs)
+            return
         
-        # Validate transaction before saving
-        if is_new:
+        if self.action == self.ACTION_TAKE:
+            expected_status, new_status = Item.STATUS_AVAILABLE, Item.STATUS_ISSUED
+        elif self.action == self.ACTION_RETURN:
+            expected_status, new_status = Item.STATUS_ISSUED, Item.STATUS_AVAILABLE
+        else:
+            raise ValueError(f'Invalid action: {self.action}. Must be "Take" or "Return".')
+        
+        closed = {}
+        with db_transaction.atomic():
+            # Claim the item first - the write lock is taken before any read
+            claimed = Item.objects.filter(
+                pk=self.item_id, status=expected_status
+            ).update(status=new_status, updated_at=timezone.now())
+            if not claimed:
+                raise self._claim_error()
+            
             if self.action == self.ACTION_TAKE:
                 # Item cannot be taken — personnel already has an issued item
-                current_issued_items = Item.objects.filter(status=Item.STATUS_ISSUED)
-                for item in current_issued_items:
-                    # Check if this item was last taken by this personnel
-                    last_transaction = item.transactions.order_by('-date_time').first()
-                    if (last_transaction and 
-                        last_transaction.action == self.ACTION_TAKE and 
-                        last_transaction.personnel == self.personnel):
-                        raise ValueError(f"Item cannot be taken — personnel {self.personnel} already has an issued item: {item}")
-                
-                # Cannot take item that's already issued
-                if self.item.status == Item.STATUS_ISSUED:
-                    raise ValueError(f"Cannot take item {self.item.id} - already issued")
-                # Cannot take item in maintenance or retired
-                if self.item.status in [Item.STATUS_MAINTENANCE, Item.STATUS_RETIRED]:
-                    raise ValueError(f"Cannot take item {self.item.id} - status is {self.item.status}")
+                held = ActiveCustody.objects.filter(personnel_id=self.personnel_id).select_related('item').first()
+                if held:
+                    raise ValueError(f"Item cannot be taken — personnel {self.personnel} already has an issued item: {held.item}")
+            
+            super().save(*args, **kwargs)
             
-            elif self.action == self.ACTION_RETURN:
-                # Cannot return item that's not issued
-                if self.item.status != Item.STATUS_ISSUED:
-                    raise ValueError(f"Cannot return item {self.item.id} - not currently issued")
-        
-        super().save(*args, **kwargs)
-        
-        # Update item status after saving transaction
-        if is_new:
             if self.action == self.ACTION_TAKE:
-                self.item.status = Item.STATUS_ISSUED
-                self.item.save()
-            elif self.action == self.ACTION_RETURN:
-                self.item.status = Item.STATUS_AVAILABLE
-                self.item.save()
+                try:
+                    with db_transaction.atomic():
+                        ActiveCustody.objects.create(
+                            item_id=self.item_id,
+                            personnel_id=self.personnel_id,
+                            transaction=self,
+                            since=self.date_time,
+                        )
+                except IntegrityError:
+                    raise TransactionConflict(f"Item cannot be taken — item {self.item_id} or personnel {self.personnel_id} already has an active custody record")
+            else:
+                custody = ActiveCustody.objects.filter(item_id=self.item_id).select_related('transaction').first()
+                if custody:
+                    closed[self.item_id] = custody.transaction
+                    custody.delete()
+            
+            # Keep the in-memory item in step with the row we just updated
+            self.item.status = new_status
+            transaction_posted.send(sender=Transaction, transactions=[self], closed=closed)
+    
+    def _claim_error(self):
+        """
+        Explain why the conditional status update matched no row.
+        
+        An item another scan just issued or returned is a lost race
+        (TransactionConflict); a missing, retired or in-maintenance item
+        is a validation error, as it was before the status update.
+        """
+        status = Item.objects.filter(pk=self.item_id).values_list('status', flat=True).first()
+        if status is None:
+            return ValueError(f"Item {self.item_id} not found")
+        if self.action == self.ACTION_TAKE:
+            if status == Item.STATUS_ISSUED:
+                return TransactionConflict(f"Cannot take item {self.item_id} - already issued")
+            return ValueError(f"Cannot take item {self.item_id} - status is {status}")
+        if status == Item.STATUS_AVAILABLE:
+            return TransactionConflict(f"Cannot return item {self.item_id} - not currently issued")
+        return ValueError(f"Cannot return item {self.item_id} - not currently issued")
+
+
+class ActiveCustody(models.Model):
+    """
+    Active custody - one row per currently issued item and its holder.
+    Maintained by Transaction.save() on Take and Return. The one-to-one
+    columns let the database enforce "one holder per item" and
+    "one issued item per personnel".
+    """
+    
+    item = models.OneToOneField(
+        Item,
+        on_delete=models.PROTECT,
+        primary_key=True,
+        related_name='active_custody',
+        db_column='item_id'
+    )
+    personnel = models.OneToOneField(
+        Personnel,
+        on_delete=models.PROTECT,
+        related_name='active_custody',
+        db_column='personnel_id'
+    )
+    transaction = models.OneToOneField(
+        Transaction,
+        on_delete=models.PROTECT,
+        related_name='active_custody',
+        db_column='transaction_id',
+        help_text="Take transaction that opened this custody"
+    )
+    since = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'active_custody'
+        verbose_name = 'Active Custody'
+        verbose_name_plural = 'Active Custody'
+    
+    def __str__(self):
+        return f"{self.item} held by {self.personnel}"
+
 
+class TransactionArchive(models.Model):
+    """
+    Archived transaction - ledger rows moved out of the live table by the
+    archive_transactions command once they pass the archive horizon.
+    Keeps the original transaction ID and column layout.
+    """
+    
+    id = models.IntegerField(primary_key=True)
+    
+    personnel = models.ForeignKey(
+        Personnel,
+        on_delete=models.PROTECT,
+        related_name='archived_transactions',
+        db_column='personnel_id'
+    )
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.PROTECT,
+        related_name='archived_transactions',
+        db_column='item_id'
+    )
+    
+    action = models.CharField(max_length=20, choices=Transaction.ACTION_CHOICES)
+    date_time = models.DateTimeField()
+    queued_at = models.DateTimeField(blank=True, null=True)
+    mags = models.IntegerField(default=0, blank=True, null=True)
+    rounds = models.IntegerField(default=0, blank=True, null=True)
+    duty_type = models.CharField(max_length=100, blank=True, null=True)
+    notes = models.TextField(blank=True, null=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    is_archived = True
+    
+    # Columns copied verbatim from Transaction when archiving
+    COPIED_FIELDS = [
+        'id', 'personnel_id', 'item_id', 'action', 'date_time', 'queued_at', 'mags', 'rounds', 'duty_type', 'notes',
+        'created_at',
+    ]
+    
+    class Meta:
+        db_table = 'transactions_archive'
+        ordering = ['-date_time']
+        verbose_name = 'Archived Transaction'
+        verbose_name_plural = 'Archived Transactions'
+        indexes = [
+            models.Index(fields=['-date_time']),
+            models.Index(fields=['personnel', '-date_time']),
+            models.Index(fields=['item', '-date_time']),
+        ]
+    
+    def __str__(self):
+        return f"{self.action} - {self.item} by {self.personnel} on {self.date_time.strftime('%d/%m/%y %H:%M')} (archived)"
+    
+    def is_withdrawal(self):
+        """Check if transaction is a withdrawal"""
+        return self.action == Transaction.ACTION_TAKE
+    
+    def is_return(self):
+        """Check if transaction is a return"""
+        return self.action == Transaction.ACTION_RETURN
+
+
+class DailyTransactionRollup(models.Model):
+    """
+    Daily ledger rollup - transaction counts and issued mags/rounds per
+    (day, item type, duty type, action). Updated incrementally as
+    transactions post; rebuild with the rebuild_transaction_rollups command.
+    """
+    
+    day = models.DateField()
+    item_type = models.CharField(max_length=20)
+    duty_type = models.CharField(max_length=100, blank=True, default='')
+    action = models.CharField(max_length=20, choices=Transaction.ACTION_CHOICES)
+    
+    count = models.PositiveIntegerField(default=0)
+    mags = models.PositiveIntegerField(default=0)
+    rounds = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'transaction_daily_rollups'
+        ordering = ['-day', 'item_type', 'duty_type', 'action']
+        verbose_name = 'Daily Transaction Rollup'
+        verbose_name_plural = 'Daily Transaction Rollups'
+        unique_together = ['day', 'item_type', 'duty_type', 'action']
+    
+    def __str__(self):
+        return f"{self.day:%d/%m/%y} {self.item_type} {self.duty_type or '-'} {self.action}: {self.count}"
+
+
+class OutstandingAmmunition(models.Model):
+    """
+    Outstanding ammunition - magazines and rounds currently out with each
+    personnel, per duty type. Take adds the issued amounts; Return takes
+    off the amounts handed back, or everything issued with the closed Take
+    when the return records none. Rows that reach zero are removed, so
+    the table only holds what is still out.
+    """
+    
+    personnel = models.ForeignKey(
+        Personnel,
+        on_delete=models.PROTECT,
+        related_name='outstanding_ammunition',
+        db_column='personnel_id'
+    )
+    duty_type = models.CharField(max_length=100, blank=True, default='')
+    mags = models.IntegerField(default=0)
+    rounds = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'outstanding_ammunition'
+        ordering = ['duty_type', 'personnel']
+        verbose_name = 'Outstanding Ammunition'
+        verbose_name_plural = 'Outstanding Ammunition'
+        unique_together = ['personnel', 'duty_type']
+        indexes = [
+            models.Index(fields=['duty_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.personnel} ({self.duty_type or '-'}): {self.mags} mags, {self.rounds} rounds"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Client-generated key for a queued scan, recorded in the same database
+    transaction as the ledger row it produced, so a replayed sync is a no-op.
+    Stores the transaction ID rather than a foreign key so archiving the
+    transaction does not touch the key. Keys past the replay window are
+    removed by the prune_idempotency_keys command.
+    """
+    
+    key = models.CharField(max_length=64, primary_key=True)
+    transaction_id = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'transaction_idempotency_keys'
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        indexes = [
+            # prune_idempotency_keys deletes the oldest keys first
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} -> {self.transaction_id}"
+
+
+class AutofillRule(models.Model):
+    """
+    Default mags and rounds suggested for an item type on a duty type.
+    A rule with no item type applies to every item type on that duty and
+    is overridden by item-type rules; the duty types offered by the forms
+    are the duty types that have an active rule (see autofill.py).
+    """
+    
+    item_type = models.CharField(
+        max_length=20,
+        choices=Item.ITEM_TYPE_CHOICES,
+        blank=True,
+        help_text='Leave blank to apply to every item type'
+    )
+    duty_type = models.CharField(max_length=100)
+    mags = models.PositiveIntegerField(default=0)
+    rounds = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'transaction_autofill_rules'
+        ordering = ['duty_type', 'item_type']
+        verbose_name = 'Autofill Rule'
+        verbose_name_plural = 'Autofill Rules'
+        unique_together = ['item_type', 'duty_type']
+    
+    def __str__(self):
+        return f"{self.item_type or 'Any item'} / {self.duty_type}: {self.mags} mags, {self.rounds} rounds"
+
+
+class CustodyInterval(models.Model):
+    """
+    Custody interval - who held an item from a Take until its Return.
+    Open intervals (end is null) are current custody. Maintained as
+    transactions post; rebuild with the rebuild_custody_intervals command.
+    Take/Return transaction IDs are stored without foreign keys so
+    archiving the ledger rows leaves the intervals in place.
+    """
+    
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.PROTECT,
+        related_name='custody_intervals',
+        db_column='item_id'
+    )
+    personnel = models.ForeignKey(
+        Personnel,
+        on_delete=models.PROTECT,
+        related_name='custody_intervals',
+        db_column='personnel_id'
+    )
+    start = models.DateTimeField()
+    end = models.DateTimeField(null=True, blank=True)
+    take_id = models.IntegerField()
+    return_id = models.IntegerField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'custody_intervals'
+        ordering = ['-start']
+        verbose_name = 'Custody Interval'
+        verbose_name_plural = 'Custody Intervals'
+        indexes = [
+            # Point-in-time: latest interval of an item / personnel starting at or before T
+            models.Index(fields=['item', '-start']),
+            models.Index(fields=['personnel', '-start']),
+            # Overlap with a time window across all items
+            models.Index(fields=['start', 'end']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['item'],
+                condition=models.Q(end__isnull=True),
+                name='custody_interval_one_open_per_item'
+            ),
+        ]
+    
+    def __str__(self):
+        end = self.end.strftime('%d/%m/%y %H:%M') if self.end else 'now'
+        return f"{self.item} held by {self.personnel} {self.start:%d/%m/%y %H:%M} - {end}"
@@ -0,0 +1,159 @@
+"""
+Keyset (cursor) pagination for the transaction ledger
+Pages are addressed by the (date_time, id) of a boundary row instead of an
+OFFSET, so every page costs one index range scan no matter how deep it is.
+The date_time indexes on Transaction carry the row id implicitly, which
+makes (date_time, id) ordering an index walk.
+
+Archived rows keep their original IDs, so one cursor addresses both the
+live table and the archive.
+"""
+import base64
+from datetime import datetime
+from django.db.models import Q
+from .archive import archive_watermark
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor string cannot be decoded"""
+
+
+def encode_cursor(date_time, pk):
+    """Encode a (date_time, id) boundary as an opaque URL-safe string"""
+    raw = f"{date_time.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Returns:
+        tuple: (datetime, int)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, pk_part = raw.rsplit('|', 1)
+        return datetime.fromisoformat(date_part), int(pk_part)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+
+def older_than(date_time, pk):
+    """Rows strictly after the boundary in newest-first order"""
+    return Q(date_time__lt=date_time) | Q(date_time=date_time, id__lt=pk)
+
+
+def newer_than(date_time, pk):
+    """Rows strictly before the boundary in newest-first order"""
+    return Q(date_time__gt=date_time) | Q(date_time=date_time, id__gt=pk)
+
+
+class KeysetPage:
+    """One page of rows, newest first, with cursors to its neighbours"""
+
+    def __init__(self, rows, has_next, has_prev):
+        self.rows = rows
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = encode_cursor(rows[-1].date_time, rows[-1].pk) if rows and has_next else None
+        self.prev_cursor = encode_cursor(rows[0].date_time, rows[0].pk) if rows and has_prev else None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _newest_first(rows):
+    return sorted(rows, key=lambda row: (row.date_time, row.pk), reverse=True)
+
+
+def fetch_page(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE, archive=None):
+    """
+    Fetch one newest-first page of a transaction queryset.
+
+    Args:
+        queryset: Transaction queryset (already filtered / select_related)
+        after (str): cursor - return rows older than this boundary (next page)
+        before (str): cursor - return rows newer than this boundary (previous page)
+        page_size (int): rows per page
+        archive: matching TransactionArchive queryset. It is only queried
+            when the page reaches back past the newest archived row.
+
+    Returns:
+        KeysetPage
+    """
+    watermark = None
+    if archive is not None:
+        watermark = archive_watermark()
+        if watermark is None:
+            archive = None
+
+    if before:
+        boundary = decode_cursor(before)
+        window = newer_than(*boundary)
+        rows = list(queryset.filter(window).order_by('date_time', 'id')[:page_size + 1])
+        if archive is not None and watermark >= boundary[0]:
+            rows += list(archive.filter(window).order_by('date_time', 'id')[:page_size + 1])
+            rows = sorted(rows, key=lambda row: (row.date_time, row.pk))[:page_size + 1]
+        has_prev = len(rows) > page_size
+        return KeysetPage(list(reversed(rows[:page_size])), has_next=True, has_prev=has_prev)
+
+    if after:
+        window = older_than(*decode_cursor(after))
+        queryset = queryset.filter(window)
+        if archive is not None:
+            archive = archive.filter(window)
+    rows = list(queryset.order_by('-date_time', '-id')[:page_size + 1])
+    if archive is not None and (len(rows) <= page_size or rows[-1].date_time <= watermark):
+        rows += list(archive.order_by('-date_time', '-id')[:page_size + 1])
+        rows = _newest_first(rows)[:page_size + 1]
+    has_next = len(rows) > page_size
+    return KeysetPage(rows[:page_size], has_next=has_next, has_prev=bool(after))
+
+
+def page_size_from(params, default=DEFAULT_PAGE_SIZE):
+    """Read a bounded page size from request parameters"""
+    try:
+        size = int(params.get('limit', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate_request(request, queryset, *, default_size=DEFAULT_PAGE_SIZE, archive=None):
+    """
+    Fetch the page selected by the request's after/before/limit parameters.
+
+    Adds next_query / prev_query to the page - the current query string
+    with the cursor swapped - for building pager links in templates.
+    Invalid cursors fall back to the first page.
+    """
+    size = page_size_from(request.GET, default_size)
+    try:
+        page = fetch_page(
+            queryset,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=size,
+            archive=archive,
+        )
+    except InvalidCursor:
+        page = fetch_page(queryset, page_size=size, archive=archive)
+
+    def query_with(key, cursor):
+        params = request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[key] = cursor
+        return params.urlencode()
+
+    page.next_query = query_with('after', page.next_cursor) if page.next_cursor else None
+    page.prev_query = query_with('before', page.prev_cursor) if page.prev_cursor else None
+    return page
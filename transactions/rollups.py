@@ -0,0 +1,102 @@
+"""
+Daily ledger rollups for ArmGuard
+Keeps per-day counts and issued mags/rounds so reports and the dashboard
+read a few dozen rollup rows instead of counting the raw ledger.
+"""
+from collections import defaultdict
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Transaction, TransactionArchive, DailyTransactionRollup
+
+
+def rollup_key(day, item_type, duty_type, action):
+    return (day, item_type, duty_type or '', action)
+
+
+def apply_transactions(transactions):
+    """
+    Add newly written transactions to their daily rollup rows.
+    Call inside the atomic block that wrote the transactions.
+
+    Args:
+        transactions (list): Transaction instances with item loaded
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    for txn in transactions:
+        key = rollup_key(timezone.localdate(txn.date_time), txn.item.item_type, txn.duty_type, txn.action)
+        totals[key][0] += 1
+        totals[key][1] += txn.mags or 0
+        totals[key][2] += txn.rounds or 0
+
+    for (day, item_type, duty_type, action), (count, mags, rounds) in totals.items():
+        lookup = {'day': day, 'item_type': item_type, 'duty_type': duty_type, 'action': action}
+        increment = {'count': F('count') + count, 'mags': F('mags') + mags, 'rounds': F('rounds') + rounds}
+        if DailyTransactionRollup.objects.filter(**lookup).update(**increment):
+            continue
+        try:
+            with db_transaction.atomic():
+                DailyTransactionRollup.objects.create(count=count, mags=mags, rounds=rounds, **lookup)
+        except IntegrityError:
+            # Another writer created the row first
+            DailyTransactionRollup.objects.filter(**lookup).update(**increment)
+
+
+def _aggregate(model):
+    return (
+        model.objects
+        .annotate(day=TruncDate('date_time'))
+        .values('day', 'item__item_type', 'duty_type', 'action')
+        .annotate(count=Count('id'), mags=Sum('mags'), rounds=Sum('rounds'))
+        .order_by()
+    )
+
+
+def rebuild():
+    """
+    Recompute every rollup row from the live ledger and the archive.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    for model in (Transaction, TransactionArchive):
+        for row in _aggregate(model):
+            key = rollup_key(row['day'], row['item__item_type'], row['duty_type'], row['action'])
+            totals[key][0] += row['count']
+            totals[key][1] += row['mags'] or 0
+            totals[key][2] += row['rounds'] or 0
+
+    with db_transaction.atomic():
+        DailyTransactionRollup.objects.all().delete()
+        DailyTransactionRollup.objects.bulk_create([
+            DailyTransactionRollup(
+                day=day, item_type=item_type, duty_type=duty_type, action=action,
+                count=count, mags=mags, rounds=rounds,
+            )
+            for (day, item_type, duty_type, action), (count, mags, rounds) in totals.items()
+        ], batch_size=1000)
+    return len(totals)
+
+
+def summarize(start_day, end_day=None, group_by=()):
+    """
+    Totals for a range of days (inclusive) from the rollup table.
+
+    Args:
+        start_day (date): First day
+        end_day (date): Last day (default: no upper bound)
+        group_by (tuple): Rollup columns to group by, e.g. ('action',)
+
+    Returns:
+        list or dict: Rows of totals per group, or one totals dict if group_by is empty
+    """
+    rows = DailyTransactionRollup.objects.filter(day__gte=start_day)
+    if end_day:
+        rows = rows.filter(day__lte=end_day)
+    aggregates = {'count': Sum('count'), 'mags': Sum('mags'), 'rounds': Sum('rounds')}
+    if not group_by:
+        totals = rows.aggregate(**aggregates)
+        return {key: value or 0 for key, value in totals.items()}
+    return list(rows.values(*group_by).annotate(**aggregates).order_by(*group_by))
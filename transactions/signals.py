@@ -0,0 +1,58 @@
+"""
+Transaction Signals - Keep derived ledger tables in step as transactions post
+"""
+
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+# Sent inside the writing atomic block after new transactions are saved,
+# by Transaction.save() and by batch processing.
+# Arguments: transactions - list of new Transaction instances (item loaded)
+#            closed - {item_id: Take transaction} for custody held before these
+#                     transactions and closed by their Returns (a batch may
+#                     also Take and Return an item; that pair is in transactions)
+transaction_posted = Signal()
+
+
+@receiver(transaction_posted)
+def update_daily_rollups(sender, transactions, **kwargs):
+    """Add posted transactions to the daily rollup rows"""
+    # Import here to avoid circular imports
+    from . import rollups
+    rollups.apply_transactions(transactions)
+
+
+@receiver(transaction_posted)
+def update_outstanding_ammunition(sender, transactions, closed=None, **kwargs):
+    """Move issued and returned mags/rounds on the outstanding ledger"""
+    # Import here to avoid circular imports
+    from . import ammunition
+    ammunition.apply_transactions(transactions, closed or {})
+
+
+@receiver(transaction_posted)
+def wake_live_feed(sender, **kwargs):
+    """Let this process's live feed pick the transactions up as soon as they commit"""
+    # Import here to avoid circular imports
+    from .live import feed
+    db_transaction.on_commit(feed.wake)
+
+
+@receiver(transaction_posted)
+def update_custody_intervals(sender, transactions, **kwargs):
+    """Open and close custody intervals for posted Takes and Returns"""
+    # Import here to avoid circular imports
+    from . import custody
+    custody.apply_transactions(transactions)
+
+
+@receiver(post_save, sender='transactions.AutofillRule')
+@receiver(post_delete, sender='transactions.AutofillRule')
+def recompile_autofill_rules(sender, **kwargs):
+    """Rebuild this process's autofill table now and once the change commits"""
+    # Import here to avoid circular imports
+    from . import autofill
+    autofill.invalidate()
+    db_transaction.on_commit(autofill.invalidate)
+
@@ -0,0 +1,1011 @@
+import importlib
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime, time, timedelta
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import Permission, User
+from django.core import signing
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction as db_transaction
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import async_api_views, scan_cache
+from core.utils import SCAN_TOKEN_SALT, bulk_lookup, parse_qr_code
+from inventory.models import Item
+from personnel.models import Personnel
+from . import archive, autofill, batch, custody, export, live, pagination, rollups
+from .models import (
+    Transaction, TransactionArchive, TransactionConflict, ActiveCustody, AutofillRule, CustodyInterval,
+    DailyTransactionRollup, IdempotencyKey, OutstandingAmmunition,
+)
+from .views import get_issued_items
+
+MEDIA_ROOT = None
+_media_settings = None
+
+# Rate limiting and the HTTPS redirect off, so the test client reaches the views
+CLIENT_SETTINGS = {'RATELIMIT_ENABLE': False, 'SECURE_SSL_REDIRECT': False}
+
+
+def setUpModule():
+    # Uploaded pictures and QR images go to a scratch MEDIA_ROOT for this module only
+    global MEDIA_ROOT, _media_settings
+    MEDIA_ROOT = tempfile.mkdtemp(prefix='armguard-test-media-')
+    _media_settings = override_settings(MEDIA_ROOT=MEDIA_ROOT)
+    _media_settings.enable()
+
+
+def tearDownModule():
+    _media_settings.disable()
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def make_personnel(serial):
+    return Personnel.objects.create(
+        surname='Tester', firstname='Scan', rank='AM',
+        serial=serial, office='HAS', tel='+639123456789',
+    )
+
+
+def make_item(serial, item_type=Item.ITEM_TYPE_M16):
+    return Item.objects.create(item_type=item_type, serial=serial)
+
+
+@override_settings(**CLIENT_SETTINGS)
+class ArmGuardTestCase(TestCase):
+    """Base for this module's tests - applies CLIENT_SETTINGS"""
+
+
+@override_settings(**CLIENT_SETTINGS)
+class ConcurrentTakeTest(TransactionTestCase):
+    """Concurrent Take requests for one item - exactly one may win"""
+
+    STATIONS = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a file-backed test database (DJANGO_TEST_DB_NAME) for concurrent connections')
+        self.user = User.objects.create_user('armorer', password='x', is_staff=True)
+        self.item = make_item('STRESS-1')
+        self.personnel = [make_personnel(f'90000{n}') for n in range(self.STATIONS)]
+
+    def test_concurrent_take_single_winner(self):
+        barrier = threading.Barrier(self.STATIONS, timeout=30)
+        statuses = []
+        lock = threading.Lock()
+        clients = []
+        for _ in self.personnel:
+            client = Client()
+            client.force_login(self.user)
+            clients.append(client)
+
+        def station(client, person):
+            payload = json.dumps({
+                'personnel_id': person.id,
+                'item_id': self.item.id,
+                'action': Transaction.ACTION_TAKE,
+            })
+            try:
+                barrier.wait()
+                response = client.post('/api/transactions/', payload, content_type='application/json')
+                with lock:
+                    statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=station, args=(c, p)) for c, p in zip(clients, self.personnel)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(statuses), self.STATIONS)
+        self.assertEqual(statuses.count(200), 1, statuses)
+        # Losers are rejected cleanly, either up front or by the status CAS
+        self.assertTrue(all(code in (200, 400, 409) for code in statuses), statuses)
+        self.assertEqual(Transaction.objects.filter(item=self.item).count(), 1)
+        self.assertEqual(ActiveCustody.objects.filter(item=self.item).count(), 1)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, Item.STATUS_ISSUED)
+
+
+class TransactionStatusCodeTest(ArmGuardTestCase):
+    """Rule violations are 400; only a lost race for the item is 409"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('issuer', password='x'))
+        self.person = make_personnel('910001')
+        self.items = [make_item('CODE-1'), make_item('CODE-2')]
+
+    def post(self, item, action=Transaction.ACTION_TAKE):
+        payload = json.dumps({'personnel_id': self.person.id, 'item_id': item.id, 'action': action})
+        return self.client.post('/api/transactions/', payload, content_type='application/json')
+
+    def test_holder_rule_is_validation_error(self):
+        self.assertEqual(self.post(self.items[0]).status_code, 200)
+        response = self.post(self.items[1])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already has an issued item', response.json()['error'])
+
+    def test_lost_claim_is_conflict(self):
+        Transaction.objects.create(personnel=self.person, item=self.items[0], action=Transaction.ACTION_TAKE)
+        with self.assertRaises(TransactionConflict):
+            Transaction.objects.create(personnel=make_personnel('910002'), item=self.items[0], action=Transaction.ACTION_TAKE)
+
+        self.items[1].status = Item.STATUS_MAINTENANCE
+        self.items[1].save()
+        with self.assertRaises(ValueError) as raised:
+            Transaction.objects.create(personnel=make_personnel('910003'), item=self.items[1], action=Transaction.ACTION_TAKE)
+        self.assertNotIsInstance(raised.exception, TransactionConflict)
+
+
+class ActiveCustodyTest(ArmGuardTestCase):
+    """Active custody - Take opens the row, Return closes it, the holder check reads it"""
+
+    def setUp(self):
+        self.person = make_personnel('915001')
+        self.items = [make_item('ACTIVE-1'), make_item('ACTIVE-2')]
+
+    def test_take_and_return_keep_one_row_per_item(self):
+        take = Transaction.objects.create(personnel=self.person, item=self.items[0], action=Transaction.ACTION_TAKE)
+        row = ActiveCustody.objects.get(item=self.items[0])
+        self.assertEqual((row.personnel_id, row.transaction_id, row.since), (self.person.id, take.id, take.date_time))
+
+        Transaction.objects.create(personnel=self.person, item=self.items[0], action=Transaction.ACTION_RETURN)
+        self.assertFalse(ActiveCustody.objects.exists())
+
+        # Once the return closes custody the same personnel may take another item
+        second = Transaction.objects.create(personnel=self.person, item=self.items[1], action=Transaction.ACTION_TAKE)
+        self.assertEqual(self.person.active_custody.transaction_id, second.id)
+
+    def test_holder_check_is_one_lookup(self):
+        Transaction.objects.create(personnel=self.person, item=self.items[0], action=Transaction.ACTION_TAKE)
+        for n in range(5):
+            holder = make_personnel(f'91510{n}')
+            item = make_item(f'ACTIVE-BUSY-{n}')
+            Transaction.objects.create(personnel=holder, item=item, action=Transaction.ACTION_TAKE)
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertRaises(ValueError) as raised:
+                with db_transaction.atomic():
+                    Transaction.objects.create(personnel=self.person, item=self.items[1], action=Transaction.ACTION_TAKE)
+        self.assertNotIsInstance(raised.exception, TransactionConflict)
+        self.assertIn('ACTIVE-1', str(raised.exception))
+        custody_reads = [q for q in queries.captured_queries if 'active_custody' in q['sql']]
+        self.assertEqual(len(custody_reads), 1)
+
+        # The refused take is rolled back with its status claim
+        self.items[1].refresh_from_db()
+        self.assertEqual(self.items[1].status, Item.STATUS_AVAILABLE)
+        self.assertEqual(ActiveCustody.objects.count(), 6)
+
+    def test_database_enforces_one_item_per_personnel(self):
+        take = Transaction.objects.create(personnel=self.person, item=self.items[0], action=Transaction.ACTION_TAKE)
+        with self.assertRaises(IntegrityError):
+            with db_transaction.atomic():
+                ActiveCustody.objects.create(item=self.items[1], personnel=self.person, transaction=take)
+
+
+class IssuedItemsPanelTest(ArmGuardTestCase):
+    """Currently issued panel - one row per issued item, fixed query count"""
+
+    def setUp(self):
+        self.holders = [make_personnel(f'70000{n}') for n in range(3)]
+        self.items = [make_item(f'PANEL-{n}') for n in range(3)]
+
+    def cycle(self, rounds):
+        """Take and return every item repeatedly to grow the history"""
+        for _ in range(rounds):
+            for person, item in zip(self.holders, self.items):
+                Transaction.objects.create(personnel=person, item=item, action=Transaction.ACTION_TAKE)
+                Transaction.objects.create(personnel=person, item=item, action=Transaction.ACTION_RETURN)
+
+    def test_one_row_per_issued_item(self):
+        self.cycle(5)
+        latest = Transaction.objects.create(
+            personnel=self.holders[0], item=self.items[0], action=Transaction.ACTION_TAKE
+        )
+        Transaction.objects.create(personnel=self.holders[1], item=self.items[1], action=Transaction.ACTION_TAKE)
+
+        with self.assertNumQueries(1):
+            rows = list(get_issued_items())
+            holders = [(row.personnel.surname, row.item.serial) for row in rows]
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(len(holders), 2)
+        self.assertIn(latest, rows)
+
+    def test_size_independent_of_history(self):
+        Transaction.objects.create(personnel=self.holders[0], item=self.items[0], action=Transaction.ACTION_TAKE)
+        before = list(get_issued_items())
+        Transaction.objects.create(personnel=self.holders[0], item=self.items[0], action=Transaction.ACTION_RETURN)
+        self.cycle(10)
+        Transaction.objects.create(personnel=self.holders[0], item=self.items[0], action=Transaction.ACTION_TAKE)
+
+        with self.assertNumQueries(1):
+            after = list(get_issued_items())
+        self.assertEqual(len(before), len(after))
+
+    def test_list_view_context(self):
+        user = User.objects.create_user('viewer', password='x')
+        self.client.force_login(user)
+        self.cycle(3)
+        Transaction.objects.create(personnel=self.holders[2], item=self.items[2], action=Transaction.ACTION_TAKE)
+
+        response = self.client.get('/transactions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row.item_id for row in response.context['issued_items']], [self.items[2].id])
+
+
+class HistoryPagesTest(ArmGuardTestCase):
+    """Personnel, item and lookup history pages list live and archived rows"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('historian', password='x'))
+        self.person = make_personnel('920001')
+        self.item = make_item('HISTORY-1')
+        old = timezone.now() - timedelta(days=400)
+        for action, days in ((Transaction.ACTION_TAKE, 0), (Transaction.ACTION_RETURN, 1)):
+            Transaction.objects.create(
+                personnel=self.person, item=self.item, action=action, date_time=old + timedelta(days=days)
+            )
+        archive.archive_chunk(archive.archive_cutoff())
+        self.live = Transaction.objects.create(personnel=self.person, item=self.item, action=Transaction.ACTION_TAKE)
+
+    def rows(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [(txn.id, txn.is_archived) for txn in response.context['transactions']]
+
+    def test_pages_merge_archive(self):
+        self.assertEqual(TransactionArchive.objects.count(), 2)
+        for url in ('/transactions/personnel/', '/transactions/item/'):
+            rows = self.rows(url)
+            self.assertEqual(len(rows), 3)
+            self.assertEqual(rows[0], (self.live.id, False))
+            self.assertTrue(all(archived for _, archived in rows[1:]))
+
+        self.assertEqual(len(self.rows('/transactions/lookup/', qr=self.person.id)), 3)
+        self.assertEqual(len(self.rows('/transactions/lookup/', qr='ir' + self.item.id[2:])), 3)
+
+        # Second page of one-row pages follows the cursor into the archive
+        first = self.client.get('/transactions/personnel/', {'limit': 1}).context['page']
+        second = self.rows('/transactions/personnel/', limit=1, after=first.next_cursor)
+        self.assertEqual(len(second), 1)
+        self.assertTrue(second[0][1])
+
+
+class KeysetPaginationTest(ArmGuardTestCase):
+    """Keyset pages - stable (date_time, id) cursors that walk into the archive"""
+
+    def setUp(self):
+        person = make_personnel('925001')
+        item = make_item('KEYSET-1')
+        t0 = timezone.now().replace(microsecond=0) - timedelta(days=400)
+        # The middle Take/Return share a timestamp, so the id breaks the tie
+        self.rows = [
+            Transaction.objects.create(
+                personnel=person, item=item, date_time=t0 + timedelta(hours=hours),
+                action=Transaction.ACTION_TAKE if n % 2 == 0 else Transaction.ACTION_RETURN,
+            )
+            for n, hours in enumerate((0, 1, 2, 2, 3, 4))
+        ]
+        self.newest_first = [txn.id for txn in reversed(self.rows)]
+        archive.archive_chunk(t0 + timedelta(hours=2, minutes=30))
+        self.live, self.archive = archive.history_querysets()
+
+    def test_cursor_round_trip(self):
+        txn = self.rows[2]
+        cursor = pagination.encode_cursor(txn.date_time, txn.pk)
+        self.assertEqual(pagination.decode_cursor(cursor), (txn.date_time, txn.pk))
+        for bad in ('', 'not-a-cursor', pagination.encode_cursor(txn.date_time, 'x')):
+            with self.assertRaises(pagination.InvalidCursor):
+                pagination.decode_cursor(bad)
+
+    def test_walk_pages_across_archive(self):
+        self.assertEqual(TransactionArchive.objects.count(), 4)
+        pages = []
+        page = pagination.fetch_page(self.live, page_size=2, archive=self.archive)
+        while True:
+            pages.append([row.id for row in page])
+            if not page.has_next:
+                break
+            page = pagination.fetch_page(self.live, after=page.next_cursor, page_size=2, archive=self.archive)
+        self.assertEqual(pages, [self.newest_first[:2], self.newest_first[2:4], self.newest_first[4:]])
+        self.assertIsNone(page.next_cursor)
+        self.assertTrue(all(row.is_archived for row in page))
+
+        # Back one page from the last
+        back = pagination.fetch_page(self.live, before=page.prev_cursor, page_size=2, archive=self.archive)
+        self.assertEqual([row.id for row in back], self.newest_first[2:4])
+        self.assertTrue(back.has_prev)
+
+    def test_archive_read_only_past_watermark(self):
+        # A page filled from the live table costs only the watermark lookup
+        with CaptureQueriesContext(connection) as queries:
+            page = pagination.fetch_page(self.live, page_size=1, archive=self.archive)
+        self.assertEqual([row.id for row in page], self.newest_first[:1])
+        self.assertEqual(len([q for q in queries.captured_queries if 'FROM "transactions_archive"' in q['sql']]), 1)
+
+        # A page that runs out of live rows also reads the archive
+        with CaptureQueriesContext(connection) as queries:
+            page = pagination.fetch_page(self.live, after=page.next_cursor, page_size=2, archive=self.archive)
+        self.assertEqual([row.id for row in page], self.newest_first[1:3])
+        self.assertEqual(len([q for q in queries.captured_queries if 'FROM "transactions_archive"' in q['sql']]), 2)
+
+    def test_history_api(self):
+        self.client.force_login(User.objects.create_user('pager', password='x'))
+        first = self.client.get('/api/transactions/history/', {'limit': 3}).json()
+        self.assertEqual([row['id'] for row in first['results']], self.newest_first[:3])
+        self.assertIsNone(first['prev_cursor'])
+
+        second = self.client.get('/api/transactions/history/', {'limit': 3, 'after': first['next_cursor']}).json()
+        self.assertEqual([row['id'] for row in second['results']], self.newest_first[3:])
+        self.assertIsNone(second['next_cursor'])
+
+        self.assertEqual(self.client.get('/api/transactions/history/', {'after': 'garbage'}).status_code, 400)
+
+
+class LedgerExportTest(ArmGuardTestCase):
+    """Ledger export - bounds, archive merge, formats and who may download it"""
+
+    def setUp(self):
+        self.person = make_personnel('930001')
+        self.item = make_item('EXPORT-1')
+        self.t0 = timezone.now().replace(microsecond=0) - timedelta(days=400)
+        self.archived = [
+            Transaction.objects.create(personnel=self.person, item=self.item, action=action, date_time=self.t0 + timedelta(days=days))
+            for action, days in ((Transaction.ACTION_TAKE, 0), (Transaction.ACTION_RETURN, 2))
+        ]
+        archive.archive_chunk(archive.archive_cutoff())
+        # Live row older than the newest archived one, so the merge has to interleave
+        self.live = Transaction.objects.create(
+            personnel=self.person, item=self.item, action=Transaction.ACTION_TAKE, date_time=self.t0 + timedelta(days=1)
+        )
+        self.latest = Transaction.objects.create(personnel=self.person, item=self.item, action=Transaction.ACTION_RETURN)
+
+    def test_parse_bound(self):
+        self.assertIsNone(export.parse_bound(''))
+        start = export.parse_bound('2026-03-01')
+        self.assertEqual((start.date().isoformat(), start.hour), ('2026-03-01', 0))
+        self.assertTrue(timezone.is_aware(start))
+        # A bare end date covers the whole day
+        self.assertEqual(export.parse_bound('2026-03-01', end=True) - start, timedelta(days=1))
+        self.assertEqual(export.parse_bound('2026-03-01T08:30:00', end=True).hour, 8)
+        for bad in ('yesterday', '2026-02-30'):
+            with self.assertRaises(ValueError):
+                export.parse_bound(bad)
+
+    def test_archive_merge(self):
+        ids = [row[0] for row in export.iter_ledger()]
+        self.assertEqual(ids, [self.archived[0].id, self.live.id, self.archived[1].id, self.latest.id])
+
+        # Ranges after the archive watermark do not read the archive
+        recent = export.iter_ledger(start=self.t0 + timedelta(days=3))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual([row[0] for row in recent], [self.latest.id])
+        self.assertFalse([q for q in queries.captured_queries if 'transactions_archive' in q['sql']])
+
+        takes = [row[0] for row in export.iter_ledger(action=Transaction.ACTION_TAKE, end=self.t0 + timedelta(days=1, hours=1))]
+        self.assertEqual(takes, [self.archived[0].id, self.live.id])
+
+    def test_download_formats_and_permission(self):
+        self.client.force_login(User.objects.create_user('clerk', password='x'))
+        self.assertEqual(self.client.get('/transactions/export/').status_code, 403)
+
+        admin = User.objects.create_user('auditor', password='x', is_staff=True)
+        admin.user_permissions.add(Permission.objects.get(codename='view_transactionarchive'))
+        self.client.force_login(admin)
+
+        response = self.client.get('/transactions/export/', {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['transaction_id', 'date_time', 'queued_at', 'action'])
+        self.assertEqual(len(lines), 5)
+
+        response = self.client.get('/transactions/export/', {'format': 'ndjson', 'action': 'Return'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['transaction_id'] for row in rows], [self.archived[1].id, self.latest.id])
+        self.assertEqual(rows[0]['item_serial'], 'EXPORT-1')
+
+        self.assertEqual(self.client.get('/transactions/export/', {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/transactions/export/', {'start': 'soon'}).status_code, 400)
+
+
+class BatchTransactionTest(ArmGuardTestCase):
+    """Batch endpoint - atomic writes all or nothing, partial writes the valid rows"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('guard-mount', password='x'))
+        self.people = [make_personnel(f'94000{n}') for n in range(3)]
+        self.items = [make_item(f'BATCH-{n}') for n in range(3)]
+
+    def post(self, rows, **body):
+        return self.client.post(
+            '/api/transactions/batch/', json.dumps({'transactions': rows, **body}), content_type='application/json'
+        )
+
+    def takes(self):
+        return [
+            {'personnel_id': person.id, 'item_id': item.id, 'action': 'Take', 'mags': 2, 'rounds': 60}
+            for person, item in zip(self.people, self.items)
+        ]
+
+    def test_atomic_writes_every_row(self):
+        response = self.post(self.takes())
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertTrue(result['success'])
+        self.assertEqual(result['committed'], 3)
+        self.assertEqual([row['item_new_status'] for row in result['results']], [Item.STATUS_ISSUED] * 3)
+        self.assertEqual(Item.objects.filter(status=Item.STATUS_ISSUED).count(), 3)
+        self.assertEqual(
+            set(ActiveCustody.objects.values_list('personnel_id', 'transaction_id')),
+            {(row['personnel_id'], txn['transaction_id']) for row, txn in zip(self.takes(), result['results'])},
+        )
+
+    def test_atomic_writes_nothing_when_a_row_fails(self):
+        rows = self.takes()
+        # The same personnel taking a second item is caught within the batch
+        rows[2]['personnel_id'] = self.people[0].id
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 400)
+        result = response.json()
+        self.assertEqual(result['committed'], 0)
+        self.assertEqual([row['status'] for row in result['results']], ['skipped', 'skipped', 'error'])
+        self.assertIn('already has an issued item', result['results'][2]['error'])
+        self.assertTrue(result['results'][2]['retry'])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(Item.objects.exclude(status=Item.STATUS_AVAILABLE).exists())
+
+    def test_partial_writes_valid_rows(self):
+        rows = self.takes()
+        rows[1]['item_id'] = 'IR-MISSING'
+        # Positional rows follow ROW_FIELDS
+        rows[2] = [self.people[2].id, self.items[2].id, 'Take', 'Guard', 1, 'many']
+        rows.append({'personnel_id': self.people[1].id, 'item_id': self.items[1].id, 'action': 'Return'})
+        result = self.post(rows, mode='partial').json()
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['committed'], 1)
+        self.assertEqual(
+            [(row['status'], row.get('error')) for row in result['results']],
+            [
+                ('ok', None),
+                ('error', 'Item not found'),
+                ('error', 'rounds must be a whole number'),
+                ('error', 'Cannot return item. Current status: Available. Item must be Issued.'),
+            ],
+        )
+        self.assertEqual(list(Transaction.objects.values_list('item_id', flat=True)), [self.items[0].id])
+        self.assertEqual(ActiveCustody.objects.get().personnel_id, self.people[0].id)
+
+    def test_request_errors(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post(self.takes(), mode='best-effort').status_code, 400)
+        self.assertEqual(self.post(self.takes() * 200).status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class DailyRollupTest(ArmGuardTestCase):
+    """Daily rollups - posting increments the rows a rebuild would write"""
+
+    def setUp(self):
+        self.people = [make_personnel(f'945{n:03}') for n in range(3)]
+        self.rifle = make_item('ROLLUP-1')
+        self.pistol = make_item('ROLLUP-2', Item.ITEM_TYPE_GLOCK)
+        self.day = timezone.localdate() - timedelta(days=3)
+        self.noon = timezone.make_aware(datetime.combine(self.day, time(12)))
+
+    def rollup_rows(self):
+        return sorted(
+            DailyTransactionRollup.objects.values_list('day', 'item_type', 'duty_type', 'action', 'count', 'mags', 'rounds')
+        )
+
+    def post(self, person, item, action, hours=0, **fields):
+        return Transaction.objects.create(
+            personnel=person, item=item, action=action, date_time=self.noon + timedelta(hours=hours), **fields
+        )
+
+    def test_increment_matches_rebuild(self):
+        self.post(self.people[0], self.rifle, Transaction.ACTION_TAKE, mags=2, rounds=60, duty_type='Guard')
+        self.post(self.people[0], self.rifle, Transaction.ACTION_RETURN, hours=1, duty_type='Guard')
+        self.post(self.people[1], self.rifle, Transaction.ACTION_TAKE, hours=2, mags=1, rounds=30, duty_type='Guard')
+        self.post(self.people[2], self.pistol, Transaction.ACTION_TAKE, hours=24, mags=1, rounds=15)
+        batch.process_batch([{'personnel_id': self.people[1].id, 'item_id': self.rifle.id, 'action': 'Return', 'duty_type': 'Guard'}])
+
+        incremental = self.rollup_rows()
+        self.assertIn((self.day, 'M16', 'Guard', 'Take', 2, 3, 90), incremental)
+        self.assertIn((self.day + timedelta(days=1), 'GLOCK', '', 'Take', 1, 1, 15), incremental)
+
+        self.assertEqual(rollups.rebuild(), len(incremental))
+        self.assertEqual(self.rollup_rows(), incremental)
+
+        # Archived rows still count after a rebuild
+        archive.archive_chunk(self.noon + timedelta(hours=2))
+        self.assertTrue(TransactionArchive.objects.exists())
+        call_command('rebuild_transaction_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_refused_transaction_is_not_counted(self):
+        self.post(self.people[0], self.rifle, Transaction.ACTION_TAKE)
+        before = self.rollup_rows()
+        with self.assertRaises(ValueError):
+            with db_transaction.atomic():
+                self.post(self.people[0], self.pistol, Transaction.ACTION_TAKE)
+        self.assertEqual(self.rollup_rows(), before)
+
+    def test_summarize(self):
+        self.post(self.people[0], self.rifle, Transaction.ACTION_TAKE, mags=2, rounds=60)
+        self.post(self.people[0], self.rifle, Transaction.ACTION_RETURN, hours=1)
+        self.post(self.people[1], self.pistol, Transaction.ACTION_TAKE, hours=24, rounds=15)
+
+        self.assertEqual(rollups.summarize(self.day), {'count': 3, 'mags': 2, 'rounds': 75})
+        self.assertEqual(rollups.summarize(self.day, self.day)['count'], 2)
+        self.assertEqual(
+            rollups.summarize(self.day, group_by=('action',)),
+            [
+                {'action': 'Return', 'count': 1, 'mags': 0, 'rounds': 0},
+                {'action': 'Take', 'count': 2, 'mags': 2, 'rounds': 75},
+            ],
+        )
+
+
+class OutstandingAmmunitionTest(ArmGuardTestCase):
+    """Outstanding ammunition - Takes add, Returns settle against the Take they close"""
+
+    def setUp(self):
+        self.people = [make_personnel(f'946{n:03}') for n in range(2)]
+        self.items = [make_item(f'AMMO-{n}') for n in range(2)]
+
+    def post(self, n, action, **fields):
+        return Transaction.objects.create(personnel=self.people[n], item=self.items[n], action=action, **fields)
+
+    def outstanding(self):
+        return sorted(OutstandingAmmunition.objects.values_list('personnel_id', 'duty_type', 'mags', 'rounds'))
+
+    def test_partial_and_full_returns(self):
+        self.post(0, Transaction.ACTION_TAKE, mags=3, rounds=90, duty_type='Guard')
+        self.post(1, Transaction.ACTION_TAKE, mags=1, rounds=15)
+        self.assertEqual(self.outstanding(), [(self.people[0].id, 'Guard', 3, 90), (self.people[1].id, '', 1, 15)])
+
+        # Charged to the duty type of the Take, whatever the Return records
+        self.post(0, Transaction.ACTION_RETURN, mags=1, rounds=30, duty_type='Patrol')
+        self.assertEqual(self.outstanding()[0], (self.people[0].id, 'Guard', 2, 60))
+
+        # A Return that records nothing hands back everything issued with the Take
+        self.post(1, Transaction.ACTION_RETURN)
+        self.assertEqual(self.outstanding(), [(self.people[0].id, 'Guard', 2, 60)])
+
+    def test_over_return_settles_at_zero(self):
+        self.post(0, Transaction.ACTION_TAKE, mags=2, rounds=60, duty_type='Guard')
+        self.post(0, Transaction.ACTION_RETURN, mags=3, rounds=60)
+        self.assertFalse(OutstandingAmmunition.objects.exists())
+
+    def test_batch_take_and_return_in_one_sync(self):
+        rows = [
+            {'personnel_id': self.people[0].id, 'item_id': self.items[0].id, 'action': 'Take', 'mags': 2, 'rounds': 60,
+             'duty_type': 'Guard', 'idempotency_key': 'ammo-1'},
+            {'personnel_id': self.people[0].id, 'item_id': self.items[0].id, 'action': 'Return', 'idempotency_key': 'ammo-2'},
+            {'personnel_id': self.people[1].id, 'item_id': self.items[1].id, 'action': 'Take', 'rounds': 15,
+             'duty_type': 'Guard', 'idempotency_key': 'ammo-3'},
+        ]
+        self.assertEqual(batch.process_batch(rows, mode=batch.MODE_PARTIAL, replay=True)['committed'], 3)
+        self.assertEqual(self.outstanding(), [(self.people[1].id, 'Guard', 0, 15)])
+
+    def test_api_totals(self):
+        self.post(0, Transaction.ACTION_TAKE, mags=2, rounds=60, duty_type='Guard')
+        self.post(1, Transaction.ACTION_TAKE, mags=1, rounds=30, duty_type='Guard')
+        self.client.force_login(User.objects.create_user('ammo-clerk', password='x'))
+
+        response = self.client.get('/api/ammunition/outstanding/').json()
+        self.assertEqual(len(response['results']), 2)
+        self.assertEqual(response['totals'], [{'duty_type': 'Guard', 'holders': 2, 'mags': 3, 'rounds': 90}])
+
+        response = self.client.get('/api/ammunition/outstanding/', {'personnel': self.people[1].id}).json()
+        self.assertEqual([(row['mags'], row['rounds']) for row in response['results']], [(1, 30)])
+        self.assertEqual(self.client.get('/transactions/ammunition/').status_code, 200)
+
+
+class SyncReplayTest(ArmGuardTestCase):
+    """Offline queue sync - a replayed scan is reported, never re-applied"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('station', password='x'))
+        self.person = make_personnel('600001')
+        self.item = make_item('SYNC-1')
+
+    def sync(self, rows):
+        return self.client.post('/api/transactions/sync/', json.dumps({'transactions': rows}), content_type='application/json')
+
+    def test_replay_is_noop(self):
+        rows = [
+            {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take', 'idempotency_key': 'scan-1'},
+            {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Return', 'idempotency_key': 'scan-2'},
+        ]
+        first = self.sync(rows[:1]).json()
+        self.assertEqual(first['results'][0]['status'], 'ok')
+
+        # Connection dropped before the response arrived: the station resends everything
+        replay = self.sync(rows).json()
+        self.assertTrue(replay['success'])
+        self.assertEqual([r['status'] for r in replay['results']], ['duplicate', 'ok'])
+        self.assertEqual(replay['results'][0]['transaction_id'], first['results'][0]['transaction_id'])
+        self.assertEqual(Transaction.objects.filter(action=Transaction.ACTION_TAKE).count(), 1)
+
+        again = self.sync(rows).json()
+        self.assertEqual([r['status'] for r in again['results']], ['duplicate', 'duplicate'])
+        self.assertEqual(again['committed'], 0)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_rows_need_keys(self):
+        response = self.sync([{'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_offline_take_and_return_sync_in_order(self):
+        scanned = timezone.now().replace(microsecond=0) - timedelta(hours=3)
+        rows = [
+            {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take', 'mags': 2, 'rounds': 30,
+             'duty_type': 'Guard', 'idempotency_key': 'off-1', 'queued_at': scanned.isoformat()},
+            {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Return', 'idempotency_key': 'off-2',
+             'queued_at': (scanned + timedelta(hours=1)).isoformat()},
+        ]
+        synced = timezone.now()
+        result = self.sync(rows).json()
+        self.assertEqual(result['committed'], 2, result)
+        self.assertEqual([r['item_new_status'] for r in result['results']], [Item.STATUS_ISSUED, Item.STATUS_AVAILABLE])
+
+        # The ledger time is the server's; the station's scan time is kept beside it
+        take, ret = Transaction.objects.order_by('id')
+        self.assertEqual((take.queued_at, ret.queued_at), (scanned, scanned + timedelta(hours=1)))
+        self.assertGreaterEqual(take.date_time, synced)
+        self.assertEqual(take.date_time, ret.date_time)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, Item.STATUS_AVAILABLE)
+        self.assertFalse(ActiveCustody.objects.exists())
+        self.assertFalse(OutstandingAmmunition.objects.exists())
+        interval = CustodyInterval.objects.get()
+        self.assertEqual((interval.start, interval.end), (take.date_time, ret.date_time))
+
+    def test_state_errors_are_retryable(self):
+        other = make_item('SYNC-2')
+        Transaction.objects.create(personnel=make_personnel('600002'), item=other, action=Transaction.ACTION_TAKE)
+        latest = Transaction.objects.get(item=other).date_time
+        now = timezone.now()
+        result = self.sync([
+            {'personnel_id': self.person.id, 'item_id': other.id, 'action': 'Take', 'idempotency_key': 'r-1'},
+            {'personnel_id': self.person.id, 'item_id': 'IR-MISSING', 'action': 'Take', 'idempotency_key': 'r-2'},
+            {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take', 'idempotency_key': 'r-3',
+             'queued_at': (now + timedelta(hours=1)).isoformat()},
+            {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take', 'idempotency_key': 'r-4',
+             'queued_at': (now - timedelta(days=30)).isoformat()},
+            # Stamped before the other station's Take by a slow clock
+            {'personnel_id': self.person.id, 'item_id': other.id, 'action': 'Return', 'idempotency_key': 'r-5',
+             'queued_at': (latest - timedelta(minutes=5)).isoformat()},
+        ]).json()
+        errors = {r['index']: (r['error'], r['retry']) for r in result['results'] if r['status'] == 'error'}
+        self.assertTrue(errors[0][1])
+        self.assertFalse(errors[1][1])
+        self.assertIn('future', errors[2][0])
+        self.assertIn('too old', errors[3][0])
+        self.assertEqual(result['results'][4]['status'], 'ok')
+        returned = Transaction.objects.get(pk=result['results'][4]['transaction_id'])
+        self.assertGreater(returned.date_time, latest)
+        self.assertEqual(returned.queued_at, latest - timedelta(minutes=5))
+
+    def test_prune_keys_past_replay_window(self):
+        self.sync([{'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take', 'idempotency_key': 'new-1'}])
+        IdempotencyKey.objects.create(key='old-1', transaction_id=1)
+        IdempotencyKey.objects.filter(key='old-1').update(created_at=timezone.now() - timedelta(days=8))
+
+        out = StringIO()
+        call_command('prune_idempotency_keys', stdout=out)
+        self.assertIn('Pruned 1 idempotency keys', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new-1'])
+
+    def test_batch_endpoint_still_rejects_repeat_items(self):
+        rows = [
+            {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take'},
+            {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Return'},
+        ]
+        response = self.client.post(
+            '/api/transactions/batch/', json.dumps({'transactions': rows, 'mode': 'partial'}), content_type='application/json'
+        ).json()
+        self.assertEqual(response['committed'], 1)
+        self.assertIn('more than once', response['results'][1]['error'])
+
+
+class ScanTokenTest(ArmGuardTestCase):
+    """Scan pair tokens - commit without re-resolving, at most once, never past the status check"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('pair-station', password='x'))
+        self.person = make_personnel('610001')
+        self.item = make_item('TOKEN-1')
+
+    def token(self, action='Take'):
+        response = self.client.get('/api/scan/pair/', {'personnel': self.person.id, 'item': self.item.id, 'action': action})
+        return response.json()['scan_token']
+
+    def post(self, body, url='/api/transactions/'):
+        return self.client.post(url, json.dumps(body), content_type='application/json')
+
+    def test_create_rechecks_status_and_is_single_use(self):
+        token = self.token()
+        Item.objects.filter(pk=self.item.pk).update(status=Item.STATUS_MAINTENANCE)
+        self.assertEqual(self.post({'scan_token': token}).status_code, 400)
+
+        Item.objects.filter(pk=self.item.pk).update(status=Item.STATUS_AVAILABLE)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post({'scan_token': token})
+        self.assertEqual(response.status_code, 200)
+        # The token stands in for the lookups: personnel is never read
+        reads = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in reads if 'FROM "personnel"' in sql])
+        self.assertEqual(response.json()['item_new_status'], Item.STATUS_ISSUED)
+
+        Transaction.objects.create(personnel=self.person, item=self.item, action=Transaction.ACTION_RETURN)
+        replayed = self.post({'scan_token': token})
+        self.assertEqual(replayed.status_code, 409)
+        self.assertIn('already used', replayed.json()['error'])
+        self.assertEqual(Transaction.objects.filter(action=Transaction.ACTION_TAKE).count(), 1)
+
+    def test_sync_rows_carry_token(self):
+        token = self.token()
+        row = {'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take', 'scan_token': token}
+
+        mismatched = self.post({'transactions': [{**row, 'action': 'Return', 'idempotency_key': 'tok-0'}]}, '/api/transactions/sync/')
+        self.assertEqual(mismatched.json()['results'][0]['error'], 'Scan token was issued for a different scan')
+
+        first = self.post({'transactions': [{**row, 'idempotency_key': 'tok-1'}]}, '/api/transactions/sync/').json()
+        self.assertEqual(first['results'][0]['status'], 'ok')
+
+        # Resending the same queued row is a duplicate; the token under a new key is refused
+        Transaction.objects.create(personnel=self.person, item=self.item, action=Transaction.ACTION_RETURN)
+        again = self.post({'transactions': [
+            {**row, 'idempotency_key': 'tok-1'}, {**row, 'idempotency_key': 'tok-2'},
+        ]}, '/api/transactions/sync/').json()
+        self.assertEqual(again['results'][0]['status'], 'duplicate')
+        self.assertEqual(again['results'][1]['error'], 'Scan token was already used - scan again')
+        self.assertFalse(again['results'][1]['retry'])
+        self.assertEqual(Transaction.objects.filter(action=Transaction.ACTION_TAKE).count(), 1)
+
+    def test_async_create_uses_token(self):
+        token = self.token()
+        user = User.objects.get(username='pair-station')
+
+        async def auser():
+            return user
+
+        def create():
+            request = RequestFactory().post('/', json.dumps({'scan_token': token}), content_type='application/json')
+            request.user = user
+            request.auser = auser
+            return async_to_sync(async_api_views.create_transaction)(request)
+
+        self.assertEqual(create().status_code, 200)
+        Transaction.objects.create(personnel=self.person, item=self.item, action=Transaction.ACTION_RETURN)
+        self.assertEqual(create().status_code, 409)
+
+    @override_settings(SCAN_TOKEN_MAX_AGE=-1)
+    def test_expired_token(self):
+        token = self.token()
+        self.assertEqual(self.post({'scan_token': token}).status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_synced_token_expires_by_server_clock(self):
+        issued = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        token = signing.dumps(
+            {'p': self.person.id, 'i': self.item.id, 'a': 'Take', 'n': 'stale-nonce', 't': int(issued.timestamp())},
+            salt=SCAN_TOKEN_SALT,
+        )
+        # A queued_at right after issue does not make an hour-old token fresh
+        row = {
+            'personnel_id': self.person.id, 'item_id': self.item.id, 'action': 'Take', 'scan_token': token,
+            'idempotency_key': 'tok-old', 'queued_at': (issued + timedelta(seconds=5)).isoformat(),
+        }
+        result = self.post({'transactions': [row]}, '/api/transactions/sync/').json()
+        self.assertEqual(result['results'][0]['error'], 'Scan token is invalid or expired - scan again')
+        self.assertFalse(Transaction.objects.exists())
+
+
+@override_settings(LIVE_FEED_BUFFER_SIZE=2)
+class LiveFeedTest(ArmGuardTestCase):
+    """Live feed buffer - resumes after an event ID, asks for a reload past its tail"""
+
+    def setUp(self):
+        self.person = make_personnel('700001')
+        self.item = make_item('LIVE-1')
+
+    def post(self, action):
+        return Transaction.objects.create(personnel=self.person, item=self.item, action=action)
+
+    def test_resume_and_reset(self):
+        feed = live.LiveFeed()
+        take = self.post(Transaction.ACTION_TAKE)
+        feed._load_tail()
+        self.assertEqual(feed.latest(), take.id)
+
+        returned = self.post(Transaction.ACTION_RETURN)
+        retaken = self.post(Transaction.ACTION_TAKE)
+        feed._poll()
+
+        events, reset = feed.since(take.id)
+        self.assertFalse(reset)
+        self.assertEqual([event_id for event_id, _ in events], [returned.id, retaken.id])
+        self.assertEqual(events[0][1]['status_deltas'], {'available': 1, 'issued': -1})
+        self.assertEqual(events[1][1]['item_status'], Item.STATUS_ISSUED)
+
+        # The first Take fell out of the two-event buffer
+        self.assertEqual(feed.since(take.id - 1), ([], True))
+
+    @override_settings(LIVE_FEED_BUFFER_SIZE=10)
+    def test_late_commit_with_lower_id(self):
+        feed = live.LiveFeed()
+        take = self.post(Transaction.ACTION_TAKE)
+        feed._load_tail()
+        returned = Transaction.objects.create(
+            id=take.id + 5, personnel=self.person, item=self.item, action=Transaction.ACTION_RETURN
+        )
+        feed._poll()
+        self.assertEqual(feed.latest(), returned.id)
+
+        # An ID handed out earlier commits after the poll that passed it
+        late = Transaction.objects.create(
+            id=take.id + 3, personnel=self.person, item=self.item, action=Transaction.ACTION_TAKE
+        )
+        feed._poll()
+        events, _ = feed.since(returned.id)
+        self.assertEqual([event_id for event_id, _ in events], [late.id])
+        self.assertEqual([event_id for event_id, _ in feed.since(take.id)[0]], [returned.id, late.id])
+
+        # Polling again does not repeat it
+        feed._poll()
+        self.assertEqual(feed.since(late.id), ([], False))
+
+
+class BulkLookupTest(ArmGuardTestCase):
+    """Bulk lookup - one query per table, unknown and malformed IDs reported"""
+
+    def test_mixed_ids(self):
+        people = [make_personnel(f'80000{n}') for n in range(3)]
+        item = make_item('BULK-1')
+        typed = 'ir' + item.id[2:]
+        refs = [person.id for person in people] + [typed, 'PE-MISSING', 'garbage']
+
+        with self.assertNumQueries(2):
+            result = bulk_lookup(refs)
+
+        self.assertEqual(result['results'][people[0].id]['type'], 'personnel')
+        self.assertEqual(result['results'][typed]['data']['serial'], 'BULK-1')
+        self.assertEqual(result['not_found'], ['garbage', 'PE-MISSING'])
+
+
+@override_settings(SCAN_CACHE_LOCAL_TTL=60)
+class ScanCacheTest(ArmGuardTestCase):
+    """Scan cache - hits until the record changes, never caches not-found"""
+
+    def setUp(self):
+        scan_cache.clear()
+        self.person = make_personnel('810001')
+        self.item = make_item('CACHE-1')
+
+    def tearDown(self):
+        scan_cache.clear()
+
+    def test_hit_miss_and_invalidation(self):
+        with self.assertNumQueries(1):
+            parse_qr_code(self.item.id)
+        with self.assertNumQueries(0):
+            cached = parse_qr_code(self.item.id)
+        self.assertEqual(cached['data']['status'], Item.STATUS_AVAILABLE)
+
+        # A posted transaction changes status with an UPDATE, not save()
+        Transaction.objects.create(personnel=self.person, item=self.item, action=Transaction.ACTION_TAKE)
+        self.assertEqual(parse_qr_code(self.item.id)['data']['status'], Item.STATUS_ISSUED)
+
+        self.item.refresh_from_db()
+        self.item.condition = Item.CONDITION_POOR
+        self.item.save()
+        self.assertEqual(parse_qr_code(self.item.id)['data']['condition'], Item.CONDITION_POOR)
+
+        stats = scan_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+        self.assertGreater(stats['invalidations'], 0)
+
+    def test_not_found_is_not_cached(self):
+        self.assertFalse(parse_qr_code('IR-NOT-YET')['success'])
+        Item.objects.filter(pk=self.item.pk).update(id='IR-NOT-YET')
+        self.assertTrue(parse_qr_code('IR-NOT-YET')['success'])
+
+    @override_settings(SCAN_CACHE_LOCAL_TTL=0)
+    def test_entries_expire(self):
+        parse_qr_code(self.item.id)
+        Item.objects.filter(pk=self.item.pk).update(status=Item.STATUS_MAINTENANCE)
+        self.assertEqual(parse_qr_code(self.item.id)['data']['status'], Item.STATUS_MAINTENANCE)
+
+
+class AutofillRuleTest(ArmGuardTestCase):
+    """Autofill rules - compiled once, recompiled when a rule changes"""
+
+    def test_compiled_lookup(self):
+        autofill.invalidate()
+        self.assertEqual(autofill.rules().lookup('glock', 'Duty Sentinel'), {'mags': 4, 'rounds': 42})
+        self.assertEqual(autofill.rules().lookup('45', 'Duty Sentinel'), {'mags': 3, 'rounds': 21})
+        with self.assertNumQueries(0):
+            self.assertEqual(autofill.rules().lookup('M14', 'Vigil'), {'mags': 0, 'rounds': 0})
+
+        version = autofill.rules().version
+        vigil = AutofillRule.objects.get(item_type='', duty_type='Vigil')
+        vigil.mags, vigil.rounds = 1, 10
+        vigil.save()
+        AutofillRule.objects.create(item_type='M14', duty_type='Honor Guard', mags=2, rounds=40)
+
+        self.assertEqual(autofill.rules().lookup('M14', 'Vigil'), {'mags': 1, 'rounds': 10})
+        self.assertIn('Honor Guard', autofill.rules().duty_types)
+        self.assertNotEqual(autofill.rules().version, version)
+
+
+class CustodyIntervalTest(ArmGuardTestCase):
+    """Custody intervals - who had an item at a given time"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('custodian', password='x'))
+        self.first, self.second = make_personnel('800001'), make_personnel('800002')
+        self.item = make_item('CUSTODY-1')
+        self.t0 = timezone.now() - timedelta(days=2)
+        for person, action, hours in [
+            (self.first, Transaction.ACTION_TAKE, 0),
+            (self.first, Transaction.ACTION_RETURN, 8),
+            (self.second, Transaction.ACTION_TAKE, 24),
+        ]:
+            Transaction.objects.create(
+                personnel=person, item=self.item, action=action, date_time=self.t0 + timedelta(hours=hours)
+            )
+
+    def holder(self, hours):
+        interval = custody.held_at(self.item.id, self.t0 + timedelta(hours=hours))
+        return interval and interval.personnel
+
+    def test_point_in_time(self):
+        self.assertEqual(self.holder(0), self.first)
+        self.assertEqual(self.holder(4), self.first)
+        self.assertIsNone(self.holder(8))
+        self.assertEqual(self.holder(30), self.second)
+        overlapping = custody.intervals(item_id=self.item.id, start=self.t0 + timedelta(hours=7), end=self.t0 + timedelta(hours=25))
+        self.assertEqual(len(overlapping), 2)
+
+        at = (self.t0 + timedelta(hours=4)).isoformat()
+        response = self.client.get('/api/custody/', {'item': self.item.id, 'at': at}).json()
+        self.assertEqual(response['interval']['personnel_id'], self.first.id)
+        self.assertEqual(self.client.get('/api/custody/', {'item': self.item.id, 'at': 'soon'}).status_code, 400)
+
+    def test_rebuild_matches_live_maintenance(self):
+        live = list(CustodyInterval.objects.order_by('start').values_list('personnel_id', 'start', 'end', 'take_id', 'return_id'))
+        self.assertEqual(custody.rebuild(), 2)
+        rebuilt = list(CustodyInterval.objects.order_by('start').values_list('personnel_id', 'start', 'end', 'take_id', 'return_id'))
+        self.assertEqual(rebuilt, live)
+
+    def test_migration_merges_ledger_and_archive(self):
+        fields = ('personnel_id', 'start', 'end', 'take_id', 'return_id')
+        other = make_item('CUSTODY-2')
+        Transaction.objects.create(
+            personnel=self.first, item=other, action=Transaction.ACTION_TAKE, date_time=self.t0 + timedelta(hours=12)
+        )
+        live = list(CustodyInterval.objects.order_by('start').values_list(*fields))
+        # The first Take/Return pair moves to the archive
+        self.assertEqual(archive.archive_chunk(self.t0 + timedelta(hours=9)), 2)
+        CustodyInterval.objects.all().delete()
+
+        migration = importlib.import_module('transactions.migrations.0008_custody_intervals')
+        migration.build_custody_intervals(django_apps, None)
+        self.assertEqual(list(CustodyInterval.objects.order_by('start').values_list(*fields)), live)
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.urls import path
+from core import async_api_views
 from . import views
 
 app_name = 'transactions'
@@ -14,7 +16,11 @@ urlpatterns = [
     
     # QR Scanner features
     path('qr-scanner/', views.qr_transaction_scanner, name='qr_scanner'),
-    path('verify-qr/', views.verify_qr_code, name='verify_qr'),
+    path('verify-qr/', async_api_views.verify_qr_code if settings.ASYNC_SCAN_API else views.verify_qr_code, name='verify_qr'),
     path('create-qr-transaction/', views.create_qr_transaction, name='create_qr_transaction'),
     path('lookup/', views.lookup_transactions, name='lookup_transactions'),
+    
+    # Ledger export
+    path('export/', views.export_transactions, name='export'),
+    path('ammunition/', views.outstanding_ammunition, name='outstanding_ammunition'),
 ]
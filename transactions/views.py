@@ -5,35 +5,55 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
 from django.db.models import Q
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponseBadRequest
 from django.contrib import messages
 from .models import Transaction
+from .pagination import paginate_request
+from .archive import history_querysets
+from . import export, ammunition, live, autofill
 from inventory.models import Item
 from personnel.models import Personnel
-from qr_manager.models import QRCodeImage
+from core import id_codec
+from core.utils import parse_qr_code
+from admin.views import is_admin_user
 from django.utils import timezone
 
 
+def get_issued_items():
+    """
+    Latest Take for every currently issued item, with holder and item joined.
+    Backed by the active custody table, so the size follows the number of
+    issued items rather than the length of the transaction history.
+    """
+    return Transaction.objects.filter(
+        active_custody__isnull=False
+    ).select_related('personnel', 'item').order_by('-date_time')
+
+
 class TransactionListView(LoginRequiredMixin, ListView):
     """List all transactions with inline form for new transactions"""
     model = Transaction
     template_name = 'transactions/transaction_list.html'
     context_object_name = 'recent_transactions'
-    paginate_by = 20
+    page_size = 20
     
     def get_queryset(self):
         queryset = super().get_queryset()
-        return queryset.select_related('personnel', 'item').order_by('-date_time')
+        return queryset.select_related('personnel', 'item')
     
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # Get currently issued items (items with status 'Issued')
-        issued_items_ids = Item.objects.filter(status='Issued').values_list('id', flat=True)
-        context['issued_items'] = Transaction.objects.filter(
-            item_id__in=issued_items_ids,
-            action='Take'
-        ).select_related('personnel', 'item').order_by('-date_time')
+        # Keyset pagination instead of OFFSET - deep pages cost the same as the first
+        page = paginate_request(self.request, self.object_list, default_size=self.page_size, archive=history_querysets()[1])
+        context = super().get_context_data(object_list=page.rows, **kwargs)
+        context['page'] = page
+        # Currently issued items - one row per item: the Take that opened its active custody
+        context['issued_items'] = list(get_issued_items())
+        # Live feed resume point - read after the tables above, so a
+        # transaction posted while they ran is not shown twice
+        context['live_last_event_id'] = live.latest_transaction_id()
+        context['duty_types'] = autofill.rules().duty_types
         return context
 
 
@@ -47,9 +67,11 @@ class TransactionDetailView(LoginRequiredMixin, DetailView):
 @login_required
 def personnel_transactions(request):
     """View personnel transactions"""
-    transactions = Transaction.objects.select_related('personnel', 'item').order_by('-date_time')
+    queryset, archive = history_querysets()
+    page = paginate_request(request, queryset, archive=archive)
     context = {
-        'transactions': transactions,
+        'transactions': page.rows,
+        'page': page,
     }
     return render(request, 'transactions/personnel_transactions.html', context)
 
@@ -57,13 +79,31 @@ def personnel_transactions(request):
 @login_required
 def item_transactions(request):
     """View item transactions"""
-    transactions = Transaction.objects.select_related('personnel', 'item').order_by('-date_time')
+    queryset, archive = history_querysets()
+    page = paginate_request(request, queryset, archive=archive)
     context = {
-        'transactions': transactions,
+        'transactions': page.rows,
+        'page': page,
     }
     return render(request, 'transactions/item_transactions.html', context)
 
 
+@login_required
+def outstanding_ammunition(request):
+    """End-of-shift report of mags and rounds still out, per duty type and personnel"""
+    duty_totals = ammunition.totals_by_duty(ammunition.outstanding())
+    selected_duty = request.GET.get('duty_type')
+    rows = list(ammunition.outstanding(duty_type=selected_duty or None))
+    context = {
+        'rows': rows,
+        'duty_totals': duty_totals,
+        'selected_duty': selected_duty,
+        'total_mags': sum(row.mags for row in rows),
+        'total_rounds': sum(row.rounds for row in rows),
+    }
+    return render(request, 'transactions/outstanding_ammunition.html', context)
+
+
 @login_required
 def qr_transaction_scanner(request):
     """QR Scanner page for creating transactions"""
@@ -79,45 +119,29 @@ def verify_qr_code(request):
         if not qr_data:
             return JsonResponse({'success': False, 'error': 'No QR code data provided'})
         
-        try:
-            # Look up QR code in database
-            qr_code = QRCodeImage.objects.get(reference_id=qr_data)
-            
-            if qr_code.qr_type == 'personnel':
-                # Get personnel details
-                try:
-                    personnel = Personnel.objects.get(id=qr_data)
-                    return JsonResponse({
-                        'success': True,
-                        'type': 'personnel',
-                        'id': personnel.id,
-                        'name': personnel.get_full_name(),
-                        'rank': personnel.rank,
-                        'badge_number': personnel.badge_number,
-                    })
-                except Personnel.DoesNotExist:
-                    return JsonResponse({'success': False, 'error': 'Personnel not found'})
-                    
-            elif qr_code.qr_type == 'item':
-                # Get item details
-                try:
-                    item = Item.objects.get(id=qr_data)
-                    return JsonResponse({
-                        'success': True,
-                        'type': 'item',
-                        'id': item.id,
-                        'item_type': item.item_type,
-                        'serial': item.serial,
-                        'status': item.status,
-                        'condition': item.condition,
-                    })
-                except Item.DoesNotExist:
-                    return JsonResponse({'success': False, 'error': 'Item not found'})
-            else:
-                return JsonResponse({'success': False, 'error': 'Unknown QR code type'})
-                
-        except QRCodeImage.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'QR code not found in system'})
+        result = parse_qr_code(qr_data)
+        if not result['success']:
+            return JsonResponse({'success': False, 'error': result['error']})
+        
+        data = result['data']
+        if result['type'] == 'personnel':
+            return JsonResponse({
+                'success': True,
+                'type': 'personnel',
+                'id': data['id'],
+                'name': data['full_name'],
+                'rank': data['rank'],
+                'serial': data['serial'],
+            })
+        return JsonResponse({
+            'success': True,
+            'type': 'item',
+            'id': data['id'],
+            'item_type': data['item_type'],
+            'serial': data['serial'],
+            'status': data['status'],
+            'condition': data['condition'],
+        })
     
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
@@ -175,47 +199,53 @@ def lookup_transactions(request):
     """Look up transactions by scanning QR code"""
     qr_data = request.GET.get('qr', '').strip()
     transactions = None
+    page = None
     lookup_type = None
     lookup_info = None
     
     if qr_data:
         try:
-            qr_code = QRCodeImage.objects.get(reference_id=qr_data)
-            
-            if qr_code.qr_type == 'personnel':
-                # Look up personnel transactions
-                try:
-                    personnel = Personnel.objects.get(id=qr_data)
-                    transactions = Transaction.objects.filter(personnel=personnel).select_related('item', 'personnel').order_by('-date_time')
-                    lookup_type = 'personnel'
-                    lookup_info = {
-                        'name': personnel.get_full_name(),
-                        'rank': personnel.rank,
-                        'badge_number': personnel.badge_number,
-                    }
-                except Personnel.DoesNotExist:
-                    messages.error(request, 'Personnel not found')
-                    
-            elif qr_code.qr_type == 'item':
-                # Look up item transactions
-                try:
-                    item = Item.objects.get(id=qr_data)
-                    transactions = Transaction.objects.filter(item=item).select_related('item', 'personnel').order_by('-date_time')
-                    lookup_type = 'item'
-                    lookup_info = {
-                        'item_type': item.item_type,
-                        'serial': item.serial,
-                        'status': item.status,
-                        'condition': item.condition,
-                    }
-                except Item.DoesNotExist:
-                    messages.error(request, 'Item not found')
-            
-        except QRCodeImage.DoesNotExist:
-            messages.error(request, 'QR code not found in system')
+            parsed = id_codec.parse_id(qr_data)
+        except id_codec.InvalidId as e:
+            parsed = None
+            messages.error(request, str(e))
+        
+        if parsed and parsed.kind == id_codec.KIND_PERSONNEL:
+            # Look up personnel transactions
+            personnel = Personnel.objects.filter(pk=parsed.value).first()
+            if personnel:
+                queryset, archive = history_querysets(personnel=personnel)
+                page = paginate_request(request, queryset, archive=archive)
+                transactions = page.rows
+                lookup_type = 'personnel'
+                lookup_info = {
+                    'name': personnel.get_full_name(),
+                    'rank': personnel.rank,
+                    'serial': personnel.serial,
+                }
+            else:
+                messages.error(request, 'Personnel not found')
+        
+        elif parsed:
+            # Look up item transactions
+            item = Item.objects.filter(pk=parsed.value).first()
+            if item:
+                queryset, archive = history_querysets(item=item)
+                page = paginate_request(request, queryset, archive=archive)
+                transactions = page.rows
+                lookup_type = 'item'
+                lookup_info = {
+                    'item_type': item.item_type,
+                    'serial': item.serial,
+                    'status': item.status,
+                    'condition': item.condition,
+                }
+            else:
+                messages.error(request, 'Item not found')
     
     context = {
         'transactions': transactions,
+        'page': page,
         'lookup_type': lookup_type,
         'lookup_info': lookup_info,
         'qr_data': qr_data,
@@ -223,3 +253,43 @@ def lookup_transactions(request):
     return render(request, 'transactions/lookup_transactions.html', context)
 
 
+
+
+def can_export_ledger(user):
+    """Admins, and staff allowed to view archived transactions in the Django admin"""
+    return is_admin_user(user) or (user.is_staff and user.has_perm('transactions.view_transactionarchive'))
+
+
+@login_required
+def export_transactions(request):
+    """
+    Stream the transaction ledger as CSV or NDJSON.
+    
+    Query parameters: format (csv | ndjson), start, end (dates or
+    datetimes, end date inclusive), action, duty_type.
+    The export includes archived rows, so it is limited to can_export_ledger().
+    """
+    if not can_export_ledger(request.user):
+        raise PermissionDenied
+    
+    export_format = request.GET.get('format', export.FORMAT_CSV)
+    if export_format not in export.FORMATS:
+        return HttpResponseBadRequest(f'Invalid format: {export_format}')
+    
+    try:
+        filters = {
+            'start': export.parse_bound(request.GET.get('start')),
+            'end': export.parse_bound(request.GET.get('end'), end=True),
+            'action': request.GET.get('action') or None,
+            'duty_type': request.GET.get('duty_type') or None,
+        }
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    
+    response = StreamingHttpResponse(
+        export.export_lines(export_format, **filters),
+        content_type=export.CONTENT_TYPES[export_format],
+    )
+    filename = f"transactions_{timezone.now():%Y%m%d_%H%M%S}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -2,14 +2,149 @@
 # Unified QR Code Generator for ArmGuard System
 # Standard settings matching JavaScript QRCode library
 
+import hashlib
+import os
+import threading
+import time
 import qrcode
+from collections import OrderedDict
 from pathlib import Path
-from PIL import Image
+from PIL import Image, ImageColor
 from io import BytesIO
 
+# Everything that affects the rendered image besides the data and size.
+# Change any of these and stored images become stale (see render_signature).
+RENDER_SETTINGS = {
+	'error_correction': 'H',
+	'box_size': 20,
+	'border': 2,
+	'fill_color': '#888888',
+	'back_color': 'black',
+	'rasterizer': 'exact',  # 'exact' integer-scaled modules, or 'resample' (render large, then resize)
+	'resample': 'LANCZOS',  # filter of the 'resample' rasterizer
+	'mode': 'P',  # two-colour palette, stored as a 1-bit PNG ('RGB' for truecolour)
+	'optimize': False,  # saves a few bytes on palette PNGs at ~3x the encode time
+	'dpi': 300,
+}
 
+# Bump when the rendering code changes output without a settings change,
+# so cached renders and stored images are treated as stale
+RENDER_VERSION = 1
 
-def generate_qr_code(data, output_path=None, size=600):
+# Rendered PNGs kept in memory per process, keyed by render signature
+RENDER_CACHE_SIZE = 256
+
+_cache_lock = threading.Lock()
+_render_cache = OrderedDict()
+
+
+def _render_settings(options):
+	"""RENDER_SETTINGS with per-call overrides"""
+	unknown = set(options) - set(RENDER_SETTINGS)
+	if unknown:
+		raise TypeError(f"Unknown render settings: {', '.join(sorted(unknown))}")
+	return {**RENDER_SETTINGS, **options}
+
+
+def render_signature(data, size=600, **options):
+	"""
+	Hash of the data and render settings an image was produced with.
+	Stored with each QR image so unchanged codes can be skipped on regeneration,
+	and used as the render cache key.
+	
+	Args:
+		data (str): The data encoded in the QR code.
+		size (int): The output size in pixels (None keeps the natural size).
+		**options: Overrides of RENDER_SETTINGS.
+	
+	Returns:
+		str: 64-character hex digest
+	"""
+	settings = sorted(_render_settings(options).items())
+	return hashlib.sha256(repr((RENDER_VERSION, data, size, settings)).encode()).hexdigest()
+
+
+def _qr(data, settings, box_size):
+	qr = qrcode.QRCode(
+		version=1,  # Auto-adjust version
+		error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{settings['error_correction']}"),
+		box_size=box_size,
+		border=settings['border'],
+	)
+	
+	qr.add_data(data)
+	qr.make(fit=True)
+	return qr
+
+
+def _rasterize_exact(data, size, settings):
+	"""
+	Paint the module grid (border included) straight at the target size.
+	
+	Every module is the same whole number of pixels, so edges stay sharp;
+	pixels left over when size is not a multiple of the grid widen the quiet
+	zone. One nearest-neighbour scale of a two-colour palette image replaces
+	the render-large / LANCZOS / convert passes.
+	"""
+	matrix = _qr(data, settings, box_size=1).get_matrix()
+	count = len(matrix)
+	scale = size // count if size else settings['box_size']
+	if scale < 1:
+		raise ValueError(f"{size}px is too small for a {count}x{count} module QR code")
+	
+	palette = [*ImageColor.getrgb(settings['back_color']), *ImageColor.getrgb(settings['fill_color'])]
+	grid = Image.frombytes('P', (count, count), bytes(cell for row in matrix for cell in row))
+	grid.putpalette(palette)
+	img = grid.resize((count * scale, count * scale), Image.Resampling.NEAREST)
+	
+	if size and count * scale != size:
+		canvas = Image.new('P', (size, size), 0)
+		canvas.putpalette(palette)
+		offset = (size - count * scale) // 2
+		canvas.paste(img, (offset, offset))
+		img = canvas
+	
+	return img.convert(settings['mode'])
+
+
+def _rasterize_resample(data, size, settings):
+	"""
+	Render at box_size, then resample to the target size (the original path).
+	With mode 'RGB' and optimize on it reproduces the original renderer's output.
+	"""
+	qr = _qr(data, settings, box_size=settings['box_size'])
+	
+	img = qr.make_image(fill_color=settings['fill_color'], back_color=settings['back_color'])
+	
+	if size:
+		# Resize to specified size with high-quality resampling
+		img = img.resize((size, size), getattr(Image.Resampling, settings['resample']))
+	
+	if settings['mode'] == 'P':
+		# Snap resampled edges back to the two colours
+		return img.convert('RGB').quantize(colors=2)
+	return img.convert(settings['mode'])
+
+
+RASTERIZERS = {
+	'exact': _rasterize_exact,
+	'resample': _rasterize_resample,
+}
+
+
+def _make_image(data, size, settings):
+	"""Render a PIL image with the given settings"""
+	return RASTERIZERS[settings['rasterizer']](data, size, settings)
+
+
+def _png_bytes(img, settings):
+	buffer = BytesIO()
+	dpi = settings['dpi']
+	img.save(buffer, format='PNG', optimize=settings['optimize'], **({'dpi': (dpi, dpi)} if dpi else {}))
+	return buffer.getvalue()
+
+
+def generate_qr_code(data, output_path=None, size=600, **options):
 	"""
 	Generate a HIGH-RESOLUTION QR code image for crisp printing.
 	Optimized for print quality:
@@ -22,55 +157,126 @@ def generate_qr_code(data, output_path=None, size=600):
 		data (str): The data to encode in the QR code.
 		output_path (str or Path, optional): The file path to save the QR code image.
 		size (int): The output size in pixels (default: 600 for HD print).
+		**options: Overrides of RENDER_SETTINGS.
 	
 	Returns:
 		Path or Image: If output_path provided, returns Path. Otherwise returns PIL Image.
 	"""
-	# Create QR code with HD print settings
-	qr = qrcode.QRCode(
-		version=1,  # Auto-adjust version
-		error_correction=qrcode.constants.ERROR_CORRECT_H,  # High error correction
-		box_size=20,  # Larger box size for crisp rendering
-		border=2,  # Small but sufficient border
-	)
+	if output_path:
+		# Save with high quality settings for print
+		Path(output_path).write_bytes(render_png(data, size=size, **options)[1])
+		return Path(output_path)
+	return _make_image(data, size, _render_settings(options))
+
+
+def _cache_path(cache_dir, signature):
+	return Path(cache_dir) / signature[:2] / f"{signature}.png"
+
+
+def render_png(data, size=600, cache_dir=None, **options):
+	"""
+	PNG bytes of a QR code, reusing an identical earlier render.
 	
-	qr.add_data(data)
-	qr.make(fit=True)
+	Renders are content-addressed by render_signature(): looked up in this
+	process's memory first, then in cache_dir (if given) so other processes
+	and later runs reuse them too. Only a miss in both renders.
 	
-	# Create image with gray QR on black background
-	img = qr.make_image(fill_color="#888888", back_color="black")
+	Args:
+		data (str): The data to encode in the QR code.
+		size (int): The output size in pixels (None keeps the natural size).
+		cache_dir (str or Path, optional): Directory of cached renders.
+		**options: Overrides of RENDER_SETTINGS.
 	
-	# Resize to specified size with high-quality resampling
-	img = img.resize((size, size), Image.Resampling.LANCZOS)
+	Returns:
+		tuple: (signature, PNG bytes)
+	"""
+	settings = _render_settings(options)
+	signature = render_signature(data, size, **options)
 	
-	# Convert to RGB mode for better compatibility
-	img = img.convert('RGB')
+	with _cache_lock:
+		png = _render_cache.get(signature)
+		if png is not None:
+			_render_cache.move_to_end(signature)
+			return signature, png
 	
-	# Save or return with optimal settings for print
-	if output_path:
-		# Save with high quality settings for print
-		img.save(output_path, format='PNG', optimize=True, dpi=(300, 300))
-		return Path(output_path)
+	path = _cache_path(cache_dir, signature) if cache_dir else None
+	if path is not None and path.exists():
+		png = path.read_bytes()
+		try:
+			# mtime doubles as last use, for prune_render_cache()
+			os.utime(path)
+		except OSError:
+			pass
 	else:
-		return img
+		png = _png_bytes(_make_image(data, size, settings), settings)
+		if path is not None:
+			# Write-then-rename so a concurrent reader never sees a partial file
+			path.parent.mkdir(parents=True, exist_ok=True)
+			tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+			tmp.write_bytes(png)
+			os.replace(tmp, path)
+	
+	with _cache_lock:
+		_render_cache[signature] = png
+		while len(_render_cache) > RENDER_CACHE_SIZE:
+			_render_cache.popitem(last=False)
+	return signature, png
+
+
+def prune_render_cache(cache_dir, max_age=None, max_bytes=None, now=None):
+	"""
+	Delete cached renders unused for max_age seconds, then the least
+	recently used ones until the cache fits in max_bytes.
+	
+	Args:
+		cache_dir (str or Path): Directory given to render_png().
+		max_age (float, optional): Seconds since last use to keep a render.
+		max_bytes (int, optional): Size the cache is trimmed to.
+		now (float, optional): Current time.time(), for tests.
+	
+	Returns:
+		tuple: (files removed, bytes freed, bytes kept)
+	"""
+	now = time.time() if now is None else now
+	entries = []
+	for path in Path(cache_dir).glob('*/*.png'):
+		try:
+			stat = path.stat()
+		except FileNotFoundError:
+			continue
+		entries.append((stat.st_mtime, stat.st_size, path))
+	entries.sort()
+	
+	kept = sum(size for _, size, _ in entries)
+	removed = freed = 0
+	for mtime, size, path in entries:
+		expired = max_age is not None and now - mtime > max_age
+		oversize = max_bytes is not None and kept > max_bytes
+		if not (expired or oversize):
+			break
+		try:
+			path.unlink()
+		except FileNotFoundError:
+			pass
+		removed += 1
+		freed += size
+		kept -= size
+	return removed, freed, kept
 
 
-def generate_qr_code_to_buffer(data, size=600):
+def generate_qr_code_to_buffer(data, size=600, cache_dir=None):
 	"""
 	Generate HD QR code and return as BytesIO buffer (for Django ImageField).
 	
 	Args:
 		data (str): The data to encode in the QR code.
 		size (int): The output size in pixels (default: 600 for HD print).
+		cache_dir (str or Path, optional): Directory of cached renders.
 	
 	Returns:
 		BytesIO: Buffer containing high-quality PNG image data.
 	"""
-	img = generate_qr_code(data, output_path=None, size=size)
-	
-	buffer = BytesIO()
-	# Save with optimal settings for web and print
-	img.save(buffer, format='PNG', optimize=True, dpi=(300, 300))
+	buffer = BytesIO(render_png(data, size=size, cache_dir=cache_dir)[1])
 	buffer.seek(0)
 	
 	return buffer